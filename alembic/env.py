@@ -1,9 +1,12 @@
+import asyncio
 import os
 
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
 
 from alembic import context
 from dotenv import load_dotenv
@@ -21,8 +24,21 @@ if config.config_file_name is not None:
 
 # Import your models' Base metadata object so Alembic can find the tables
 from app.db.base import Base # Import Base and URL
+import app.db.models  # noqa: F401 - registers the tables on Base.metadata for autogenerate
+from app.core.config import settings
+from app.db import online_migrations, partitions
 target_metadata = Base.metadata
 
+# Separate version table per migration stream (see [sessions_partitioning] in alembic.ini)
+version_table = config.get_main_option("version_table", "alembic_version")
+
+
+def include_name(name, type_, parent_names) -> bool:
+    """Keep the sessions partitions and the stream version tables out of autogenerate."""
+    if type_ == "table":
+        return not (partitions.is_partition_name(name, "sessions") or name.startswith("alembic_version"))
+    return True
+
 # Set the database URL from settings or environment for Alembic
 # (Handles dotenv loading if configured in alembic.ini)
 # db_url = os.getenv("ALEMBIC_DATABASE_URL", None)
@@ -49,19 +65,53 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        version_table=version_table,
+        include_name=include_name,
     )
 
     with context.begin_transaction():
         context.run_migrations()
 
 
+def do_run_migrations(connection: Connection) -> None:
+    # lock_timeout / statement_timeout guards (see app.db.online_migrations)
+    online_migrations.configure_connection(connection)
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # One transaction per revision, so revisions using autocommit blocks
+        # (CREATE INDEX CONCURRENTLY, batched backfills) don't hold earlier DDL open
+        transaction_per_migration=True,
+        version_table=version_table,
+        include_name=include_name,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    """Run migrations through the app's async driver and DATABASE_URL."""
+    connectable = create_async_engine(settings.DATABASE_URL, poolclass=pool.NullPool)
+
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+
+    await connectable.dispose()
+
+
 def run_migrations_online() -> None:
     """Run migrations in 'online' mode.
 
-    In this scenario we need to create an Engine
-    and associate a connection with the context.
+    By default this uses the application's async engine configuration
+    (settings.DATABASE_URL). Pass `-x engine=sync` to use the synchronous
+    sqlalchemy.url from alembic.ini instead.
 
     """
+    if context.get_x_argument(as_dictionary=True).get("engine") != "sync":
+        asyncio.run(run_async_migrations())
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -69,12 +119,7 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
-        )
-
-        with context.begin_transaction():
-            context.run_migrations()
+        do_run_migrations(connection)
 
 
 if context.is_offline_mode():
@@ -0,0 +1,173 @@
+"""partition sessions by expires_at
+
+Revision ID: 7c3f0a9d5e21
+Revises:
+Create Date: 2026-10-17 01:40:52.118304
+
+Opt-in and PostgreSQL only, in its own migration stream:
+
+    alembic -n sessions_partitioning upgrade head
+
+Needs the main chain at 2b9e7d14c6a8 or later, which gives sessions the keys a
+partitioned table can have, so the Session model matches both layouts.
+
+The table is rebuilt online: a partitioned copy is created, writes to the old
+table (inserts, updates and deletes) are mirrored into it by a trigger,
+unexpired rows are copied in committed batches, and the tables are swapped
+under a brief lock. Rows already past SESSION_EXPIRED_RETENTION_DAYS are not
+copied. From then on the expiry sweeper (app.core.expiry) creates upcoming
+partitions and drops expired ones.
+"""
+from datetime import datetime, timedelta, timezone
+import logging
+import time
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db import online_migrations as online, partitions
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3f0a9d5e21'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.online")
+
+COLUMNS = [
+    "session_id", "user_id", "family_id", "token_hash", "expires_at",
+    "revoked_at", "created_at", "last_used_at", "ip_address", "user_agent",
+]
+COLUMN_LIST = ", ".join(COLUMNS)
+INDEXED_COLUMNS = ("token_hash", "family_id", "expires_at")
+
+
+def _lock(bind, mode: str) -> None:
+    online.execute_with_lock_retries(f"LOCK TABLE sessions IN {mode} MODE")
+
+
+def _primary_key_columns(bind) -> list[str]:
+    return list(bind.execute(text(
+        "SELECT a.attname FROM pg_index i "
+        "JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k(attnum, position) ON true "
+        "JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum "
+        "WHERE i.indrelid = 'sessions'::regclass AND i.indisprimary ORDER BY k.position"
+    )).scalars())
+
+
+def _add_constraints(bind, table: str, suffix: str = "") -> None:
+    bind.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT pk_sessions{suffix} PRIMARY KEY (session_id, expires_at)"))
+    bind.execute(text(
+        f"ALTER TABLE {table} ADD CONSTRAINT fk_sessions{suffix}_user_id_users "
+        "FOREIGN KEY (user_id) REFERENCES users (user_id)"
+    ))
+    for column in INDEXED_COLUMNS:
+        bind.execute(text(f"CREATE INDEX ix_sessions{suffix}_{column} ON {table} ({column})"))
+
+
+def _copy_batches(bind, cutoff: datetime) -> int:
+    # FOR SHARE waits for writers of the batch's rows: a row deleted meanwhile is
+    # skipped rather than copied from a stale snapshot after the trigger ran
+    batch = text(
+        f"WITH batch AS ("
+        f" SELECT {COLUMN_LIST} FROM sessions WHERE expires_at >= :cutoff AND session_id > CAST(:last AS uuid)"
+        f" ORDER BY session_id LIMIT :batch_size FOR SHARE"
+        f"), copied AS ("
+        f" INSERT INTO sessions_partitioned ({COLUMN_LIST}) SELECT {COLUMN_LIST} FROM batch ON CONFLICT DO NOTHING"
+        f") SELECT max(session_id::text), count(*) FROM batch"
+    )
+    last, copied, started = "00000000-0000-0000-0000-000000000000", 0, time.monotonic()
+    while True:
+        # Keyset pagination on session_id; rows the trigger already mirrored are skipped by ON CONFLICT
+        last_in_batch, count = online.with_lock_retries(lambda: bind.execute(
+            batch, {"cutoff": cutoff, "last": last, "batch_size": settings.MIGRATION_BACKFILL_BATCH_SIZE}
+        ).one())
+        if not count:
+            return copied
+        last, copied = last_in_batch, copied + count
+        elapsed = time.monotonic() - started
+        logger.info("Copied %d sessions (%.0f rows/s)", copied, copied / elapsed if elapsed else 0)
+        if settings.MIGRATION_BACKFILL_SLEEP_SECONDS:
+            time.sleep(settings.MIGRATION_BACKFILL_SLEEP_SECONDS)
+
+
+def upgrade() -> None:
+    if op.get_context().as_sql:
+        raise NotImplementedError("Partitioning sessions copies data and needs a live connection, not --sql")
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        raise NotImplementedError("Partitioning sessions needs PostgreSQL")
+    if partitions.is_partitioned(bind, "sessions"):
+        return
+    if _primary_key_columns(bind) != ["session_id", "expires_at"]:
+        raise RuntimeError("sessions does not have partition-compatible keys yet; run `alembic upgrade head` first")
+
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=settings.SESSION_EXPIRED_RETENTION_DAYS)
+    with op.get_context().autocommit_block():
+        # Left by an earlier, failed attempt (the trigger first: it writes into the table)
+        online.with_lock_retries(lambda: bind.execute(text("DROP TRIGGER IF EXISTS sessions_partitioned_sync ON sessions")))
+        bind.execute(text("DROP TABLE IF EXISTS sessions_partitioned"))
+        bind.execute(text("CREATE TABLE sessions_partitioned (LIKE sessions INCLUDING DEFAULTS) PARTITION BY RANGE (expires_at)"))
+        _add_constraints(bind, "sessions_partitioned", "_partitioned")
+        # Partitions keep the final names, so nothing needs renaming after the swap
+        partitions.create_partitions(
+            bind, "sessions_partitioned", "sessions",
+            start=cutoff.date(),
+            through=now.date() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS + settings.SESSION_PARTITION_DAYS),
+            days=settings.SESSION_PARTITION_DAYS,
+        )
+        partitions.create_default_partition(bind, "sessions_partitioned", "sessions")
+
+        # Mirror every write made while the copy runs; updates only ever touch these two columns
+        new_values = ", ".join(f"NEW.{column}" for column in COLUMNS)
+        bind.execute(text(
+            "CREATE OR REPLACE FUNCTION sessions_partitioned_sync() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+            "IF TG_OP = 'DELETE' THEN "
+            "DELETE FROM sessions_partitioned WHERE session_id = OLD.session_id AND expires_at = OLD.expires_at; "
+            "ELSE "
+            f"INSERT INTO sessions_partitioned ({COLUMN_LIST}) VALUES ({new_values}) "
+            "ON CONFLICT (session_id, expires_at) DO UPDATE "
+            "SET revoked_at = EXCLUDED.revoked_at, last_used_at = EXCLUDED.last_used_at; "
+            "END IF; RETURN NULL; END $$"
+        ))
+        online.with_lock_retries(lambda: bind.execute(text(
+            "CREATE TRIGGER sessions_partitioned_sync AFTER INSERT OR UPDATE OR DELETE ON sessions "
+            "FOR EACH ROW EXECUTE FUNCTION sessions_partitioned_sync()"
+        )))
+
+        logger.info("Copying sessions that expire after %s into the partitioned table", cutoff.isoformat())
+        _copy_batches(bind, cutoff)
+
+    # Swap in the migration's own transaction: readers and writers wait only for the renames
+    _lock(bind, "ACCESS EXCLUSIVE")
+    bind.execute(text("DROP TRIGGER sessions_partitioned_sync ON sessions"))
+    bind.execute(text("DROP FUNCTION sessions_partitioned_sync()"))
+    bind.execute(text("DROP TABLE sessions"))
+    bind.execute(text("ALTER TABLE sessions_partitioned RENAME TO sessions"))
+    bind.execute(text("ALTER TABLE sessions RENAME CONSTRAINT pk_sessions_partitioned TO pk_sessions"))
+    bind.execute(text("ALTER TABLE sessions RENAME CONSTRAINT fk_sessions_partitioned_user_id_users TO fk_sessions_user_id_users"))
+    for column in INDEXED_COLUMNS:
+        bind.execute(text(f"ALTER INDEX ix_sessions_partitioned_{column} RENAME TO ix_sessions_{column}"))
+
+
+def downgrade() -> None:
+    if op.get_context().as_sql:
+        raise NotImplementedError("Unpartitioning sessions copies data and needs a live connection, not --sql")
+    bind = op.get_bind()
+    if not partitions.is_partitioned(bind, "sessions"):
+        return
+
+    # Blocks session writes (not reads) while the rows are copied back; only
+    # unexpired sessions are left by then, as expired partitions get dropped
+    _lock(bind, "EXCLUSIVE")
+    bind.execute(text("CREATE TABLE sessions_unpartitioned (LIKE sessions INCLUDING DEFAULTS)"))
+    bind.execute(text(f"INSERT INTO sessions_unpartitioned ({COLUMN_LIST}) SELECT {COLUMN_LIST} FROM sessions"))
+    _lock(bind, "ACCESS EXCLUSIVE")
+    bind.execute(text("DROP TABLE sessions")) # With its partitions
+    bind.execute(text("ALTER TABLE sessions_unpartitioned RENAME TO sessions"))
+    _add_constraints(bind, "sessions")
@@ -0,0 +1,69 @@
+"""sessions partition-compatible keys
+
+Revision ID: 2b9e7d14c6a8
+Revises: f1c6a2d93b57
+Create Date: 2026-10-17 01:12:09.530417
+
+PostgreSQL requires every unique constraint of a partitioned table to include
+the partition key. So that `sessions` can be range-partitioned by expires_at
+(the opt-in sessions_partitioning migrations, see alembic.ini), its primary key
+becomes (session_id, expires_at) and token_hash gets a plain index instead of
+a unique constraint; refresh tokens are 256-bit random values. Both layouts
+share this schema, so the Session model matches either way.
+
+On PostgreSQL the new indexes are built concurrently, and the constraints are
+swapped under a brief lock.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db import online_migrations as online, partitions
+
+# revision identifiers, used by Alembic.
+revision: str = '2b9e7d14c6a8'
+down_revision: Union[str, None] = 'f1c6a2d93b57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        with op.batch_alter_table('sessions') as batch_op:
+            batch_op.drop_constraint(op.f('uq_sessions_token_hash'), type_='unique')
+            batch_op.create_primary_key(op.f('pk_sessions'), ['session_id', 'expires_at'])
+            batch_op.create_index(op.f('ix_sessions_token_hash'), ['token_hash'], unique=False)
+        return
+
+    online.create_index_concurrently(op.f('ix_sessions_token_hash'), 'sessions', ['token_hash'])
+    online.create_index_concurrently('sessions_session_id_expires_at_key', 'sessions', ['session_id', 'expires_at'], unique=True)
+    # The index becomes the new primary key (and takes its name)
+    online.execute_with_lock_retries(
+        "ALTER TABLE sessions DROP CONSTRAINT pk_sessions",
+        "ALTER TABLE sessions ADD CONSTRAINT pk_sessions PRIMARY KEY USING INDEX sessions_session_id_expires_at_key",
+        "ALTER TABLE sessions DROP CONSTRAINT uq_sessions_token_hash",
+    )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if not op.get_context().as_sql and partitions.is_partitioned(bind, "sessions"):
+        raise RuntimeError(
+            "sessions is partitioned; first run `alembic -n sessions_partitioning downgrade base`"
+        )
+    if bind.dialect.name != "postgresql":
+        with op.batch_alter_table('sessions') as batch_op:
+            batch_op.drop_index(op.f('ix_sessions_token_hash'))
+            batch_op.create_primary_key(op.f('pk_sessions'), ['session_id'])
+            batch_op.create_unique_constraint(op.f('uq_sessions_token_hash'), ['token_hash'])
+        return
+
+    online.create_index_concurrently('sessions_session_id_key', 'sessions', ['session_id'], unique=True)
+    online.create_index_concurrently('sessions_token_hash_key', 'sessions', ['token_hash'], unique=True)
+    online.execute_with_lock_retries(
+        "ALTER TABLE sessions DROP CONSTRAINT pk_sessions",
+        "ALTER TABLE sessions ADD CONSTRAINT pk_sessions PRIMARY KEY USING INDEX sessions_session_id_key",
+        "ALTER TABLE sessions ADD CONSTRAINT uq_sessions_token_hash UNIQUE USING INDEX sessions_token_hash_key",
+    )
+    online.drop_index_concurrently(op.f('ix_sessions_token_hash'), 'sessions')
@@ -0,0 +1,59 @@
+"""create users and oauth accounts
+
+Revision ID: 3f2a9c7e1b04
+Revises: d9fbfda9f808
+Create Date: 2026-10-16 09:12:31.418207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '3f2a9c7e1b04'
+down_revision: Union[str, None] = 'd9fbfda9f808'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # One key per table (no surrogate id) and one index per lookup path
+    op.create_table(
+        'users',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('username', sa.String(length=50), nullable=True),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('email_verified', sa.Boolean(), nullable=False),
+        sa.Column('hashed_password', sa.String(length=255), nullable=True),
+        sa.Column('status', sa.Enum('active', 'inactive', 'pending_verification', name='userstatus'), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('last_login_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('user_id', name=op.f('pk_users')),
+        sa.UniqueConstraint('username', name=op.f('uq_users_username')),
+    )
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], unique=True)
+    op.create_index('ix_users_created_at_user_id', 'users', ['created_at', 'user_id'], unique=False)
+
+    op.create_table(
+        'user_oauth_accounts',
+        sa.Column('oauth_account_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('provider_name', sa.String(length=50), nullable=False),
+        sa.Column('provider_user_id', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], name=op.f('fk_user_oauth_accounts_user_id_users')),
+        sa.PrimaryKeyConstraint('oauth_account_id', name=op.f('pk_user_oauth_accounts')),
+        sa.UniqueConstraint('provider_name', 'provider_user_id', name='uq_provider_user'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_oauth_accounts')
+    op.drop_index('ix_users_created_at_user_id', table_name='users')
+    op.drop_index('ix_users_email_lower', table_name='users')
+    op.drop_table('users')
+    sa.Enum(name='userstatus').drop(op.get_bind(), checkfirst=True)
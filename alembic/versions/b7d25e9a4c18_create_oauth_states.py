@@ -0,0 +1,34 @@
+"""create oauth states
+
+Revision ID: b7d25e9a4c18
+Revises: 8c41d6e0a7f3
+Create Date: 2026-10-16 14:02:37.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d25e9a4c18'
+down_revision: Union[str, None] = '8c41d6e0a7f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'oauth_states',
+        sa.Column('state', sa.String(length=64), nullable=False),
+        sa.Column('provider', sa.String(length=50), nullable=False),
+        sa.Column('nonce', sa.String(length=64), nullable=True),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('state', name=op.f('pk_oauth_states')),
+    )
+    op.create_index(op.f('ix_oauth_states_expires_at'), 'oauth_states', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_oauth_states_expires_at'), table_name='oauth_states')
+    op.drop_table('oauth_states')
@@ -0,0 +1,32 @@
+"""create rate limit buckets
+
+Revision ID: e5a0c3d9f261
+Revises: b7d25e9a4c18
+Create Date: 2026-10-16 17:48:12.530941
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a0c3d9f261'
+down_revision: Union[str, None] = 'b7d25e9a4c18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'rate_limit_buckets',
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('tat', sa.Double(), nullable=False),
+        sa.PrimaryKeyConstraint('key', name=op.f('pk_rate_limit_buckets')),
+    )
+    op.create_index(op.f('ix_rate_limit_buckets_tat'), 'rate_limit_buckets', ['tat'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_rate_limit_buckets_tat'), table_name='rate_limit_buckets')
+    op.drop_table('rate_limit_buckets')
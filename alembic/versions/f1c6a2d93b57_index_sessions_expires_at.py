@@ -0,0 +1,28 @@
+"""index sessions expires_at
+
+Revision ID: f1c6a2d93b57
+Revises: e5a0c3d9f261
+Create Date: 2026-10-16 18:32:40.117804
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db import online_migrations as online
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c6a2d93b57'
+down_revision: Union[str, None] = 'e5a0c3d9f261'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Lets the expiry sweeper find expired sessions without scanning the table
+    online.create_index_concurrently(op.f('ix_sessions_expires_at'), 'sessions', ['expires_at'])
+
+
+def downgrade() -> None:
+    online.drop_index_concurrently(op.f('ix_sessions_expires_at'), 'sessions')
@@ -1,20 +1,22 @@
 from typing import Generator, Annotated
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
-from pydantic import ValidationError
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core import security
+from app.core import rate_limit, security
+from app.core.revocation import revocation_list
 from app.core.config import settings
-from app.db.base import get_db # Import async get_db
+from app.db.base import get_db, get_read_db # Import async get_db / read-only get_read_db
 from app.db.models import User
-from app.schemas.token import TokenData
 from app.crud import crud_user
 
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="/api/v1/login/access-token" # Matches the login endpoint path
 )
+# Same scheme, but yields None instead of a 401 when no token is sent
+optional_oauth2_scheme = OAuth2PasswordBearer(
+    tokenUrl="/api/v1/login/access-token", auto_error=False
+)
 
 async def get_current_user(
     db: Annotated[AsyncSession, Depends(get_db)],
@@ -25,19 +27,15 @@ async def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = security.decode_access_token(token)
-        if payload is None:
-            raise credentials_exception
-        token_data = TokenData(**payload) # Validate payload structure
-
-        if token_data.sub is None:
-            raise credentials_exception
-
-    except (JWTError, ValidationError):
-         raise credentials_exception
+    # Signature check and payload validation are memoized per token until its exp
+    token_data = security.decode_access_token_cached(token)
+    if token_data is None or token_data.sub is None:
+        raise credentials_exception
+    # Cleared in-process by the revocation filter for all but revoked (or colliding) tokens
+    if token_data.jti and await revocation_list.is_revoked(token_data.jti):
+        raise credentials_exception
 
-    user = await crud_user.get_user(db, user_id=token_data.sub)
+    user = await crud_user.get_user_cached(db, user_id=token_data.sub)
     if user is None:
         raise credentials_exception
     # Add checks for user status if needed (e.g., if not user.is_active:)
@@ -52,4 +50,30 @@ async def get_current_active_user(
     # Example check:
     # if current_user.status != UserStatus.active:
     #     raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
\ No newline at end of file
+    return current_user
+
+# Dependency for admin-only endpoints
+async def get_current_admin_user(
+    current_user: Annotated[User, Depends(get_current_active_user)]
+) -> User:
+    if current_user.user_id not in settings.ADMIN_USER_IDS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+    return current_user
+
+
+def _client_ip(request: Request) -> str:
+    # Behind a proxy, run uvicorn with --proxy-headers so this is the real client
+    return request.client.host if request.client else "unknown"
+
+def rate_limit_by_ip(limit: rate_limit.RateLimit):
+    async def check(request: Request) -> None:
+        await rate_limit.rate_limiter.check(limit, _client_ip(request))
+    return check
+
+async def rate_limit_login(
+    request: Request,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+) -> None:
+    # Per IP, and per account across IPs; the form is parsed once and shared with the endpoint
+    await rate_limit.rate_limiter.check(rate_limit.LOGIN_PER_IP, _client_ip(request))
+    await rate_limit.rate_limiter.check(rate_limit.LOGIN_PER_IDENTIFIER, form_data.username.strip().lower())
@@ -0,0 +1,57 @@
+from functools import lru_cache
+from typing import Any, TypeVar
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError: # Optional; ships with fastapi[all]
+    orjson = None
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed (UUIDs and datetimes natively)."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+@lru_cache(maxsize=None)
+def _field_names(schema: type[BaseModel]) -> tuple[str, ...]:
+    return tuple(schema.model_fields)
+
+
+def trusted(schema: type[ModelT], obj: Any) -> ModelT:
+    """
+    Build `schema` from an ORM object without validating it again. Rows were
+    validated on the way in, and re-running validators on the way out (EmailStr
+    in particular) costs ~10x the serialization itself.
+    """
+    if not settings.FAST_JSON_RESPONSES:
+        return schema.model_validate(obj)
+    return schema.model_construct(**{name: getattr(obj, name) for name in _field_names(schema)})
+
+
+def model_response(model: BaseModel, *, response: Response | None = None, status_code: int = 200) -> Response:
+    """
+    Render an already-built response model straight to JSON bytes, so FastAPI
+    skips response_model validation. Headers and status set on the endpoint's
+    injected `response` (e.g. cookies) are carried over.
+    """
+    rendered = Response(
+        content=model.__pydantic_serializer__.to_json(model),
+        status_code=status_code,
+        media_type="application/json",
+    )
+    if response is not None:
+        rendered.headers.raw.extend(response.headers.raw)
+        if response.status_code:
+            rendered.status_code = response.status_code
+    return rendered
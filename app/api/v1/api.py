@@ -1,9 +1,11 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import auth, users
+from app.api.v1.endpoints import auth, health, users
+from app.core.timing import TimedRoute
 
-api_router = APIRouter()
+api_router = APIRouter(route_class=TimedRoute)
 api_router.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 api_router.include_router(users.router, prefix="/users", tags=["Users"])
+api_router.include_router(health.router, prefix="/health", tags=["Health"])
 
 # Add other routers here as application grows
\ No newline at end of file
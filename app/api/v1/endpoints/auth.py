@@ -1,21 +1,30 @@
-import uuid
+import secrets
+
+from datetime import datetime, timedelta, timezone
 
 from typing import Any, Annotated
-from fastapi import APIRouter, Depends, HTTPException, status, Body, Response
+from fastapi import APIRouter, Cookie, Depends, HTTPException, status, Body, Request, Response
+from fastapi.responses import RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
 from app import crud
+from app.crud import crud_session
 from app.schemas import user, token
 from app.api import deps
-from app.core import security
+from app.api.responses import model_response, trusted
+from app.core import oauth, rate_limit, security
+from app.core.activity import activity_buffer
 from app.core.config import settings
+from app.core.oauth_state import oauth_states
+from app.core.revocation import revocation_list
+from app.core.timing import TimedRoute
 from app.db.models import User  # Ensure the correct path to the User model
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
-@router.post("/register", response_model=user.User)
+@router.post("/register", response_model=user.User, dependencies=[Depends(deps.rate_limit_by_ip(rate_limit.REGISTER_PER_IP))])
 async def register_user(
     *,
     db: Annotated[AsyncSession, Depends(deps.get_db)],
@@ -24,40 +33,50 @@ async def register_user(
     """
     Create new user.
     """
-    user = await crud.crud_user.get_user_by_email(db, email=user_in.email)
-    if user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="An account with this email address already exists.",
-        )
-    if user_in.username:
-        user = await crud.crud_user.get_user_by_username(db, username=user_in.username)
-        if user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="An account with this username already exists.",
-            )
     try:
-        user = await crud.crud_user.create_user(db=db, obj_in=user_in)
-        # Add email verification logic here if desired (send email)
-        return user
-    except IntegrityError:  # Catch potential race condition duplicates
+        db_user = await crud.crud_user.create_user(db=db, obj_in=user_in)
+    except IntegrityError:  # Any constraint not covered by ON CONFLICT
         await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Account already exists with this email or username.",
         )
+    if db_user is None:
+        # Conflict path only: look up which unique field clashed for the message
+        if await crud.crud_user.get_user_by_email(db, email=user_in.email):
+            detail = "An account with this email address already exists."
+        else:
+            detail = "An account with this username already exists."
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+    # Add email verification logic here if desired (send email)
+    return model_response(trusted(user.User, db_user))
+
+
+REFRESH_COOKIE_PATH = "/api/v1/auth" # Refresh cookie is only sent to the auth endpoints
 
 
-@router.post("/login/access-token", response_model=token.Token)
+def _set_refresh_cookie(response: Response, refresh_token: str) -> None:
+    response.set_cookie(
+        key="refresh_token",
+        value=refresh_token,
+        httponly=True,
+        max_age=settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600,
+        path=REFRESH_COOKIE_PATH,
+        # secure=True,  # Should be True in production (HTTPS)
+        # samesite="lax" # Or "strict"
+    )
+
+
+@router.post("/login/access-token", response_model=token.Token, dependencies=[Depends(deps.rate_limit_login)])
 async def login_for_access_token(
+    request: Request,
     response: Response,  # Inject Response object to set cookie
     db: Annotated[AsyncSession, Depends(deps.get_db)],
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 ) -> Any:
     """
     OAuth2 compatible token login, get an access token for future requests.
-    Uses username or email.
+    Uses username or email. Also issues a refresh token for /refresh.
     """
     user = await crud.crud_user.authenticate_user(
         db, username_or_email=form_data.username, password=form_data.password
@@ -68,10 +87,17 @@ async def login_for_access_token(
             detail="Incorrect username/email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    activity_buffer.record_login(user.user_id) # Written in the background, off the request path
 
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
-        subject=user.user_id, expires_delta=access_token_expires
+        subject=user.user_id, expires_delta=access_token_expires, claims=security.access_token_claims(user)
+    )
+    refresh_token, _ = await crud_session.create_session(
+        db,
+        user_id=user.user_id,
+        ip_address=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent"),
     )
 
     # Set token in an HTTPOnly cookie (optional, common for web apps)
@@ -83,62 +109,168 @@ async def login_for_access_token(
         # secure=True,  # Should be True in production (HTTPS)
         # samesite="lax" # Or "strict"
     )
+    _set_refresh_cookie(response, refresh_token)
 
-    return {"access_token": access_token, "token_type": "bearer"}
+    return model_response(
+        token.Token(access_token=access_token, token_type="bearer", refresh_token=refresh_token), response=response
+    )
+
+
+@router.post("/refresh", response_model=token.Token)
+async def refresh_access_token(
+    request: Request,
+    response: Response,
+    db: Annotated[AsyncSession, Depends(deps.get_db)],
+    body: token.RefreshTokenRequest | None = None,
+    refresh_cookie: Annotated[str | None, Cookie(alias="refresh_token")] = None,
+) -> Any:
+    """
+    Rotate a refresh token (from the body or the refresh cookie) into a new
+    access token and refresh token. Costs one indexed lookup, no password check.
+    Reusing an already-rotated refresh token revokes every token of that login.
+    """
+    refresh_token = body.refresh_token if body else refresh_cookie
+    if not refresh_token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing refresh token")
+
+    rotated = await crud_session.rotate_session(
+        db,
+        refresh_token=refresh_token,
+        ip_address=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent"),
+    )
+    if rotated is None:
+        response.delete_cookie(key="refresh_token", path=REFRESH_COOKIE_PATH)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+        )
+    new_refresh_token, session = rotated
+
+    claims = {}
+    if settings.JWT_COMPACT_CLAIMS: # Fresh status / email_verified for the new token (usually a cache hit)
+        db_user = await crud.crud_user.get_user_cached(db, session.user_id)
+        claims = security.access_token_claims(db_user) if db_user is not None else {}
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = security.create_access_token(
+        subject=session.user_id, expires_delta=access_token_expires, claims=claims
+    )
+    response.set_cookie(
+        key="access_token",
+        value=f"Bearer {access_token}",
+        httponly=True,
+        max_age=int(access_token_expires.total_seconds()),
+    )
+    _set_refresh_cookie(response, new_refresh_token)
+
+    return model_response(
+        token.Token(access_token=access_token, token_type="bearer", refresh_token=new_refresh_token),
+        response=response,
+    )
+
+
+@router.post("/revoke")
+async def revoke_refresh_token(
+    response: Response,
+    db: Annotated[AsyncSession, Depends(deps.get_db)],
+    body: token.RefreshTokenRequest | None = None,
+    refresh_cookie: Annotated[str | None, Cookie(alias="refresh_token")] = None,
+):
+    """
+    Revoke a refresh token and every token rotated from the same login.
+    """
+    refresh_token = body.refresh_token if body else refresh_cookie
+    if refresh_token:
+        await crud_session.revoke_session(db, refresh_token=refresh_token)
+    response.delete_cookie(key="refresh_token", path=REFRESH_COOKIE_PATH)
+    return {"message": "Refresh token revoked"}
 
 
 @router.post("/logout")
-async def logout(response: Response):
+async def logout(
+    response: Response,
+    db: Annotated[AsyncSession, Depends(deps.get_db)],
+    bearer_token: Annotated[str | None, Depends(deps.optional_oauth2_scheme)] = None,
+    access_cookie: Annotated[str | None, Cookie(alias="access_token")] = None,
+    refresh_cookie: Annotated[str | None, Cookie(alias="refresh_token")] = None,
+):
     """
-    Removes the access token cookie.
-    Note: This doesn't invalidate the JWT itself (stateless).
-    Proper logout requires server-side token management (e.g., blocklist).
+    Removes the token cookies, revokes the refresh-token session and adds the
+    access token's `jti` to the revocation blocklist until it expires.
     """
+    access_token = bearer_token or (access_cookie or "").removeprefix("Bearer ")
+    payload = security.decode_access_token(access_token) if access_token else None
+    if payload and payload.get("jti") and payload.get("exp"):
+        await revocation_list.revoke(
+            payload["jti"], expires_at=datetime.fromtimestamp(payload["exp"], tz=timezone.utc)
+        )
+    if refresh_cookie:
+        await crud_session.revoke_session(db, refresh_token=refresh_cookie)
     response.delete_cookie(key="access_token")
+    response.delete_cookie(key="refresh_token", path=REFRESH_COOKIE_PATH)
     return {"message": "Successfully logged out"}
 
 
-# --- OAuth Stubs ---
+# --- OAuth ---
 
-@router.get("/login/oauth/{provider}")
-async def oauth_login(provider: str):
-    """
-    Redirects the user to the OAuth provider's authorization page. (STUB)
-    """
-    # In a real app:
-    # 1. Get provider config (client_id, redirect_uri, scopes, auth_url)
-    # 2. Generate state parameter for CSRF protection (store in session/cache)
-    # 3. Construct the authorization URL
-    # 4. Return RedirectResponse(auth_url)
-    allowed_providers = ["google", "github"] # Example
-    if provider not in allowed_providers:
+OAUTH_STATE_COOKIE = "oauth_state" # Binds the pending login to the browser that started it
+
+
+def _get_oauth_provider(provider: str) -> oauth.OAuthProvider:
+    oauth_provider = oauth.get_provider(provider)
+    if oauth_provider is None:
         raise HTTPException(status_code=404, detail=f"Provider '{provider}' not supported")
+    return oauth_provider
+
 
-    # Placeholder - replace with actual redirect logic
-    # from fastapi.responses import RedirectResponse
-    # state = "generate_random_state_here"
-    # auth_url = f"https://provider.com/auth?client_id=YOUR_ID&redirect_uri=YOUR_URI&scope=SCOPES&state={state}&response_type=code"
-    # return RedirectResponse(auth_url)
+def _oauth_redirect_uri(request: Request, provider: str) -> str:
+    # Must match the URI registered with the provider, so allow pinning the public base URL
+    if settings.OAUTH_REDIRECT_BASE_URL:
+        path = request.app.url_path_for("oauth_callback", provider=provider)
+        return settings.OAUTH_REDIRECT_BASE_URL.rstrip("/") + path
+    return str(request.url_for("oauth_callback", provider=provider))
 
-    return {"message": f"Redirect to {provider} OAuth page (Not Implemented)", "provider": provider}
+
+@router.get("/login/oauth/{provider}", dependencies=[Depends(deps.rate_limit_by_ip(rate_limit.OAUTH_PER_IP))])
+async def oauth_login(provider: str, request: Request):
+    """
+    Redirects the user to the OAuth provider's authorization page.
+    """
+    oauth_provider = _get_oauth_provider(provider)
+    # CSRF protection: single-use, stored server-side and checked against the cookie in the callback
+    state, nonce = await oauth_states.issue(provider, with_nonce=oauth_provider.uses_nonce)
+    auth_url = await oauth_provider.authorization_url(
+        redirect_uri=_oauth_redirect_uri(request, provider), state=state, nonce=nonce
+    )
+    redirect = RedirectResponse(auth_url, status_code=status.HTTP_302_FOUND)
+    redirect.set_cookie(
+        key=OAUTH_STATE_COOKIE,
+        value=state,
+        httponly=True,
+        max_age=settings.OAUTH_STATE_TTL_SECONDS,
+        path=request.app.url_path_for("oauth_callback", provider=provider),
+        samesite="lax", # Still sent on the provider's top-level redirect back to us
+    )
+    return redirect
 
 
-@router.get("/callback/oauth/{provider}")
+@router.get("/callback/oauth/{provider}", dependencies=[Depends(deps.rate_limit_by_ip(rate_limit.OAUTH_PER_IP))])
 async def oauth_callback(
-    provider: str,                              
-    db: Annotated[AsyncSession, Depends(deps.get_db)],  
-    response: Response,                          
-    code: str | None = None,                     
-    state: str | None = None,                    
-    error: str | None = None,                    
-    error_description: str | None = None,        
+    provider: str,
+    request: Request,
+    db: Annotated[AsyncSession, Depends(deps.get_db)],
+    code: str | None = None,
+    state: str | None = None,
+    error: str | None = None,
+    error_description: str | None = None,
+    state_cookie: Annotated[str | None, Cookie(alias=OAUTH_STATE_COOKIE)] = None,
 ):
     """
-    Handles the callback from the OAuth provider after user authorization. (STUB)
+    Handles the callback from the OAuth provider after user authorization:
+    exchanges the code for the user's verified identity, signs them in and
+    redirects to the frontend.
     """
-    allowed_providers = ["google", "github"] # Example
-    if provider not in allowed_providers:
-        raise HTTPException(status_code=404, detail=f"Provider '{provider}' not supported")
+    oauth_provider = _get_oauth_provider(provider)
 
     if error:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"OAuth Error: {error} - {error_description}")
@@ -146,41 +278,34 @@ async def oauth_callback(
     if not code:
          raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing authorization code")
 
-    # In a real app:
-    # 1. Verify 'state' parameter against stored value (CSRF protection)
-    # 2. Exchange 'code' for an access token with the provider (POST request to token URL)
-    # 3. Use provider's access token to fetch user profile info (email, name, provider ID)
-    # 4. Map provider info to `user.UserOAuthInfo`
-    # 5. Use `crud.crud_user.get_or_create_oauth_user(db, oauth_info=...)` to get/create local user
-    # 6. Create an internal JWT for your application (`security.create_access_token`)
-    # 7. Set the JWT cookie (like in password login)
-    # 8. Redirect user to the frontend application (e.g., dashboard) or return token
-
-    # Placeholder - replace with actual OAuth flow logic
-    print(f"Received callback from {provider} with code: {code}, state: {state}")
-
-    # --- Placeholder user creation ---
-    # Simulate fetching user info from provider
-    mock_user_info = user.UserOAuthInfo(
-        provider_name=provider,
-        provider_user_id=f"{provider}_{uuid.uuid4()}", # Fake provider ID
-        email=f"user_{uuid.uuid4()}@{provider}.example.com", # Fake email
-        username=f"{provider}_user_{uuid.uuid4()}"
+    if not state or not state_cookie or not secrets.compare_digest(state, state_cookie):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid OAuth state")
+    pending_login = await oauth_states.consume(state, provider)
+    if pending_login is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="OAuth state expired or already used")
+
+    # Provider failures surface as OAuthError (400) / OAuthProviderUnavailable (502), see app.main
+    oauth_info = await oauth_provider.fetch_user_info(
+        code=code, redirect_uri=_oauth_redirect_uri(request, provider), nonce=pending_login.nonce
     )
-    try:
-        user = await crud.crud_user.get_or_create_oauth_user(db=db, oauth_info=mock_user_info)
-    except Exception as e:
-        # Log the error
-        print(f"Error during OAuth user processing: {e}")
-        raise HTTPException(status_code=500, detail="Failed to process OAuth login")
+    db_user = await crud.crud_user.get_or_create_oauth_user(db=db, oauth_info=oauth_info)
+    activity_buffer.record_login(db_user.user_id)
 
     # --- Issue internal token ---
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
-        subject=user.user_id, expires_delta=access_token_expires
+        subject=db_user.user_id, expires_delta=access_token_expires, claims=security.access_token_claims(db_user)
+    )
+    refresh_token, _ = await crud_session.create_session(
+        db,
+        user_id=db_user.user_id,
+        ip_address=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent"),
     )
 
-    response.set_cookie(
+    # Redirect to the frontend; cookies go on the redirect itself
+    redirect = RedirectResponse(settings.OAUTH_SUCCESS_REDIRECT_URL, status_code=status.HTTP_302_FOUND)
+    redirect.set_cookie(
         key="access_token",
         value=f"Bearer {access_token}",
         httponly=True,
@@ -188,8 +313,8 @@ async def oauth_callback(
         secure=True,
         samesite="lax"
     )
-
-    # Option 2: Redirect to frontend (common for traditional web flows)
-    from fastapi.responses import RedirectResponse
-    frontend_url = "http://localhost:3000/dashboard?login=success" # Example redirect
-    return RedirectResponse(frontend_url)
\ No newline at end of file
+    _set_refresh_cookie(redirect, refresh_token)
+    redirect.delete_cookie(
+        key=OAUTH_STATE_COOKIE, path=request.app.url_path_for("oauth_callback", provider=provider)
+    )
+    return redirect
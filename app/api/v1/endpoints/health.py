@@ -0,0 +1,105 @@
+from typing import Any
+from fastapi import APIRouter, Response, status
+
+from app.core import oauth, security
+from app.core.activity import activity_buffer
+from app.core.expiry import expiry_sweeper
+from app.core.oauth_state import oauth_states
+from app.core.rate_limit import rate_limiter
+from app.core.revocation import revocation_list
+from app.core.startup import startup_report
+from app.core.timing import TimedRoute
+from app.crud import crud_user
+from app.db.base import get_pool_health
+
+router = APIRouter(route_class=TimedRoute)
+
+@router.get("/live")
+async def liveness() -> Any:
+    """
+    Liveness probe: the process is up and its event loop is serving requests.
+    """
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def readiness(response: Response) -> Any:
+    """
+    Readiness probe: 503 until startup warm-up has finished, while the database
+    health check is failing, and once shutdown has begun.
+    """
+    database = get_pool_health().healthy
+    ready = startup_report.ready and database
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"ready": ready, "warmed_up": startup_report.ready, "database": database}
+
+
+@router.get("/startup")
+async def startup_stats() -> Any:
+    """
+    Cold-start report: import time by package, and time spent in each warm-up step.
+    """
+    return startup_report.stats()
+
+
+@router.get("/hashing")
+async def hashing_stats() -> Any:
+    """
+    Password hashing admission stats: queue depth, in-flight jobs and rejections.
+    """
+    return security.hash_admission.stats()
+
+
+@router.get("/caches")
+async def cache_stats() -> Any:
+    """
+    Size and hit/miss counters for the in-process auth caches.
+    """
+    return {
+        "users": crud_user.user_cache.stats(),
+        "user_loader": crud_user.user_loader.stats(),
+        "tokens": security.token_cache.stats(),
+        "oauth_discovery": oauth.discovery_documents.stats(),
+        "oauth_jwks": oauth.jwks_documents.stats(),
+    }
+
+
+@router.get("/revocation")
+async def revocation_stats() -> Any:
+    """
+    Size of the access-token revocation filter and how often it avoided a store lookup.
+    """
+    return revocation_list.stats()
+
+
+@router.get("/activity")
+async def activity_stats() -> Any:
+    """
+    Buffered last-login / last-used timestamps waiting for the next batched flush.
+    """
+    return activity_buffer.stats()
+
+
+@router.get("/oauth-states")
+async def oauth_state_stats() -> Any:
+    """
+    Pending OAuth logins: issued, consumed and rejected states, and expired ones swept.
+    """
+    return oauth_states.stats()
+
+
+@router.get("/rate-limits")
+async def rate_limit_stats() -> Any:
+    """
+    Auth endpoint rate limiting: requests allowed, rejections per limit, and local buckets held.
+    """
+    return rate_limiter.stats()
+
+
+@router.get("/expiry")
+async def expiry_stats() -> Any:
+    """
+    Expired-row sweeper: rows deleted per table, partitions dropped and the last run's duration.
+    """
+    return expiry_sweeper.stats()
@@ -1,12 +1,28 @@
-from typing import Any, List, Annotated
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import base64
+import csv
+import io
+import json
+import uuid
+
+from datetime import datetime
+from functools import partial
+from typing import Any, AsyncIterator, List, Annotated, Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.crud import crud_user
 from app.schemas import user
 from app.api import deps
-from app.db.models import User # If needed for type hints
+from app.api.responses import model_response, trusted
+from app.core import security
+from app.core.config import settings
+from app.core.timing import TimedRoute
+from app.db.base import get_replica_router
+from app.db.models import User, UserStatus # If needed for type hints
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 @router.get("/me", response_model=user.User)
 async def read_users_me(
@@ -16,19 +32,122 @@ async def read_users_me(
     Get current user.
     """
     # User object is already fetched and validated by the dependency
-    return current_user
-
-# Optional: Endpoint to get all users (requires admin privileges usually)
-# @router.get("/", response_model=List[schemas.User])
-# async def read_users(
-#     db: Annotated[AsyncSession, Depends(deps.get_db)],
-#     skip: int = 0,
-#     limit: int = 100,
-#     # Add dependency for checking admin role here
-#     # current_user: models.User = Depends(deps.get_current_admin_user),
-# ) -> Any:
-#     """
-#     Retrieve users. (Requires admin rights - not implemented here)
-#     """
-#     users = await crud.crud_user.get_users(db, skip=skip, limit=limit)
-#     return users
\ No newline at end of file
+    return model_response(trusted(user.User, current_user))
+
+
+# --- Admin listing / export ---
+
+def _encode_cursor(db_user: User) -> str:
+    raw = f"{db_user.created_at.isoformat()}|{db_user.user_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        created_at, user_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(user_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+_EXPORT_FIELDS = list(user.User.model_fields)
+
+async def _export_ndjson(users: AsyncIterator[User]) -> AsyncIterator[str]:
+    async for db_user in users:
+        yield trusted(user.User, db_user).model_dump_json() + "\n"
+
+async def _export_csv(users: AsyncIterator[User]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=_EXPORT_FIELDS)
+    writer.writeheader()
+    async for db_user in users:
+        writer.writerow(trusted(user.User, db_user).model_dump(mode="json"))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+@router.get("", response_model=user.UserPage)
+async def read_users(
+    db: Annotated[AsyncSession, Depends(deps.get_read_db)],
+    current_user: Annotated[User, Depends(deps.get_current_admin_user)],
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+    user_status: Annotated[UserStatus | None, Query(alias="status")] = None,
+    email_verified: bool | None = None,
+    format: Literal["json", "ndjson", "csv"] = "json",
+) -> Any:
+    """
+    Retrieve users in (created_at, user_id) order using keyset pagination.
+    `format=ndjson|csv` streams every matching user instead of a single page.
+    """
+    if format != "json":
+        users = crud_user.iter_users(
+            get_replica_router().read_session,
+            chunk_size=settings.USER_EXPORT_CHUNK_SIZE,
+            status=user_status,
+            email_verified=email_verified,
+        )
+        if format == "csv":
+            return StreamingResponse(
+                _export_csv(users),
+                media_type="text/csv",
+                headers={"Content-Disposition": 'attachment; filename="users.csv"'},
+            )
+        return StreamingResponse(_export_ndjson(users), media_type="application/x-ndjson")
+
+    after = _decode_cursor(cursor) if cursor else None
+    users = await crud_user.get_users(
+        db, after=after, limit=limit, status=user_status, email_verified=email_verified
+    )
+    next_cursor = _encode_cursor(users[-1]) if len(users) == limit else None
+    return model_response(
+        user.UserPage.model_construct(items=[trusted(user.User, u) for u in users], next_cursor=next_cursor)
+    )
+
+# --- Bulk import ---
+
+async def _ndjson_records(request: Request) -> AsyncIterator[Any]:
+    # Parse the body line by line as it arrives instead of buffering it whole
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_record(line)
+    if pending.strip():
+        yield _parse_record(pending)
+
+def _parse_record(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None # Reported as an invalid row
+
+_import_slots = asyncio.Semaphore(settings.USER_IMPORT_MAX_CONCURRENT)
+
+@router.post("/import", response_model=user.UserImportResult)
+async def import_users(
+    request: Request,
+    db: Annotated[AsyncSession, Depends(deps.get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_admin_user)],
+    include_created: bool = False,
+) -> Any:
+    """
+    Bulk-create users from an NDJSON body (one `UserImport` object per line).
+    Rows are hashed a few at a time in the login hashing pool and inserted in
+    batches. The response counts every outcome and lists the conflicting and
+    invalid rows (plus the created ones with `include_created=true`), up to
+    USER_IMPORT_MAX_REPORTED_ROWS. For large files use `python -m app.cli import-users`.
+    """
+    if _import_slots.locked():
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="An import is already running")
+    async with _import_slots:
+        return await crud_user.import_users(
+            db,
+            _ndjson_records(request),
+            hash_passwords=partial(
+                security.get_password_hashes_admitted, concurrency=settings.USER_IMPORT_HASH_CONCURRENCY
+            ),
+            batch_size=settings.USER_IMPORT_BATCH_SIZE,
+            include_created=include_created,
+            max_rows=settings.USER_IMPORT_MAX_REPORTED_ROWS,
+        )
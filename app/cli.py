@@ -0,0 +1,76 @@
+"""
+Command-line entry points.
+
+    python -m app.cli import-users users.ndjson [--batch-size 1000] [--report report.ndjson] [--include-created]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+from typing import Any, AsyncIterator
+
+from app.core import security
+from app.core.config import settings
+from app.crud import crud_user
+from app.db.base import AsyncSessionLocal
+
+
+async def _read_ndjson(path: str) -> AsyncIterator[Any]:
+    with open(path, "rb") if path != "-" else sys.stdin.buffer as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None # Reported as an invalid row
+
+
+async def import_users(args: argparse.Namespace) -> int:
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        # Reported rows are written out as they come rather than collected
+        report = stack.enter_context(open(args.report, "w")) if args.report else None
+        # A process pool spanning every core: nothing else competes for CPU here, unlike in the API
+        hash_executor = stack.enter_context(ProcessPoolExecutor(max_workers=settings.USER_IMPORT_HASH_WORKERS or None))
+        async with AsyncSessionLocal() as db:
+            result = await crud_user.import_users(
+                db,
+                _read_ndjson(args.path),
+                hash_passwords=partial(security.get_password_hashes_async, hash_executor),
+                batch_size=args.batch_size,
+                include_created=args.include_created,
+                max_rows=0, # Nothing is kept in memory; see on_row
+                on_row=(lambda row: report.write(row.model_dump_json(exclude_none=True) + "\n")) if report else None,
+            )
+    elapsed = time.perf_counter() - started
+
+    total = result.created + result.conflicts + result.invalid
+    print(
+        f"{total} rows in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} rows/s): "
+        f"{result.created} created, {result.conflicts} conflicts, {result.invalid} invalid"
+    )
+    return 0 if result.invalid == 0 else 1
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_cmd = commands.add_parser("import-users", help="Bulk-create users from an NDJSON file ('-' for stdin)")
+    import_cmd.add_argument("path")
+    import_cmd.add_argument("--batch-size", type=int, default=settings.USER_IMPORT_BATCH_SIZE)
+    import_cmd.add_argument("--report", help="Write conflicting and invalid rows to this NDJSON file")
+    import_cmd.add_argument("--include-created", action="store_true", help="Also report created rows and their user_id")
+    import_cmd.set_defaults(handler=import_users)
+
+    args = parser.parse_args(argv)
+    return asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.crud.bulk import bulk_update_timestamps
+from app.db.base import AsyncSessionLocal
+from app.db.models import User
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityBuffer:
+    """
+    Write-behind buffer for users.last_login_at. Recording is a dict
+    assignment on the hot path; a background task flushes the latest
+    timestamp per user in one batched UPDATE every ACTIVITY_FLUSH_SECONDS.
+    (sessions.last_used_at needs no buffer: refresh-token rotation sets it
+    in the UPDATE that consumes the session anyway.)
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession], flush_seconds: float, max_pending: int):
+        self.session_factory = session_factory
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self._logins: dict[uuid.UUID, datetime] = {}
+        self._task: asyncio.Task | None = None
+        self._flush_now: asyncio.Event | None = None
+        self._stopping = False
+        self.flushed_rows = 0
+        self.flush_errors = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._logins)
+
+    def record_login(self, user_id: uuid.UUID) -> None:
+        self._logins[user_id] = datetime.now(timezone.utc)
+        self._maybe_flush_early()
+
+    def _maybe_flush_early(self) -> None:
+        if self.pending >= self.max_pending and self._flush_now is not None:
+            self._flush_now.set()
+
+    async def flush(self) -> None:
+        # Swap the buffers first so records made during the flush land in the next batch
+        logins, self._logins = self._logins, {}
+        if not logins:
+            return
+        try:
+            async with self.session_factory() as db:
+                await bulk_update_timestamps(db, User.user_id, User.last_login_at, list(logins.items()))
+            self.flushed_rows += len(logins)
+        except Exception:
+            # Activity timestamps are best-effort; drop the batch rather than retry forever
+            self.flush_errors += 1
+            logger.exception("Failed to flush %d activity timestamps", len(logins))
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        self._stopping = False
+        self._flush_now = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and write out whatever is still buffered."""
+        if self._task is not None:
+            self._stopping = True
+            self._flush_now.set()
+            await self._task # Lets an in-progress flush finish instead of cancelling it
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending_logins": len(self._logins),
+            "flushed_rows": self.flushed_rows,
+            "flush_errors": self.flush_errors,
+        }
+
+
+activity_buffer = ActivityBuffer(
+    AsyncSessionLocal,
+    flush_seconds=settings.ACTIVITY_FLUSH_SECONDS,
+    max_pending=settings.ACTIVITY_MAX_PENDING,
+)
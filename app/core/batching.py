@@ -0,0 +1,74 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, Sequence, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class BatchLoader(Generic[K, V]):
+    """
+    Request coalescing for keyed lookups (single-flight + dataloader).
+
+    `load(key)` calls made in the same event-loop tick are merged into one
+    `load_many(keys)` call, and a key already being loaded joins that load
+    instead of starting another. `load_many` returns {key: value}; keys it
+    leaves out resolve to None. Values are shared between callers, so they
+    must not be mutated (or bound to a caller's session).
+    """
+
+    def __init__(self, load_many: Callable[[Sequence[K]], Awaitable[dict[K, V]]], *, max_batch_size: int = 100):
+        self.load_many = load_many
+        self.max_batch_size = max_batch_size
+        self._queue: list[K] = [] # Keys waiting for the next dispatch
+        self._inflight: dict[K, asyncio.Future] = {} # Queued or being loaded
+        self._tasks: set[asyncio.Task] = set() # The loop only keeps weak references to tasks
+        self.loads = 0
+        self.coalesced = 0
+        self.batches = 0
+
+    async def load(self, key: K) -> V | None:
+        self.loads += 1
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            if not self._queue:
+                asyncio.get_running_loop().call_soon(self._dispatch)
+            self._queue.append(key)
+        else:
+            self.coalesced += 1
+        # shield: a cancelled caller must not cancel the load for the others
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        queue, self._queue = self._queue, []
+        for start in range(0, len(queue), self.max_batch_size):
+            task = asyncio.create_task(self._run_batch(queue[start:start + self.max_batch_size]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, keys: list[K]) -> None:
+        self.batches += 1
+        try:
+            values = await self.load_many(keys)
+        except BaseException as exc:
+            for key in keys:
+                future = self._inflight.pop(key)
+                if not future.done():
+                    future.set_exception(exc)
+                    future.exception() # Marked retrieved: callers may all have been cancelled
+            if not isinstance(exc, Exception):
+                raise
+            return
+        for key in keys:
+            future = self._inflight.pop(key)
+            if not future.done():
+                future.set_result(values.get(key))
+
+    def stats(self) -> dict:
+        return {
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "queries_saved": self.loads - self.batches,
+        }
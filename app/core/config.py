@@ -1,4 +1,5 @@
 import os
+import uuid
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 
@@ -6,8 +7,133 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
     DATABASE_URL: str
 
+    # Asymmetric access tokens (ALGORITHM=ES256/RS256), see app.core.jwt_keys
+    JWT_SIGNING_KEYS: dict[str, str] = {} # kid -> PEM or PEM file path; public keys are verify-only
+    JWT_ACTIVE_KID: str | None = None # Signing key (default: the last one listed)
+    JWT_ISSUER: str | None = None # `iss` claim, set and checked when configured
+    JWT_AUDIENCE: str | None = None # `aud` claim, set and checked when configured
+    JWT_COMPACT_CLAIMS: bool = False # Add status/email_verified so other services skip the user lookup
+    JWKS_MAX_AGE_SECONDS: int = 3600 # Cache-Control for /.well-known/jwks.json; publish new keys this long before use
+
+    # Async engine / connection pool
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30 # Seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800 # Replace connections older than this (seconds)
+    DB_POOL_PREWARM: int = 2 # Connections opened per engine at startup, before the app reports ready (capped at DB_POOL_SIZE)
+    DB_POOL_PRE_PING: bool = False # Per-checkout ping; DB_HEALTH_CHECK_SECONDS is the cheaper alternative
+    DB_HEALTH_CHECK_SECONDS: float = 30 # Background health probe interval (0 disables)
+    DB_STATEMENT_CACHE_SIZE: int = 100 # asyncpg prepared statements per connection (0 for pgbouncer)
+    DB_ECHO: bool = False
+
+    # Read replicas, e.g. '["postgresql+asyncpg://.../replica1"]'. Two SQLite files work as local stand-ins.
+    DATABASE_REPLICA_URLS: list[str] = []
+    REPLICA_BALANCING: str = "round_robin" # or "least_connections"
+    REPLICA_READ_YOUR_WRITES_SECONDS: float = 5 # Reads of just-written users stay on the primary this long
+
+    # Password hashing worker pool (bcrypt runs off the event loop)
+    PASSWORD_HASH_EXECUTOR: str = "thread" # "thread" or "process"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64 # Max callers waiting for a free worker
+    PASSWORD_HASH_LATENCY_BUDGET_MS: int = 1000 # Shed new hashes when the expected wait exceeds this
+
+    # Authenticated-user cache used by get_current_user (0 disables it)
+    USER_CACHE_TTL_SECONDS: int = 30 # Max delay before status changes are seen
+    USER_CACHE_MAX_SIZE: int = 10000
+    USER_BATCH_LOADING: bool = True # Coalesce concurrent user lookups into shared, batched queries
+    USER_LOADER_MAX_BATCH_SIZE: int = 100
+
+    # Decoded access-token cache (entries also expire with the token itself)
+    TOKEN_CACHE_TTL_SECONDS: int = 300
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+
+    # Admin endpoints (user listing / export); roles are not modelled yet
+    ADMIN_USER_IDS: list[uuid.UUID] = [] # e.g. '["<user_id>"]'; everyone else gets a 403
+    USER_EXPORT_CHUNK_SIZE: int = 1000 # Rows per server-side cursor chunk
+
+    # Bulk user import
+    USER_IMPORT_BATCH_SIZE: int = 1000 # Rows per multi-row INSERT
+    USER_IMPORT_HASH_WORKERS: int = 0 # CLI import: processes hashing passwords (0 = all cores)
+    USER_IMPORT_HASH_CONCURRENCY: int = 2 # API import: login-pool workers one import may occupy
+    USER_IMPORT_MAX_CONCURRENT: int = 1 # API imports running at once per worker; more get a 429
+    USER_IMPORT_MAX_REPORTED_ROWS: int = 1000 # API import: rows listed in the response; the rest are only counted
+
+    # Access-token revocation
+    TOKEN_REVOCATION_BACKEND: str = "database" # "database" or "memory" (single-process stand-in)
+    REVOCATION_SYNC_SECONDS: float = 5 # Max delay before another worker's revocations apply
+    REVOCATION_SYNC_LOOKBACK_SECONDS: float = 10 # Re-read this far behind the newest revoked_at seen (late commits)
+    REVOCATION_REBUILD_SECONDS: float = 300 # Rebuild the filter without expired entries
+    REVOCATION_FILTER_CAPACITY: int = 100000
+    REVOCATION_FILTER_ERROR_RATE: float = 0.001
+
+    # Write-behind buffer for last_login_at
+    ACTIVITY_FLUSH_SECONDS: float = 5
+    ACTIVITY_MAX_PENDING: int = 10000 # Flush early once this many rows are buffered
+
+    # Per-request latency breakdown (always recorded for /metrics)
+    SERVER_TIMING_HEADER: bool = False # Also expose it as a Server-Timing header (debugging; spans leak server-side work to clients)
+
+    # Response rendering (app.api.responses)
+    FAST_JSON_RESPONSES: bool = True # Skip re-validating ORM rows on the way out; orjson for plain dicts
+
+    # OAuth providers (app.core.oauth); a provider is enabled once its client id is set
+    OAUTH_GOOGLE_CLIENT_ID: str | None = None
+    OAUTH_GOOGLE_CLIENT_SECRET: str | None = None
+    OAUTH_GOOGLE_DISCOVERY_URL: str = "https://accounts.google.com/.well-known/openid-configuration"
+    OAUTH_GITHUB_CLIENT_ID: str | None = None
+    OAUTH_GITHUB_CLIENT_SECRET: str | None = None
+    OAUTH_GITHUB_AUTHORIZE_URL: str = "https://github.com/login/oauth/authorize"
+    OAUTH_GITHUB_TOKEN_URL: str = "https://github.com/login/oauth/access_token"
+    OAUTH_GITHUB_API_URL: str = "https://api.github.com"
+    OAUTH_REDIRECT_BASE_URL: str | None = None # Public base URL for callback redirect_uris (default: the request's)
+    OAUTH_SUCCESS_REDIRECT_URL: str = "http://localhost:3000/dashboard?login=success"
+    OAUTH_HTTP_TIMEOUT_SECONDS: float = 10
+    OAUTH_HTTP_CONNECT_TIMEOUT_SECONDS: float = 3
+    OAUTH_HTTP_MAX_CONNECTIONS: int = 100
+    OAUTH_HTTP_MAX_KEEPALIVE: int = 20 # Idle connections kept open per process, so callbacks skip TLS handshakes
+    OAUTH_DISCOVERY_TTL_SECONDS: float = 3600
+    OAUTH_JWKS_TTL_SECONDS: float = 3600 # An unknown `kid` triggers an early refresh (key rotation)
+    OAUTH_STATE_BACKEND: str = "database" # "database" (shared by all workers) or "memory" (single-process stand-in)
+    OAUTH_STATE_TTL_SECONDS: int = 600 # Time the user has to finish the provider's consent screen
+    OAUTH_STATE_MAX_ENTRIES: int = 100000 # Memory backend bound; the oldest pending logins are evicted first
+    OAUTH_STATE_SWEEP_SECONDS: float = 60
+    OAUTH_STATE_SWEEP_BATCH_SIZE: int = 1000 # Expired rows deleted per statement
+
+    # Rate limits for login / register / OAuth ("<count>/<second|minute|hour|day>" or "<count>/<n>s")
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory" # "memory" (per worker) or "database" (shared, checked after the local limit)
+    RATE_LIMIT_LOGIN_PER_IP: str = "30/minute"
+    RATE_LIMIT_LOGIN_PER_IDENTIFIER: str = "10/minute" # Per email/username, against credential guessing across IPs
+    RATE_LIMIT_REGISTER_PER_IP: str = "10/minute"
+    RATE_LIMIT_OAUTH_PER_IP: str = "30/minute"
+    RATE_LIMIT_SHARDS: int = 16
+    RATE_LIMIT_MAX_KEYS: int = 100000 # Local buckets kept per worker; idle ones are dropped first
+    RATE_LIMIT_SWEEP_SECONDS: float = 60
+    RATE_LIMIT_SWEEP_BATCH_SIZE: int = 1000
+
+    # Background deletion of expired sessions and revoked tokens (app.core.expiry)
+    EXPIRY_SWEEP_SECONDS: float = 300 # 0 disables the sweeper
+    EXPIRY_SWEEP_BATCH_SIZE: int = 1000 # Rows per DELETE; small batches keep row locks and WAL bursts short
+    EXPIRY_SWEEP_BATCH_PAUSE_SECONDS: float = 0.05 # Pause between batches so replicas and vacuum keep up
+    EXPIRY_SWEEP_MAX_BATCHES: int = 500 # Per table per run; the rest waits for the next run
+    SESSION_EXPIRED_RETENTION_DAYS: int = 1 # Expired sessions kept this long before deletion
+    SESSION_PARTITION_DAYS: int = 7 # Range width when sessions is partitioned (alembic -n sessions_partitioning)
+    EXPIRY_SWEEP_LOCK_TIMEOUT_MS: int = 2000 # Creating or dropping a partition gives up (until the next run) rather than queue behind traffic
+
+    # Cold start (app.core.warmup): work done before /api/v1/health/ready reports ready
+    STARTUP_WARMUP: bool = True
+    STARTUP_WARMUP_TIMEOUT_SECONDS: float = 30 # Report ready anyway after this; what is left happens on first use
+
+    # Online migrations (app.db.online_migrations, applied by alembic/env.py)
+    MIGRATION_LOCK_TIMEOUT_MS: int = 5000 # Give up on a lock rather than block writers queued behind it
+    MIGRATION_STATEMENT_TIMEOUT_MS: int = 0 # 0 = no limit (CONCURRENTLY builds can take hours)
+    MIGRATION_LOCK_RETRIES: int = 5
+    MIGRATION_BACKFILL_BATCH_SIZE: int = 5000
+    MIGRATION_BACKFILL_SLEEP_SECONDS: float = 0.1 # Pause between backfill batches
+
     class Config:
         env_file = ".env"
         extra = "ignore" # Ignore extra fields from environment
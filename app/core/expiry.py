@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, NamedTuple
+
+from sqlalchemy import Connection, column, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.core.config import settings
+from app.crud import crud_revocation, crud_session
+from app.db import partitions
+from app.db.base import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Background deletion of expired rows from the TTL'd auth tables.
+#
+# Each table is swept in small batches (one index-ordered DELETE ... LIMIT per
+# transaction, with a pause in between), so no statement holds many row locks
+# or writes a burst of WAL, and a backlog is worked off over several runs
+# instead of in one long delete. Batches use SKIP LOCKED, so the sweepers of
+# several workers share the work instead of queueing on each other.
+#
+# When `sessions` has been range-partitioned by expires_at (the opt-in
+# sessions_partitioning migrations, see alembic.ini), expired sessions go a
+# partition at a time (DROP TABLE), and the sweeper also creates the partitions
+# new sessions will need. Row deletes are then only needed for the default
+# partition.
+#
+# oauth_states and rate_limit_buckets are swept by app.core.oauth_state and
+# app.core.rate_limit, which also handle their in-memory backends.
+
+ROWS_DELETED = metrics.counter("expiry_rows_deleted_total", "Expired rows deleted by the expiry sweeper.", ("table",))
+PARTITIONS_DROPPED = metrics.counter("expiry_partitions_dropped_total", "Expired partitions dropped.", ("table",))
+SWEEP_SECONDS = metrics.histogram(
+    "expiry_sweep_seconds", "Time to sweep one table, pauses included.", ("table",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+
+_SESSIONS_DEFAULT_PARTITION = table(
+    partitions.default_partition("sessions"), column("session_id"), column("expires_at")
+)
+
+
+class SweepTarget(NamedTuple):
+    table: str
+    delete_batch: Callable[[AsyncSession, int], Awaitable[int]] # Deletes up to n expired rows, returns how many
+
+
+def _session_cutoff() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(days=settings.SESSION_EXPIRED_RETENTION_DAYS)
+
+
+async def _delete_sessions(db: AsyncSession, batch_size: int) -> int:
+    return await crud_session.delete_expired_sessions(db, before=_session_cutoff(), batch_size=batch_size)
+
+
+async def _delete_sessions_default_partition(db: AsyncSession, batch_size: int) -> int:
+    return await crud_session.delete_expired_sessions(
+        db, before=_session_cutoff(), batch_size=batch_size, table=_SESSIONS_DEFAULT_PARTITION
+    )
+
+
+async def _delete_revocations(db: AsyncSession, batch_size: int) -> int:
+    return await crud_revocation.delete_expired_revocations(db, batch_size=batch_size)
+
+
+# Arbitrary key for pg_try_advisory_xact_lock: one worker at a time maintains the partitions
+_PARTITION_MAINTENANCE_LOCK = 0x5E55_1045
+
+
+def _maintain_session_partitions(conn: Connection) -> list[str]:
+    if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _PARTITION_MAINTENANCE_LOCK}).scalar():
+        return [] # Another worker is at it
+    # Runs in the sweeper's transaction; DDL waits at most the lock timeout for the parent table
+    conn.execute(text(f"SET LOCAL lock_timeout = {int(settings.EXPIRY_SWEEP_LOCK_TIMEOUT_MS)}"))
+    today = datetime.now(timezone.utc).date()
+    partitions.create_partitions(
+        conn, "sessions", "sessions",
+        start=today,
+        through=today + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS + settings.SESSION_PARTITION_DAYS),
+        days=settings.SESSION_PARTITION_DAYS,
+    )
+    return partitions.drop_partitions_before(conn, "sessions", "sessions", _session_cutoff().date())
+
+
+class ExpirySweeper:
+    def __init__(self, session_factory: Callable[[], AsyncSession]):
+        self.session_factory = session_factory
+        self.sessions_partitioned: bool | None = None # Detected on every run, as the migration can run at any time
+        self._task: asyncio.Task | None = None
+        self.runs = 0
+        self.deleted: dict[str, int] = {}
+        self.partitions_dropped = 0
+        self.last_run_seconds: float | None = None
+
+    async def _detect_partitioning(self) -> bool:
+        async with self.session_factory() as db:
+            return await db.run_sync(lambda session: partitions.is_partitioned(session.connection(), "sessions"))
+
+    def targets(self) -> list[SweepTarget]:
+        if self.sessions_partitioned:
+            sessions = SweepTarget(_SESSIONS_DEFAULT_PARTITION.name, _delete_sessions_default_partition)
+        else:
+            sessions = SweepTarget("sessions", _delete_sessions)
+        return [sessions, SweepTarget("revoked_tokens", _delete_revocations)]
+
+    async def sweep_table(self, target: SweepTarget) -> int:
+        """Delete expired rows of one table, a batch per transaction, up to EXPIRY_SWEEP_MAX_BATCHES."""
+        batch_size = settings.EXPIRY_SWEEP_BATCH_SIZE
+        started = time.perf_counter()
+        deleted = 0
+        for _ in range(settings.EXPIRY_SWEEP_MAX_BATCHES):
+            async with self.session_factory() as db:
+                count = await target.delete_batch(db, batch_size)
+            deleted += count
+            ROWS_DELETED.inc(count, table=target.table)
+            if count < batch_size:
+                break
+            await asyncio.sleep(settings.EXPIRY_SWEEP_BATCH_PAUSE_SECONDS)
+        SWEEP_SECONDS.observe(time.perf_counter() - started, table=target.table)
+        self.deleted[target.table] = self.deleted.get(target.table, 0) + deleted
+        return deleted
+
+    async def maintain_partitions(self) -> list[str]:
+        async with self.session_factory() as db:
+            dropped = await db.run_sync(lambda session: _maintain_session_partitions(session.connection()))
+            await db.commit()
+        if dropped:
+            logger.info("Dropped expired session partitions: %s", ", ".join(dropped))
+            PARTITIONS_DROPPED.inc(len(dropped), table="sessions")
+            self.partitions_dropped += len(dropped)
+        return dropped
+
+    async def sweep(self) -> dict[str, int]:
+        started = time.perf_counter()
+        self.sessions_partitioned = await self._detect_partitioning()
+        if self.sessions_partitioned:
+            try:
+                await self.maintain_partitions()
+            except Exception:
+                # Typically a lock timeout; the row sweep below still runs
+                logger.exception("Session partition maintenance failed")
+        result = {}
+        for target in self.targets():
+            result[target.table] = await self.sweep_table(target)
+        self.runs += 1
+        self.last_run_seconds = time.perf_counter() - started
+        return result
+
+    async def _run(self) -> None:
+        # Jittered first run, so workers started together do not sweep in lockstep
+        await asyncio.sleep(random.uniform(0, settings.EXPIRY_SWEEP_SECONDS))
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("Expiry sweep failed")
+            await asyncio.sleep(settings.EXPIRY_SWEEP_SECONDS)
+
+    def start(self) -> None:
+        if settings.EXPIRY_SWEEP_SECONDS > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "sessions_partitioned": self.sessions_partitioned,
+            "runs": self.runs,
+            "deleted": dict(self.deleted),
+            "partitions_dropped": self.partitions_dropped,
+            "last_run_seconds": self.last_run_seconds,
+        }
+
+
+expiry_sweeper = ExpirySweeper(AsyncSessionLocal)
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from jose.backends.base import Key
+
+logger = logging.getLogger(__name__)
+
+# Access-token signing keys.
+#
+# With HS256 (the default) tokens are signed with SECRET_KEY and only this app
+# can verify them. With ES256/RS256 they are signed with the active private key
+# of a key ring and carry its `kid`; the public halves are published as a JWKS
+# (/.well-known/jwks.json) so other services verify tokens locally. Keys are
+# parsed once, by get_key_ring() (called from create_app), together with the
+# python-jose / cryptography imports: a token costs a dict lookup by `kid`, not
+# a PEM parse.
+#
+# Rotation: add the new key to JWT_SIGNING_KEYS (published, not yet used), wait
+# for JWKS caches to refresh, point JWT_ACTIVE_KID at it, then drop the old key
+# once ACCESS_TOKEN_EXPIRE_MINUTES have passed. An ES256 key can be generated with
+#   openssl ecparam -name prime256v1 -genkey -noout | openssl pkcs8 -topk8 -nocrypt
+
+_CURVE_ALGORITHMS = {"secp256r1": "ES256", "secp384r1": "ES384", "secp521r1": "ES512"}
+
+
+class JWTKey(NamedTuple):
+    kid: str | None
+    algorithm: str
+    signing: "Key | None" # None for verification-only (public) keys
+    verifying: "Key"
+    public_jwk: dict | None # JWKS entry; None for shared secrets
+
+
+def _read_pem(value: str) -> bytes:
+    # Inline PEM, or the path of a PEM file (friendlier for mounted secrets)
+    if value.lstrip().startswith("-----BEGIN"):
+        return value.encode()
+    return Path(value).read_bytes()
+
+
+def _algorithm_for(key: Any) -> str:
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+    if isinstance(key, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)):
+        if key.curve.name not in _CURVE_ALGORITHMS:
+            raise ValueError(f"Unsupported EC curve for JWT signing: {key.curve.name}")
+        return _CURVE_ALGORITHMS[key.curve.name]
+    if isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+        return "RS256"
+    raise ValueError(f"Unsupported JWT signing key type: {type(key).__name__}")
+
+
+def load_key(kid: str, value: str) -> JWTKey:
+    """Parse one JWT_SIGNING_KEYS entry: a private key signs and verifies, a public key only verifies."""
+    from cryptography.hazmat.primitives import serialization
+    from jose import jwk
+
+    pem = _read_pem(value)
+    if b"PRIVATE KEY" in pem:
+        private = serialization.load_pem_private_key(pem, password=None)
+        algorithm = _algorithm_for(private)
+        signing = jwk.construct(pem, algorithm)
+        verifying = signing.public_key()
+    else:
+        algorithm = _algorithm_for(serialization.load_pem_public_key(pem))
+        signing = None
+        verifying = jwk.construct(pem, algorithm)
+    public_jwk = {**verifying.to_dict(), "kid": kid, "use": "sig", "alg": algorithm}
+    return JWTKey(kid, algorithm, signing, verifying, public_jwk)
+
+
+class KeyRing:
+    def __init__(self, keys: list[JWTKey], active_kid: str | None):
+        self._keys = {key.kid: key for key in keys}
+        if active_kid not in self._keys or self._keys[active_kid].signing is None:
+            raise ValueError(f"JWT_ACTIVE_KID {active_kid!r} is not a configured private key")
+        self.signing_key = self._keys[active_kid]
+        # Rendered once; the JWKS only changes with the configuration
+        jwks = {"keys": [key.public_jwk for key in keys if key.public_jwk is not None]}
+        self.jwks_json = json.dumps(jwks, separators=(",", ":")).encode()
+        self.jwks_etag = f'"{hashlib.sha256(self.jwks_json).hexdigest()[:32]}"'
+
+    def verification_key(self, kid: str | None) -> JWTKey | None:
+        return self._keys.get(kid)
+
+    @classmethod
+    def from_settings(cls) -> "KeyRing":
+        from jose import jwk
+
+        if settings.ALGORITHM.startswith("HS"):
+            secret = jwk.construct(settings.SECRET_KEY, settings.ALGORITHM)
+            return cls([JWTKey(None, settings.ALGORITHM, secret, secret, None)], None)
+
+        if not settings.JWT_SIGNING_KEYS:
+            raise ValueError(f"ALGORITHM={settings.ALGORITHM} needs at least one key in JWT_SIGNING_KEYS")
+        keys = [load_key(kid, value) for kid, value in settings.JWT_SIGNING_KEYS.items()]
+        active_kid = settings.JWT_ACTIVE_KID or next(reversed(settings.JWT_SIGNING_KEYS))
+        ring = cls(keys, active_kid)
+        if ring.signing_key.algorithm != settings.ALGORITHM:
+            raise ValueError(
+                f"JWT_ACTIVE_KID {active_kid!r} is an {ring.signing_key.algorithm} key, but ALGORITHM={settings.ALGORITHM}"
+            )
+        logger.info("Signing access tokens with %s key %r (%d keys published)", settings.ALGORITHM, active_kid, len(keys))
+        return ring
+
+
+@lru_cache()
+def get_key_ring() -> KeyRing:
+    return KeyRing.from_settings()
+
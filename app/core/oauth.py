@@ -0,0 +1,323 @@
+import asyncio
+import logging
+import secrets
+import time
+from abc import ABC, abstractmethod
+from typing import Any
+from urllib.parse import urlencode
+
+import httpx
+
+from app.core import metrics, timing
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.schemas.user import UserOAuthInfo
+
+logger = logging.getLogger(__name__)
+
+# OAuth / OIDC provider clients.
+#
+# Every provider shares one keep-alive connection pool (opened in the app
+# lifespan), so a callback pays for the provider's work rather than for new TCP
+# and TLS handshakes. Discovery documents and JWKS are cached with a TTL; a
+# token signed with an unknown `kid` refreshes the JWKS early (key rotation).
+
+PROVIDER_REQUEST_DURATION = metrics.histogram(
+    "oauth_provider_request_seconds", "Time spent in requests to OAuth providers.", ("provider", "operation")
+)
+
+
+class OAuthError(Exception):
+    """The provider rejected the login (bad code, unverified email, invalid id_token)."""
+
+
+class OAuthProviderUnavailable(OAuthError):
+    """The provider timed out, failed or returned something unusable."""
+
+
+class OAuthHttpClient:
+    def __init__(self):
+        self._client: httpx.AsyncClient | None = None
+
+    def start(self, transport: httpx.AsyncBaseTransport | None = None) -> None:
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.OAUTH_HTTP_TIMEOUT_SECONDS, connect=settings.OAUTH_HTTP_CONNECT_TIMEOUT_SECONDS
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.OAUTH_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OAUTH_HTTP_MAX_KEEPALIVE,
+            ),
+            headers={"Accept": "application/json"},
+            transport=transport,
+        )
+
+    async def stop(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, provider: str, operation: str, method: str, url: str, **kwargs: Any) -> Any:
+        """Send a request and return its JSON body, mapping failures to OAuth errors."""
+        if self._client is None:
+            self.start() # Lifespan not run (scripts, tests)
+        started = time.perf_counter()
+        try:
+            with timing.span("oauth"):
+                response = await self._client.request(method, url, **kwargs)
+        except httpx.TimeoutException as exc:
+            raise OAuthProviderUnavailable(f"{provider} {operation} request timed out") from exc
+        except httpx.HTTPError as exc:
+            raise OAuthProviderUnavailable(f"{provider} {operation} request failed: {exc}") from exc
+        finally:
+            PROVIDER_REQUEST_DURATION.observe(time.perf_counter() - started, provider=provider, operation=operation)
+
+        if response.status_code >= 500:
+            raise OAuthProviderUnavailable(f"{provider} {operation} returned {response.status_code}")
+        if response.status_code >= 400:
+            raise OAuthError(f"{provider} rejected the {operation} request ({response.status_code})")
+        try:
+            return response.json()
+        except ValueError as exc:
+            raise OAuthProviderUnavailable(f"{provider} {operation} returned invalid JSON") from exc
+
+
+class DocumentCache:
+    """
+    TTL cache of provider JSON documents (discovery, JWKS) keyed by URL, with at
+    most one fetch in flight per URL so an expiry doesn't stampede the provider.
+    """
+
+    def __init__(self, http: OAuthHttpClient, ttl: float, min_refresh_seconds: float = 60):
+        self.http = http
+        self.min_refresh_seconds = min_refresh_seconds
+        self._cache = TTLCache(maxsize=64, ttl=ttl)
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._fetched_at: dict[str, float] = {}
+
+    async def get(self, provider: str, operation: str, url: str, *, refresh: bool = False) -> Any:
+        document = self._cache.get(url)
+        if document is not None and not refresh:
+            return document
+        lock = self._locks.setdefault(url, asyncio.Lock())
+        async with lock:
+            document = self._cache.get(url)
+            recently_fetched = time.monotonic() - self._fetched_at.get(url, float("-inf")) < self.min_refresh_seconds
+            # Another waiter fetched it meanwhile, or a forced refresh just happened
+            if document is not None and (not refresh or recently_fetched):
+                return document
+            document = await self.http.request(provider, operation, "GET", url)
+            self._cache.set(url, document)
+            self._fetched_at[url] = time.monotonic()
+            return document
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+class OAuthProvider(ABC):
+    name: str
+    scopes: tuple[str, ...] = ()
+    uses_nonce = False # Whether logins carry an OIDC nonce for the id_token to echo
+
+    def __init__(self, http: OAuthHttpClient, *, client_id: str, client_secret: str | None):
+        self.http = http
+        self.client_id = client_id
+        self.client_secret = client_secret
+
+    def _authorization_params(self, *, redirect_uri: str, state: str, nonce: str | None) -> str:
+        params = {
+            "client_id": self.client_id,
+            "redirect_uri": redirect_uri,
+            "response_type": "code",
+            "scope": " ".join(self.scopes),
+            "state": state,
+        }
+        if nonce is not None:
+            params["nonce"] = nonce
+        return urlencode(params)
+
+    @abstractmethod
+    async def authorization_url(self, *, redirect_uri: str, state: str, nonce: str | None = None) -> str:
+        """The provider's consent page URL for this login."""
+
+    @abstractmethod
+    async def fetch_user_info(self, *, code: str, redirect_uri: str, nonce: str | None = None) -> UserOAuthInfo:
+        """Exchange an authorization code for the user's verified identity."""
+
+    @abstractmethod
+    async def warm_up(self) -> None:
+        """Fetch what the first login would otherwise wait for (called at startup)."""
+
+
+class OIDCProvider(OAuthProvider):
+    """OpenID Connect provider: endpoints from discovery, identity from a verified id_token."""
+
+    scopes = ("openid", "email", "profile")
+    algorithms = ("RS256", "ES256")
+    uses_nonce = True
+
+    def __init__(
+        self,
+        name: str,
+        http: OAuthHttpClient,
+        *,
+        client_id: str,
+        client_secret: str | None,
+        discovery_url: str,
+        discovery: DocumentCache,
+        jwks: DocumentCache,
+    ):
+        super().__init__(http, client_id=client_id, client_secret=client_secret)
+        self.name = name
+        self.discovery_url = discovery_url
+        self.discovery = discovery
+        self.jwks = jwks
+
+    async def _config(self) -> dict:
+        return await self.discovery.get(self.name, "discovery", self.discovery_url)
+
+    async def warm_up(self) -> None:
+        config = await self._config()
+        await self.jwks.get(self.name, "jwks", config["jwks_uri"])
+
+    async def authorization_url(self, *, redirect_uri: str, state: str, nonce: str | None = None) -> str:
+        config = await self._config()
+        params = self._authorization_params(redirect_uri=redirect_uri, state=state, nonce=nonce)
+        return f"{config['authorization_endpoint']}?{params}"
+
+    async def _signing_key(self, jwks_uri: str, kid: str | None, keys: dict) -> dict:
+        for refresh in (False, True):
+            if refresh:
+                keys = await self.jwks.get(self.name, "jwks", jwks_uri, refresh=True)
+            for key in keys.get("keys", []):
+                if kid is None or key.get("kid") == kid:
+                    return key
+        raise OAuthError(f"{self.name} id_token signed with unknown key {kid!r}")
+
+    async def fetch_user_info(self, *, code: str, redirect_uri: str, nonce: str | None = None) -> UserOAuthInfo:
+        from jose import JWTError, jwt # Deferred like in app.core.security
+
+        config = await self._config()
+        # The JWKS (usually cached) is fetched alongside the token exchange
+        tokens, keys = await asyncio.gather(
+            self.http.request(self.name, "token", "POST", config["token_endpoint"], data={
+                "grant_type": "authorization_code",
+                "code": code,
+                "redirect_uri": redirect_uri,
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+            }),
+            self.jwks.get(self.name, "jwks", config["jwks_uri"]),
+        )
+        id_token = tokens.get("id_token")
+        if not id_token:
+            raise OAuthError(f"{self.name} token response has no id_token")
+
+        try:
+            kid = jwt.get_unverified_header(id_token).get("kid")
+            key = await self._signing_key(config["jwks_uri"], kid, keys)
+            claims = jwt.decode(
+                id_token,
+                key,
+                algorithms=list(self.algorithms),
+                audience=self.client_id,
+                issuer=config["issuer"],
+                access_token=tokens.get("access_token"), # Checks at_hash when present
+            )
+        except JWTError as exc:
+            raise OAuthError(f"Invalid {self.name} id_token: {exc}") from exc
+        # Binds the id_token to this login, so a token issued for another one can't be replayed
+        if nonce is not None and not secrets.compare_digest(str(claims.get("nonce", "")), nonce):
+            raise OAuthError(f"{self.name} id_token nonce does not match the login")
+
+        if "email" not in claims and config.get("userinfo_endpoint") and tokens.get("access_token"):
+            userinfo = await self.http.request(
+                self.name, "userinfo", "GET", config["userinfo_endpoint"],
+                headers={"Authorization": f"Bearer {tokens['access_token']}"},
+            )
+            # Userinfo is not signed; it may only fill in the email of the id_token's subject
+            if userinfo.get("sub") != claims["sub"]:
+                raise OAuthError(f"{self.name} userinfo subject does not match the id_token")
+            claims.update({k: userinfo[k] for k in ("email", "email_verified") if k in userinfo})
+        if not claims.get("email") or claims.get("email_verified") is not True:
+            raise OAuthError(f"{self.name} account has no verified email address")
+        return UserOAuthInfo(provider_name=self.name, provider_user_id=claims["sub"], email=claims["email"])
+
+
+class GitHubProvider(OAuthProvider):
+    name = "github"
+    scopes = ("read:user", "user:email")
+
+    def __init__(self, http: OAuthHttpClient, *, client_id: str, client_secret: str | None,
+                 authorize_url: str, token_url: str, api_url: str):
+        super().__init__(http, client_id=client_id, client_secret=client_secret)
+        self.authorize_url = authorize_url
+        self.token_url = token_url
+        self.api_url = api_url.rstrip("/")
+
+    async def warm_up(self) -> None:
+        pass # Fixed endpoints: nothing to discover or cache ahead of the first login
+
+    async def authorization_url(self, *, redirect_uri: str, state: str, nonce: str | None = None) -> str:
+        return f"{self.authorize_url}?{self._authorization_params(redirect_uri=redirect_uri, state=state, nonce=nonce)}"
+
+    async def fetch_user_info(self, *, code: str, redirect_uri: str, nonce: str | None = None) -> UserOAuthInfo:
+        tokens = await self.http.request(self.name, "token", "POST", self.token_url, data={
+            "code": code,
+            "redirect_uri": redirect_uri,
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+        })
+        if "access_token" not in tokens: # GitHub reports a bad code with a 200
+            raise OAuthError(f"github token exchange failed: {tokens.get('error_description') or tokens.get('error')}")
+
+        headers = {"Authorization": f"Bearer {tokens['access_token']}", "Accept": "application/vnd.github+json"}
+        profile, emails = await asyncio.gather(
+            self.http.request(self.name, "profile", "GET", f"{self.api_url}/user", headers=headers),
+            self.http.request(self.name, "emails", "GET", f"{self.api_url}/user/emails", headers=headers),
+        )
+        email = next((e["email"] for e in emails if e.get("primary") and e.get("verified")), None)
+        if email is None:
+            raise OAuthError("github account has no verified primary email address")
+        return UserOAuthInfo(
+            provider_name=self.name, provider_user_id=str(profile["id"]), email=email, username=profile.get("login")
+        )
+
+
+oauth_http = OAuthHttpClient()
+discovery_documents = DocumentCache(oauth_http, ttl=settings.OAUTH_DISCOVERY_TTL_SECONDS)
+jwks_documents = DocumentCache(oauth_http, ttl=settings.OAUTH_JWKS_TTL_SECONDS)
+
+
+def _configured_providers() -> dict[str, OAuthProvider]:
+    providers: dict[str, OAuthProvider] = {}
+    if settings.OAUTH_GOOGLE_CLIENT_ID:
+        providers["google"] = OIDCProvider(
+            "google",
+            oauth_http,
+            client_id=settings.OAUTH_GOOGLE_CLIENT_ID,
+            client_secret=settings.OAUTH_GOOGLE_CLIENT_SECRET,
+            discovery_url=settings.OAUTH_GOOGLE_DISCOVERY_URL,
+            discovery=discovery_documents,
+            jwks=jwks_documents,
+        )
+    if settings.OAUTH_GITHUB_CLIENT_ID:
+        providers["github"] = GitHubProvider(
+            oauth_http,
+            client_id=settings.OAUTH_GITHUB_CLIENT_ID,
+            client_secret=settings.OAUTH_GITHUB_CLIENT_SECRET,
+            authorize_url=settings.OAUTH_GITHUB_AUTHORIZE_URL,
+            token_url=settings.OAUTH_GITHUB_TOKEN_URL,
+            api_url=settings.OAUTH_GITHUB_API_URL,
+        )
+    return providers
+
+
+providers = _configured_providers()
+
+
+def get_provider(name: str) -> OAuthProvider | None:
+    return providers.get(name)
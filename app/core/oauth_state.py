@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, NamedTuple, Protocol
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.crud import crud_oauth_state
+from app.db.base import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# OAuth `state` (and OIDC `nonce`) verification.
+#
+# Every login redirect stores its state server-side; the callback consumes it
+# exactly once. Both operations are O(1): a primary-key insert and a
+# DELETE ... RETURNING on the shared table, or dict operations in memory.
+# Expired entries (abandoned logins) are removed by a periodic batched sweep,
+# never on the request path.
+
+
+class PendingLogin(NamedTuple):
+    provider: str
+    nonce: str | None
+
+
+class OAuthStateStore(Protocol):
+    async def add(self, state: str, login: PendingLogin, ttl: float) -> None: ...
+    async def consume(self, state: str) -> PendingLogin | None: ...
+    async def purge_expired(self, batch_size: int) -> int: ...
+
+
+class DatabaseOAuthStateStore:
+    """Shared across workers through the oauth_states table."""
+
+    def __init__(self, session_factory: Callable[[], AsyncSession]):
+        self.session_factory = session_factory
+
+    async def add(self, state: str, login: PendingLogin, ttl: float) -> None:
+        async with self.session_factory() as db:
+            await crud_oauth_state.create_state(
+                db,
+                state=state,
+                provider=login.provider,
+                nonce=login.nonce,
+                expires_at=datetime.now(timezone.utc) + timedelta(seconds=ttl),
+            )
+
+    async def consume(self, state: str) -> PendingLogin | None:
+        async with self.session_factory() as db:
+            row = await crud_oauth_state.consume_state(db, state)
+        return PendingLogin(row.provider, row.nonce) if row is not None else None
+
+    async def purge_expired(self, batch_size: int) -> int:
+        async with self.session_factory() as db:
+            return await crud_oauth_state.delete_expired_states(db, batch_size=batch_size)
+
+
+class InMemoryOAuthStateStore:
+    """Local stand-in for single-process deployments and development."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # state -> (login, expires_at). One TTL for all entries, so insertion order is expiry order
+        self._entries: OrderedDict[str, tuple[PendingLogin, float]] = OrderedDict()
+        self.evictions = 0
+
+    async def add(self, state: str, login: PendingLogin, ttl: float) -> None:
+        while len(self._entries) >= self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        self._entries[state] = (login, time.monotonic() + ttl)
+
+    async def consume(self, state: str) -> PendingLogin | None:
+        entry = self._entries.pop(state, None)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    async def purge_expired(self, batch_size: int) -> int:
+        now = time.monotonic()
+        purged = 0
+        while self._entries and purged < batch_size:
+            state, (_, expires_at) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[state]
+            purged += 1
+        return purged
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class OAuthStates:
+    def __init__(self, store: OAuthStateStore, ttl: float):
+        self.store = store
+        self.ttl = ttl
+        self._task: asyncio.Task | None = None
+        self.issued = 0
+        self.consumed = 0
+        self.rejected = 0
+        self.swept = 0
+
+    async def issue(self, provider: str, *, with_nonce: bool = False) -> tuple[str, str | None]:
+        """Create and store a state (and nonce) for a login redirect to `provider`. Returns (state, nonce)."""
+        state = secrets.token_urlsafe(32)
+        nonce = secrets.token_urlsafe(32) if with_nonce else None
+        await self.store.add(state, PendingLogin(provider, nonce), self.ttl)
+        self.issued += 1
+        return state, nonce
+
+    async def consume(self, state: str, provider: str) -> PendingLogin | None:
+        """The pending login for `state`, removed so it cannot be replayed; None if unknown, expired or for another provider."""
+        login = await self.store.consume(state)
+        if login is None or login.provider != provider:
+            self.rejected += 1
+            return None
+        self.consumed += 1
+        return login
+
+    async def sweep(self) -> int:
+        """Delete expired entries in batches until none are left."""
+        batch_size = settings.OAUTH_STATE_SWEEP_BATCH_SIZE
+        total = 0
+        while True:
+            purged = await self.store.purge_expired(batch_size)
+            total += purged
+            if purged < batch_size:
+                break
+            await asyncio.sleep(0) # Let requests run between batches
+        self.swept += total
+        return total
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.OAUTH_STATE_SWEEP_SECONDS)
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("OAuth state sweep failed")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        in_memory = isinstance(self.store, InMemoryOAuthStateStore)
+        return {
+            "backend": "memory" if in_memory else "database",
+            "pending": len(self.store) if in_memory else None,
+            "evictions": self.store.evictions if in_memory else None,
+            "issued": self.issued,
+            "consumed": self.consumed,
+            "rejected": self.rejected,
+            "swept": self.swept,
+        }
+
+
+def _create_store() -> OAuthStateStore:
+    if settings.OAUTH_STATE_BACKEND == "memory":
+        return InMemoryOAuthStateStore(settings.OAUTH_STATE_MAX_ENTRIES)
+    return DatabaseOAuthStateStore(AsyncSessionLocal)
+
+
+oauth_states = OAuthStates(_create_store(), ttl=settings.OAUTH_STATE_TTL_SECONDS)
@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import logging
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Protocol
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.core.config import settings
+from app.crud import crud_rate_limit
+from app.db.base import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Rate limiting for the unauthenticated auth endpoints.
+#
+# Token buckets in GCRA form: each key stores a single float, its "theoretical
+# arrival time" (tat). A request is allowed if advancing tat by period/limit
+# keeps it within `period` of now, so a key gets `limit` requests in a burst
+# and then one every period/limit seconds. A tat in the past is a full bucket,
+# so idle keys can be dropped without changing any decision.
+#
+# Every worker checks an in-process, lock-sharded table first; with
+# RATE_LIMIT_BACKEND=database the shared table is consulted only for requests
+# the local check let through, so rejected traffic costs no query.
+
+REJECTIONS = metrics.counter("rate_limit_rejections_total", "Requests rejected by a rate limit.", ("limit",))
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class RateLimited(Exception):
+    def __init__(self, limit: str, retry_after: int):
+        super().__init__(f"Rate limit {limit!r} exceeded, retry after {retry_after}s")
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+class RateLimit(NamedTuple):
+    name: str
+    limit: int
+    period: float # Seconds
+
+    @property
+    def interval(self) -> float:
+        return self.period / self.limit
+
+    @classmethod
+    def parse(cls, name: str, value: str) -> "RateLimit":
+        """Parse "10/minute", "100/hour" or "5/30s" (five per 30 seconds)."""
+        match = re.fullmatch(r"\s*(\d+)\s*/\s*(?:(\d+)\s*s|(second|minute|hour|day)s?)\s*", value)
+        if match is None or int(match.group(1)) <= 0:
+            raise ValueError(f"Invalid rate limit for {name}: {value!r} (expected e.g. '10/minute')")
+        period = int(match.group(2)) if match.group(2) else _PERIODS[match.group(3)]
+        return cls(name, int(match.group(1)), float(period))
+
+
+class RateLimitBackend(Protocol):
+    """Shared state for multi-worker deployments, consulted after the local check."""
+    async def take(self, key: str, now: float, interval: float, burst: float) -> float: ...
+    async def purge_idle(self, batch_size: int) -> int: ...
+
+
+def _digest(key: str) -> bytes:
+    # Fixed-size keys bound memory per entry, and no raw emails or IPs are kept
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+
+class _Shard:
+    __slots__ = ("lock", "tats")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tats: OrderedDict[bytes, float] = OrderedDict() # Least recently hit first
+
+
+class InMemoryRateLimitBackend:
+    """Per-process buckets, split across independently locked shards."""
+
+    def __init__(self, *, shards: int, max_keys: int):
+        self._shards = [_Shard() for _ in range(shards)]
+        self.max_keys_per_shard = max(1, max_keys // shards)
+        self.evictions = 0
+
+    def take_nowait(self, key: str, now: float, interval: float, burst: float) -> float:
+        """Seconds until `key` may retry, or 0.0 if the request is allowed."""
+        digest = _digest(key)
+        shard = self._shards[hash(digest) % len(self._shards)]
+        with shard.lock:
+            tats = shard.tats
+            new_tat = max(tats.get(digest, now), now) + interval
+            if new_tat - now > burst:
+                return new_tat - now - burst
+            tats[digest] = new_tat
+            tats.move_to_end(digest)
+            # Drop idle keys from the LRU end (free, amortized O(1)); past the bound, drop the oldest anyway
+            while tats:
+                oldest, oldest_tat = next(iter(tats.items()))
+                if oldest_tat > now and len(tats) <= self.max_keys_per_shard:
+                    break
+                del tats[oldest]
+                if oldest_tat > now:
+                    self.evictions += 1
+            return 0.0
+
+    def __len__(self) -> int:
+        return sum(len(shard.tats) for shard in self._shards)
+
+
+class DatabaseRateLimitBackend:
+    """Shared across workers through the rate_limit_buckets table (one upsert per check)."""
+
+    def __init__(self, session_factory: Callable[[], AsyncSession]):
+        self.session_factory = session_factory
+
+    async def take(self, key: str, now: float, interval: float, burst: float) -> float:
+        row_key = hashlib.sha256(key.encode()).hexdigest()
+        async with self.session_factory() as db:
+            if await crud_rate_limit.take(db, key=row_key, now=now, interval=interval, burst=burst):
+                return 0.0
+            tat = await crud_rate_limit.get_tat(db, row_key)
+        return max(tat + interval - now - burst, interval) if tat is not None else interval
+
+    async def purge_idle(self, batch_size: int) -> int:
+        async with self.session_factory() as db:
+            return await crud_rate_limit.delete_idle_buckets(db, now=time.time(), batch_size=batch_size)
+
+
+class RateLimiter:
+    def __init__(self, local: InMemoryRateLimitBackend, shared: RateLimitBackend | None = None):
+        self.local = local
+        self.shared = shared
+        self._task: asyncio.Task | None = None
+        self.allowed = 0
+        self.rejected: dict[str, int] = {}
+
+    async def check(self, limit: RateLimit, key: str) -> None:
+        """Count a request against `limit` for `key`, raising RateLimited when it is over."""
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        bucket = f"{limit.name}:{key}"
+        now = time.time()
+        retry_after = self.local.take_nowait(bucket, now, limit.interval, limit.period)
+        if not retry_after and self.shared is not None:
+            retry_after = await self.shared.take(bucket, now, limit.interval, limit.period)
+        if retry_after:
+            self.rejected[limit.name] = self.rejected.get(limit.name, 0) + 1
+            REJECTIONS.inc(limit=limit.name)
+            raise RateLimited(limit.name, math.ceil(retry_after))
+        self.allowed += 1
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.RATE_LIMIT_SWEEP_SECONDS)
+            try:
+                while await self.shared.purge_idle(settings.RATE_LIMIT_SWEEP_BATCH_SIZE) >= settings.RATE_LIMIT_SWEEP_BATCH_SIZE:
+                    await asyncio.sleep(0)
+            except Exception:
+                logger.exception("Rate limit sweep failed")
+
+    def start(self) -> None:
+        # Only the shared table needs sweeping; local buckets are evicted inline
+        if self.shared is not None and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.RATE_LIMIT_ENABLED,
+            "backend": "database" if self.shared is not None else "memory",
+            "local_keys": len(self.local),
+            "local_evictions": self.local.evictions,
+            "allowed": self.allowed,
+            "rejected": dict(self.rejected),
+        }
+
+
+LOGIN_PER_IP = RateLimit.parse("login_ip", settings.RATE_LIMIT_LOGIN_PER_IP)
+LOGIN_PER_IDENTIFIER = RateLimit.parse("login_identifier", settings.RATE_LIMIT_LOGIN_PER_IDENTIFIER)
+REGISTER_PER_IP = RateLimit.parse("register_ip", settings.RATE_LIMIT_REGISTER_PER_IP)
+OAUTH_PER_IP = RateLimit.parse("oauth_ip", settings.RATE_LIMIT_OAUTH_PER_IP)
+
+rate_limiter = RateLimiter(
+    InMemoryRateLimitBackend(shards=settings.RATE_LIMIT_SHARDS, max_keys=settings.RATE_LIMIT_MAX_KEYS),
+    DatabaseRateLimitBackend(AsyncSessionLocal) if settings.RATE_LIMIT_BACKEND == "database" else None,
+)
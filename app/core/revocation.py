@@ -0,0 +1,238 @@
+import asyncio
+import hashlib
+import logging
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Protocol
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.crud import crud_revocation
+from app.db.base import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Access-token revocation.
+#
+# Checking a revocation table on every request would double the cost of
+# get_current_user. Instead each process keeps a Bloom filter of revoked `jti`s:
+# a miss (almost every request) proves the token was not revoked, and only a hit
+# is confirmed against the store. The filter is synced incrementally and rebuilt
+# periodically from unexpired entries, so its memory stays bounded.
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        # Kirsch-Mitzenmacher double hashing from one 128-bit digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Some drivers (e.g. SQLite) hand back naive datetimes
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class RevocationStore(Protocol):
+    async def add(self, jti: str, expires_at: datetime) -> None: ...
+    async def contains(self, jti: str) -> bool: ...
+    async def active(self) -> list[tuple[str, datetime]]: ...
+    async def changes_since(self, since: datetime) -> list[tuple[str, datetime]]: ...
+    async def purge_expired(self) -> int: ...
+
+
+class DatabaseRevocationStore:
+    """Shared across workers through the revoked_tokens table."""
+
+    def __init__(self, session_factory: Callable[[], AsyncSession]):
+        self.session_factory = session_factory
+
+    async def add(self, jti: str, expires_at: datetime) -> None:
+        async with self.session_factory() as db:
+            await crud_revocation.revoke_token(db, jti=jti, expires_at=expires_at)
+
+    async def contains(self, jti: str) -> bool:
+        async with self.session_factory() as db:
+            return await crud_revocation.is_token_revoked(db, jti)
+
+    async def active(self) -> list[tuple[str, datetime]]:
+        async with self.session_factory() as db:
+            return [(jti, _as_utc(at)) for jti, at in await crud_revocation.get_active_revocations(db)]
+
+    async def changes_since(self, since: datetime) -> list[tuple[str, datetime]]:
+        async with self.session_factory() as db:
+            return [(jti, _as_utc(at)) for jti, at in await crud_revocation.get_revocations_since(db, since)]
+
+    async def purge_expired(self) -> int:
+        if settings.EXPIRY_SWEEP_SECONDS > 0:
+            return 0 # Left to the expiry sweeper (app.core.expiry), which paces its batches
+        deleted = 0
+        while True:
+            async with self.session_factory() as db:
+                count = await crud_revocation.delete_expired_revocations(db, batch_size=settings.EXPIRY_SWEEP_BATCH_SIZE)
+            deleted += count
+            if count < settings.EXPIRY_SWEEP_BATCH_SIZE:
+                return deleted
+
+
+class InMemoryRevocationStore:
+    """Local stand-in for single-process deployments and development."""
+
+    def __init__(self):
+        self._entries: dict[str, tuple[datetime, datetime]] = {} # jti -> (expires_at, revoked_at)
+
+    async def add(self, jti: str, expires_at: datetime) -> None:
+        self._entries.setdefault(jti, (expires_at, datetime.now(timezone.utc)))
+
+    async def contains(self, jti: str) -> bool:
+        entry = self._entries.get(jti)
+        return entry is not None and entry[0] > datetime.now(timezone.utc)
+
+    async def active(self) -> list[tuple[str, datetime]]:
+        now = datetime.now(timezone.utc)
+        return [(jti, revoked_at) for jti, (expires_at, revoked_at) in self._entries.items() if expires_at > now]
+
+    async def changes_since(self, since: datetime) -> list[tuple[str, datetime]]:
+        return [(jti, revoked_at) for jti, (_, revoked_at) in self._entries.items() if revoked_at >= since]
+
+    async def purge_expired(self) -> int:
+        now = datetime.now(timezone.utc)
+        expired = [jti for jti, (expires_at, _) in self._entries.items() if expires_at <= now]
+        for jti in expired:
+            del self._entries[jti]
+        return len(expired)
+
+
+class RevocationList:
+    def __init__(self, store: RevocationStore, capacity: int, error_rate: float):
+        self.store = store
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filter = BloomFilter(capacity, error_rate)
+        self._watermark: datetime | None = None # Newest revoked_at seen by the last sync
+        self._task: asyncio.Task | None = None
+        self.filter_misses = 0
+        self.filter_hits = 0
+        self.false_positives = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._watermark is not None
+
+    async def revoke(self, jti: str, expires_at: datetime) -> None:
+        await self.store.add(jti, expires_at)
+        self._filter.add(jti)
+
+    async def is_revoked(self, jti: str) -> bool:
+        if not self.loaded:
+            # Filter not built yet (e.g. lifespan not run): fall back to the store
+            return await self.store.contains(jti)
+        if jti not in self._filter:
+            self.filter_misses += 1
+            return False
+        self.filter_hits += 1
+        revoked = await self.store.contains(jti)
+        if not revoked:
+            self.false_positives += 1
+        return revoked
+
+    async def rebuild(self) -> None:
+        """Rebuild the filter from unexpired entries, dropping expired ones from the store."""
+        await self.store.purge_expired()
+        entries = await self.store.active()
+        capacity = self.capacity
+        while len(entries) > capacity * 0.8: # Keep the false-positive rate near its target
+            capacity *= 2
+        bloom = BloomFilter(capacity, self.error_rate)
+        for jti, _ in entries:
+            bloom.add(jti)
+        self._filter = bloom
+        # Without entries, start from the epoch rather than the local clock, which may run ahead of the DB's
+        self._watermark = max((revoked_at for _, revoked_at in entries), default=_EPOCH)
+
+    async def sync(self) -> None:
+        """Add revocations made by other workers since the last sync."""
+        if self._watermark is None:
+            await self.rebuild()
+            return
+        # revoked_at is the revoking transaction's start, so a slow transaction can commit
+        # rows older than the watermark; re-reading a window behind it picks those up
+        since = self._watermark - timedelta(seconds=settings.REVOCATION_SYNC_LOOKBACK_SECONDS)
+        for jti, revoked_at in await self.store.changes_since(since):
+            if jti not in self._filter: # Rows inside the window come back on every sync
+                self._filter.add(jti)
+            self._watermark = max(self._watermark, revoked_at)
+        if self._filter.count > self._filter.capacity:
+            await self.rebuild()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        last_rebuild = loop.time()
+        while True:
+            await asyncio.sleep(settings.REVOCATION_SYNC_SECONDS)
+            try:
+                if loop.time() - last_rebuild >= settings.REVOCATION_REBUILD_SECONDS:
+                    await self.rebuild()
+                    last_rebuild = loop.time()
+                else:
+                    await self.sync()
+            except Exception:
+                logger.exception("Revocation list sync failed")
+
+    def start(self) -> None:
+        # The first build is a warm-up step (app.core.warmup), so startup makes no DB round trip;
+        # until it has run, is_revoked() asks the store and the next sync() retries the build
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "entries": self._filter.count,
+            "capacity": self._filter.capacity,
+            "filter_bytes": len(self._filter._bits),
+            "filter_misses": self.filter_misses,
+            "filter_hits": self.filter_hits,
+            "false_positives": self.false_positives,
+        }
+
+
+def _create_store() -> RevocationStore:
+    if settings.TOKEN_REVOCATION_BACKEND == "memory":
+        return InMemoryRevocationStore()
+    return DatabaseRevocationStore(AsyncSessionLocal)
+
+
+revocation_list = RevocationList(
+    _create_store(),
+    capacity=settings.REVOCATION_FILTER_CAPACITY,
+    error_rate=settings.REVOCATION_FILTER_ERROR_RATE,
+)
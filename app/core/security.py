@@ -1,35 +1,288 @@
+import asyncio
+import hashlib
+import math
+import secrets
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any, Union
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Sequence, Union
 
-from jose import jwt, JWTError
-from passlib.context import CryptContext
+from pydantic import ValidationError
 
+from app.core import timing
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.jwt_keys import get_key_ring
+from app.schemas.token import TokenData
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+# passlib and python-jose (with cryptography behind it) are imported on first use:
+# get_pwd_context() and get_key_ring() are built by create_app(), or lazily in
+# hash workers and scripts that never sign a token.
+
+@lru_cache()
+def get_pwd_context() -> "CryptContext":
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-ALGORITHM = settings.ALGORITHM
-SECRET_KEY = settings.SECRET_KEY
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
-def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None) -> str:
+def access_token_claims(user: Any) -> dict:
+    """
+    Compact authorization claims for `user` (a User or credentials row) when
+    JWT_COMPACT_CLAIMS is on, so services verifying the token locally need no
+    user lookup. They reflect the user as of issuance, for the token's lifetime.
+    """
+    if not settings.JWT_COMPACT_CLAIMS:
+        return {}
+    return {"status": getattr(user.status, "value", user.status), "email_verified": bool(user.email_verified)}
+
+def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None, *, claims: dict | None = None) -> str:
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode = {"exp": expire, "sub": str(subject)}
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    to_encode = {"exp": expire, "sub": str(subject), "jti": uuid.uuid4().hex}
+    if settings.JWT_ISSUER:
+        to_encode["iss"] = settings.JWT_ISSUER
+    if settings.JWT_AUDIENCE:
+        to_encode["aud"] = settings.JWT_AUDIENCE
+    if claims:
+        to_encode.update(claims)
+    from jose import jwt
+
+    key = get_key_ring().signing_key
+    with timing.span("jwt"):
+        encoded_jwt = jwt.encode(
+            to_encode, key.signing, algorithm=key.algorithm, headers={"kid": key.kid} if key.kid else None
+        )
     return encoded_jwt
 
+def create_refresh_token() -> str:
+    return secrets.token_urlsafe(32)
+
+def hash_refresh_token(token: str) -> str:
+    # Refresh tokens are 256 random bits, so a fast digest is enough (no bcrypt needed)
+    return hashlib.sha256(token.encode()).hexdigest()
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+@lru_cache(maxsize=1)
+def _dummy_password_hash() -> str:
+    return get_pwd_context().hash(secrets.token_urlsafe(16))
+
+def verify_dummy_password(plain_password: str) -> bool:
+    # The cost of a real check, for logins matching no account: otherwise they answer measurably faster
+    get_pwd_context().verify(plain_password, _dummy_password_hash())
+    return False
+
+def warm_up_hashing() -> None:
+    # Loads (and self-tests) the bcrypt backend in the calling worker; 4 rounds take about a millisecond
+    get_pwd_context().handler("bcrypt").using(rounds=4).hash("warm-up")
+
+# --- Password hashing worker pool ---
+# bcrypt costs 100-300 ms of CPU per call, so the async variants below run it in
+# a dedicated pool instead of on the event loop. Jobs enter the pool through
+# `hash_admission`, which bounds the CPU we are willing to spend under attack.
+
+_hash_executor: Executor | None = None
+
+def get_hash_executor() -> Executor:
+    global _hash_executor
+    if _hash_executor is None:
+        # Whenever a worker starts, it loads the bcrypt backend before taking its first job
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _hash_executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS, initializer=warm_up_hashing
+            )
+        else:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="pwd-hash", initializer=warm_up_hashing
+            )
+    return _hash_executor
+
+def shutdown_hash_executor() -> None:
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=True)
+    _hash_executor = None
+    hash_admission.reset()
+
+
+class HashingOverloaded(Exception):
+    """Raised when a password hash is shed instead of queued."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Password hashing is overloaded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class HashAdmissionController:
+    """
+    Caps in-flight hashes per process and rejects new work once the wait
+    for a free worker would exceed the latency budget.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, latency_budget_seconds: float):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.latency_budget_seconds = latency_budget_seconds
+        self.reset()
+
+    def reset(self) -> None:
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_latency_budget = 0
+        self._avg_hash_seconds = 0.25 # Seeded with a typical bcrypt cost, refined as jobs finish
+        self._slots: asyncio.Semaphore | None = None
+
+    def estimated_wait(self) -> float:
+        if self.in_flight < self.max_in_flight:
+            return 0.0
+        # Everyone already queued plus this caller, spread over the workers
+        return (self.queue_depth + 1) * self._avg_hash_seconds / self.max_in_flight
+
+    def _reject(self, wait: float) -> None:
+        raise HashingOverloaded(retry_after=max(1, math.ceil(wait)))
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        wait = self.estimated_wait()
+        if self.queue_depth >= self.max_queue:
+            self.rejected_queue_full += 1
+            self._reject(wait)
+        if wait > self.latency_budget_seconds:
+            self.rejected_latency_budget += 1
+            self._reject(wait)
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        self.queue_depth += 1
+        try:
+            with timing.span("hash_queue"):
+                await self._slots.acquire()
+        finally:
+            self.queue_depth -= 1
+
+        self.admitted += 1
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            with timing.span("hash"):
+                return await loop.run_in_executor(get_hash_executor(), func, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._avg_hash_seconds = 0.8 * self._avg_hash_seconds + 0.2 * elapsed
+            self.in_flight -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_latency_budget": self.rejected_latency_budget,
+            "avg_hash_ms": round(self._avg_hash_seconds * 1000, 2),
+            "estimated_wait_ms": round(self.estimated_wait() * 1000, 2),
+        }
+
+
+hash_admission = HashAdmissionController(
+    max_in_flight=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    latency_budget_seconds=settings.PASSWORD_HASH_LATENCY_BUDGET_MS / 1000,
+)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await hash_admission.run(verify_password, plain_password, hashed_password)
+
+async def verify_dummy_password_async(plain_password: str) -> bool:
+    return await hash_admission.run(verify_dummy_password, plain_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await hash_admission.run(get_password_hash, password)
+
+# --- Bulk hashing (imports) ---
+# `python -m app.cli import-users` hashes in its own process pool spanning every
+# core. Imports through the API share the login pool instead: a bounded number of
+# workers at a time, through admission control.
+
+async def get_password_hashes_async(executor: Executor, passwords: Sequence[str]) -> list[str]:
+    # One task per password: a bcrypt hash dwarfs the inter-process round trip,
+    # and fine-grained tasks keep every worker busy even for small batches
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(loop.run_in_executor(executor, get_password_hash, p) for p in passwords))
+
+async def get_password_hashes_admitted(passwords: Sequence[str], *, concurrency: int) -> list[str]:
+    # Overload is waited out rather than raised: logins keep their fast 503, the import just slows down
+    slots = asyncio.Semaphore(concurrency)
+
+    async def hash_one(password: str) -> str:
+        async with slots:
+            while True:
+                try:
+                    return await hash_admission.run(get_password_hash, password)
+                except HashingOverloaded as e:
+                    await asyncio.sleep(e.retry_after)
+
+    return await asyncio.gather(*(hash_one(p) for p in passwords))
+
+def is_password_hash(value: str) -> bool:
+    return get_pwd_context().identify(value) is not None
 
 def decode_access_token(token: str) -> dict | None:
+    from jose import JWTError, jwt
+
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with timing.span("jwt"):
+            key = get_key_ring().verification_key(jwt.get_unverified_header(token).get("kid"))
+            if key is None:
+                return None
+            # Only the key's own algorithm is accepted (no alg confusion between keys)
+            payload = jwt.decode(
+                token,
+                key.verifying,
+                algorithms=[key.algorithm],
+                audience=settings.JWT_AUDIENCE,
+                issuer=settings.JWT_ISSUER,
+            )
         return payload
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+
+# Validated TokenData keyed by the SHA-256 digest of the raw token. Entries never
+# outlive the token's own `exp`, so a cached hit is as good as a fresh decode.
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_MAX_SIZE, ttl=settings.TOKEN_CACHE_TTL_SECONDS)
+
+def decode_access_token_cached(token: str) -> TokenData | None:
+    key = hashlib.sha256(token.encode()).digest()
+    token_data = token_cache.get(key)
+    if token_data is not None:
+        return token_data
+
+    payload = decode_access_token(token)
+    if payload is None:
+        return None
+    try:
+        token_data = TokenData(**payload)
+    except ValidationError:
+        return None
+
+    exp = payload.get("exp")
+    if exp is not None:
+        token_cache.set(key, token_data, ttl=exp - time.time())
+    return token_data
\ No newline at end of file
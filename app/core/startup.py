@@ -0,0 +1,97 @@
+import importlib
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Cold-start bookkeeping: where import, construction and warm-up time went, and
+# whether this process is ready for traffic (/api/v1/health/ready).
+#
+# Standard library only, so app.main can import it before anything heavy and
+# time its imports. Third-party packages are imported one by one ahead of the
+# app's modules (import_dependencies), so each is charged for its own stack and
+# the "app" group for the app alone. For a per-module breakdown use
+# `python -X importtime -c "import app.main"`.
+
+
+class StartupReport:
+    def __init__(self):
+        self.imports: dict[str, float] = {} # Package or import group -> seconds
+        self.components: dict[str, float] = {} # Singleton built by create_app -> seconds
+        self.phases: dict[str, float] = {} # Warm-up step -> seconds
+        self.errors: dict[str, str] = {}
+        self.ready = False
+        self.import_seconds: float | None = None
+
+    def _add_import(self, group: str, elapsed: float) -> None:
+        self.imports[group] = self.imports.get(group, 0.0) + elapsed
+        self.import_seconds = (self.import_seconds or 0.0) + elapsed
+
+    def import_dependencies(self, modules: Iterable[str]) -> None:
+        """
+        Import and time each module in turn. A module is charged for what it loads beyond
+        the ones before it (fastapi after pydantic is fastapi and starlette); one that was
+        already imported is skipped.
+        """
+        for module in modules:
+            if module in sys.modules:
+                continue
+            started = time.perf_counter()
+            try:
+                importlib.import_module(module)
+            finally:
+                self._add_import(module, time.perf_counter() - started)
+
+    @contextmanager
+    def timed_imports(self, group: str) -> Iterator[None]:
+        """Time a block of top-level imports. Unlike phase(), a failing import propagates."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add_import(group, time.perf_counter() - started)
+
+    @contextmanager
+    def component(self, name: str) -> Iterator[None]:
+        """Time building a singleton (first build only). Errors propagate: a bad configuration fails startup."""
+        started = time.perf_counter()
+        yield
+        self.components.setdefault(name, time.perf_counter() - started)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a warm-up step. A failing step is recorded and logged, not raised: a cold cache is not an outage."""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as exc:
+            self.errors[name] = f"{type(exc).__name__}: {exc}"
+            logger.warning("Warm-up step %s failed: %s", name, exc)
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "import_ms": round(self.import_seconds * 1000, 1) if self.import_seconds is not None else None,
+            "imports_ms": {group: round(seconds * 1000, 1) for group, seconds in self.imports.items()},
+            "components_ms": {name: round(seconds * 1000, 1) for name, seconds in self.components.items()},
+            "warmup_ms": {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+            "warmup_errors": dict(self.errors),
+        }
+
+    def log(self) -> None:
+        stats = self.stats()
+        logger.info(
+            "Startup: imports %sms (%s); built %s; warm-up %s",
+            stats["import_ms"],
+            ", ".join(f"{group} {ms}ms" for group, ms in stats["imports_ms"].items()),
+            ", ".join(f"{name} {ms}ms" for name, ms in stats["components_ms"].items()) or "nothing",
+            ", ".join(f"{name} {ms}ms" for name, ms in stats["warmup_ms"].items()) or "skipped",
+        )
+
+
+startup_report = StartupReport()
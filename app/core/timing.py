@@ -0,0 +1,187 @@
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import metrics
+
+# Per-request latency breakdown.
+#
+# TimingMiddleware puts a span accumulator in a contextvar for each request;
+# instrumented code adds to it with `span(name)` or `record(name, seconds)`.
+# Totals go out as a Server-Timing header and into Prometheus histograms. When
+# no request is active (background tasks, CLI) recording is a contextvar lookup.
+
+_spans: ContextVar[dict[str, list[float]] | None] = ContextVar("request_spans", default=None)
+
+REQUEST_DURATION = metrics.histogram(
+    "http_request_duration_seconds", "Time to handle HTTP requests.", ("method", "route", "status")
+)
+REQUEST_SPAN_DURATION = metrics.histogram(
+    "http_request_span_seconds",
+    "Per-request time spent in db, hash, jwt and serialize spans.",
+    ("route", "span"),
+)
+
+
+def record(name: str, seconds: float) -> None:
+    spans = _spans.get()
+    if spans is None:
+        return
+    entry = spans.get(name)
+    if entry is None:
+        spans[name] = [seconds, 1]
+    else:
+        entry[0] += seconds
+        entry[1] += 1
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    if _spans.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def _server_timing(spans: dict[str, list[float]], total: float) -> bytes:
+    parts = [
+        f'{name};dur={seconds * 1000:.2f};desc="{int(count)}x"' if count > 1 else f"{name};dur={seconds * 1000:.2f}"
+        for name, (seconds, count) in spans.items()
+        if not name.startswith("_")
+    ]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts).encode("latin-1")
+
+
+def _route_label(scope: Scope) -> str:
+    # The matched route's path template, e.g. /api/v1/auth/callback/oauth/{provider}, so
+    # labels stay bounded. FastAPI resolves included routers lazily: scope["route"] is the
+    # route as declared (without the router prefix), the prefixed template is on its context
+    route = scope.get("route")
+    if route is None:
+        return "<unmatched>"
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    return getattr(context, "path", None) or route.path
+
+
+class TimingMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware task/queue overhead) that
+    collects the request's spans and reports them when the response starts.
+    """
+
+    def __init__(self, app: ASGIApp, emit_header: bool = True):
+        self.app = app
+        self.emit_header = emit_header
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        spans: dict[str, list[float]] = {}
+        token = _spans.set(spans)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.emit_header:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(spans, time.perf_counter() - started)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _spans.reset(token)
+            route = _route_label(scope)
+            REQUEST_DURATION.observe(
+                time.perf_counter() - started, method=scope["method"], route=route, status=str(status_code)
+            )
+            for name, (seconds, _) in spans.items():
+                if not name.startswith("_"):
+                    REQUEST_SPAN_DURATION.observe(seconds, route=route, span=name)
+
+
+class TimedRoute(APIRoute):
+    """
+    Adds a `serialize` span: the time between the endpoint returning and the
+    route producing its Response (response-model validation and JSON encoding).
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        super().__init__(path, self._wrap_endpoint(endpoint), **kwargs)
+
+    @staticmethod
+    def _wrap_endpoint(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+        def mark_returned() -> None:
+            spans = _spans.get()
+            if spans is not None:
+                spans["_endpoint_returned"] = [time.perf_counter(), 0]
+
+        if inspect.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def timed_endpoint(*args: Any, **kwargs: Any) -> Any:
+                result = await endpoint(*args, **kwargs)
+                mark_returned()
+                return result
+        else:
+            @functools.wraps(endpoint)
+            def timed_endpoint(*args: Any, **kwargs: Any) -> Any:
+                result = endpoint(*args, **kwargs)
+                mark_returned()
+                return result
+        return timed_endpoint
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            spans = _spans.get()
+            if spans is not None:
+                returned = spans.pop("_endpoint_returned", None)
+                if returned is not None:
+                    record("serialize", time.perf_counter() - returned[0])
+            return response
+
+        return timed_handler
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Record a `db` span for every statement executed on `engine`."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _spans.get() is not None:
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_started")
+        if started:
+            record("db", time.perf_counter() - started.pop())
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(exception_context):
+        # execution_context is only set for errors raised while executing a statement, the
+        # case where before_cursor_execute may have pushed a start time (cursor can be None)
+        conn = exception_context.connection
+        if exception_context.execution_context is not None and conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
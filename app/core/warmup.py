@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from contextlib import AsyncExitStack
+from typing import Awaitable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import configure_mappers
+
+from app.core import oauth, security
+from app.core.config import settings
+from app.core.revocation import revocation_list
+from app.core.startup import startup_report
+from app.db.base import get_engine, get_pool_health, get_replica_engines
+
+logger = logging.getLogger(__name__)
+
+# Work the first requests would otherwise pay for: pool connections (TCP, TLS
+# and auth round trips), ORM mapper configuration, the revocation filter,
+# password-hash workers with the bcrypt backend loaded, and OAuth discovery
+# documents and JWKS. Run in the background from the lifespan; the app reports
+# ready once it is done. Steps run concurrently; a failed step is recorded in
+# the startup report and left to happen on first use.
+
+
+async def warm_pool(engine: AsyncEngine, connections: int) -> int:
+    """Open up to `connections` pool connections; they stay idle in the pool for the first requests."""
+    size = getattr(engine.pool, "size", None)
+    if size is None: # No pool to fill (e.g. in-memory SQLite)
+        return 0
+    count = min(connections, size())
+    async with AsyncExitStack() as stack:
+        # Held until all are open, so the pool has to open `count` distinct connections. Opened one
+        # at a time, so that on a failure (or the warm-up timeout) the stack holds each one to return
+        for _ in range(count):
+            conn = await stack.enter_async_context(engine.connect())
+            await conn.execute(text("SELECT 1"))
+    return count
+
+
+async def check_database() -> None:
+    # Readiness also needs a healthy database; without this first probe the health checker
+    # would report healthy until its first periodic check (DB_HEALTH_CHECK_SECONDS)
+    pool_health = get_pool_health()
+    if pool_health.interval > 0 and not await pool_health.check():
+        raise ConnectionError("Database health check failed")
+
+
+async def warm_password_hashing() -> None:
+    # Every worker loads bcrypt in its initializer (see security.get_hash_executor); one job per
+    # worker makes the pool start them now rather than on the first logins
+    loop = asyncio.get_running_loop()
+    executor = security.get_hash_executor()
+    await asyncio.gather(*(
+        loop.run_in_executor(executor, security.warm_up_hashing) for _ in range(settings.PASSWORD_HASH_WORKERS)
+    ))
+
+
+async def warm_oauth_providers() -> None:
+    await asyncio.gather(*(provider.warm_up() for provider in oauth.providers.values()))
+
+
+async def _step(name: str, work: Awaitable) -> None:
+    with startup_report.phase(name):
+        await work
+
+
+async def _all(steps: list[Awaitable]) -> None:
+    # A coroutine rather than a bare gather future: wait_for runs it as a task, which then
+    # consumes the gather's CancelledError when warm-up is cancelled at shutdown
+    await asyncio.gather(*steps)
+
+
+async def warm_up() -> None:
+    with startup_report.phase("orm_mappers"):
+        configure_mappers()
+
+    steps = [
+        _step("db_health", check_database()),
+        _step("db_pool.primary", warm_pool(get_engine(), settings.DB_POOL_PREWARM)),
+        _step("revocation_list", revocation_list.rebuild()),
+        _step("password_hashing", warm_password_hashing()),
+        _step("oauth_providers", warm_oauth_providers()),
+    ]
+    steps += [
+        _step(f"db_pool.replica{i}", warm_pool(replica, settings.DB_POOL_PREWARM))
+        for i, replica in enumerate(get_replica_engines())
+    ]
+    try:
+        await asyncio.wait_for(_all(steps), timeout=settings.STARTUP_WARMUP_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        startup_report.errors["timeout"] = f"Warm-up exceeded {settings.STARTUP_WARMUP_TIMEOUT_SECONDS}s"
+        logger.warning("Warm-up did not finish within %ss; serving anyway", settings.STARTUP_WARMUP_TIMEOUT_SECONDS)
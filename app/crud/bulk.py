@@ -0,0 +1,39 @@
+from datetime import datetime
+from typing import Any, Sequence
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import DateTime, bindparam, column, update as sqlalchemy_update, values
+from sqlalchemy.orm import InstrumentedAttribute
+
+# Batched single-column updates for write-behind buffers.
+
+async def bulk_update_timestamps(
+    db: AsyncSession,
+    key: InstrumentedAttribute,
+    target: InstrumentedAttribute,
+    rows: Sequence[tuple[Any, datetime]],
+) -> None:
+    """
+    Set `target` to the given timestamp for each `key` in one statement:
+    UPDATE ... FROM (VALUES ...) on PostgreSQL, a single executemany elsewhere.
+    Other onupdate columns (e.g. updated_at) are left untouched.
+    """
+    table = key.class_.__table__
+    untouched = {c.name: c for c in table.columns if c.onupdate is not None and c.name != target.key}
+    if db.bind.dialect.name == "postgresql":
+        rows_v = values(
+            column("k", key.type), column("ts", DateTime(timezone=True)), name="v"
+        ).data(list(rows))
+        stmt = (
+            sqlalchemy_update(table)
+            .where(table.c[key.key] == rows_v.c.k)
+            .values({target.key: rows_v.c.ts, **untouched})
+        )
+        await db.execute(stmt)
+    else: # e.g. SQLite stand-ins, which lack VALUES column aliases
+        stmt = (
+            sqlalchemy_update(table)
+            .where(table.c[key.key] == bindparam("b_k"))
+            .values({target.key: bindparam("b_ts"), **untouched})
+        )
+        await db.execute(stmt, [{"b_k": k, "b_ts": ts} for k, ts in rows])
+    await db.commit()
\ No newline at end of file
@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Row, delete as sqlalchemy_delete
+
+from app.db.models import OAuthState
+
+async def create_state(db: AsyncSession, *, state: str, provider: str, nonce: str | None, expires_at: datetime) -> None:
+    db.add(OAuthState(state=state, provider=provider, nonce=nonce, expires_at=expires_at))
+    await db.commit()
+
+async def consume_state(db: AsyncSession, state: str) -> Row | None:
+    # DELETE ... RETURNING: lookup and single-use removal in one atomic statement,
+    # so two callbacks racing on the same state cannot both succeed
+    result = await db.execute(
+        sqlalchemy_delete(OAuthState)
+        .where(OAuthState.state == state, OAuthState.expires_at > datetime.now(timezone.utc))
+        .returning(OAuthState.provider, OAuthState.nonce)
+    )
+    row = result.first()
+    await db.commit()
+    return row
+
+async def delete_expired_states(db: AsyncSession, *, batch_size: int) -> int:
+    expired = (
+        select(OAuthState.state)
+        .where(OAuthState.expires_at <= datetime.now(timezone.utc))
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        sqlalchemy_delete(OAuthState).where(OAuthState.state.in_(expired)).execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
@@ -0,0 +1,42 @@
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import case, delete as sqlalchemy_delete, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.db.models import RateLimitBucket
+
+async def take(db: AsyncSession, *, key: str, now: float, interval: float, burst: float) -> bool:
+    """
+    One GCRA step in a single upsert: advance the key's tat by `interval` unless
+    that would put it more than `burst` seconds ahead of `now`. Returns whether
+    the request is allowed; a rejected request leaves the row untouched.
+    """
+    now_value = literal(now)
+    new_tat = case((RateLimitBucket.tat > now_value, RateLimitBucket.tat), else_=now_value) + interval
+    stmt = (
+        pg_insert(RateLimitBucket)
+        .values(key=key, tat=now + interval)
+        .on_conflict_do_update(
+            index_elements=[RateLimitBucket.key],
+            set_={"tat": new_tat},
+            where=new_tat - now_value <= burst,
+        )
+        .returning(RateLimitBucket.tat)
+    )
+    result = await db.execute(stmt)
+    allowed = result.first() is not None
+    await db.commit()
+    return allowed
+
+async def get_tat(db: AsyncSession, key: str) -> float | None:
+    result = await db.execute(select(RateLimitBucket.tat).where(RateLimitBucket.key == key))
+    return result.scalar()
+
+async def delete_idle_buckets(db: AsyncSession, *, now: float, batch_size: int) -> int:
+    # A tat in the past means a full bucket, which is the same as no row at all
+    idle = select(RateLimitBucket.key).where(RateLimitBucket.tat <= now).limit(batch_size).scalar_subquery()
+    result = await db.execute(
+        sqlalchemy_delete(RateLimitBucket).where(RateLimitBucket.key.in_(idle)).execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
@@ -0,0 +1,47 @@
+from datetime import datetime, timezone
+from typing import List
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Row, delete as sqlalchemy_delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.db.models import RevokedToken
+
+async def revoke_token(db: AsyncSession, *, jti: str, expires_at: datetime) -> None:
+    stmt = pg_insert(RevokedToken).values(jti=jti, expires_at=expires_at).on_conflict_do_nothing()
+    await db.execute(stmt)
+    await db.commit()
+
+async def is_token_revoked(db: AsyncSession, jti: str) -> bool:
+    result = await db.execute(select(RevokedToken.jti).where(RevokedToken.jti == jti))
+    return result.scalar() is not None
+
+async def get_active_revocations(db: AsyncSession) -> List[Row]:
+    result = await db.execute(
+        select(RevokedToken.jti, RevokedToken.revoked_at)
+        .where(RevokedToken.expires_at > datetime.now(timezone.utc))
+    )
+    return result.all()
+
+async def get_revocations_since(db: AsyncSession, since: datetime) -> List[Row]:
+    # >= rather than >: rows committed later with the same timestamp must not be missed
+    result = await db.execute(
+        select(RevokedToken.jti, RevokedToken.revoked_at).where(RevokedToken.revoked_at >= since)
+    )
+    return result.all()
+
+async def delete_expired_revocations(db: AsyncSession, *, batch_size: int) -> int:
+    # One index-ordered batch; SKIP LOCKED lets several workers sweep without queueing on each other
+    expired = (
+        select(RevokedToken.jti)
+        .where(RevokedToken.expires_at <= datetime.now(timezone.utc))
+        .order_by(RevokedToken.expires_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        sqlalchemy_delete(RevokedToken).where(RevokedToken.jti.in_(expired)).execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
\ No newline at end of file
@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import uuid
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import TableClause, delete as sqlalchemy_delete, update as sqlalchemy_update
+
+from app.core.config import settings
+from app.core.security import create_refresh_token, hash_refresh_token
+from app.db.models import Session
+
+# Refresh-token sessions. Only the SHA-256 of a token is stored, and every lookup
+# goes through the index on token_hash.
+
+async def create_session(
+    db: AsyncSession,
+    *,
+    user_id: uuid.UUID,
+    family_id: Optional[uuid.UUID] = None,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None,
+    commit: bool = True,
+) -> tuple[str, Session]:
+    """
+    Issue a new refresh token. Returns the raw token (only ever given to the
+    client) and the stored session row.
+    """
+    refresh_token = create_refresh_token()
+    db_obj = Session(
+        user_id=user_id,
+        family_id=family_id or uuid.uuid4(),
+        token_hash=hash_refresh_token(refresh_token),
+        expires_at=datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+        ip_address=ip_address,
+        user_agent=user_agent[:255] if user_agent else None,
+    )
+    db.add(db_obj)
+    if commit:
+        await db.commit()
+    return refresh_token, db_obj
+
+async def revoke_session_family(db: AsyncSession, family_id: uuid.UUID) -> None:
+    await db.execute(
+        sqlalchemy_update(Session)
+        .where(Session.family_id == family_id, Session.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+    await db.commit()
+
+async def rotate_session(
+    db: AsyncSession,
+    *,
+    refresh_token: str,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None,
+) -> Optional[tuple[str, Session]]:
+    """
+    Exchange a refresh token for a new one in the same family.
+
+    The presented token is consumed with a single conditional UPDATE, so two
+    concurrent refreshes cannot both succeed. Presenting a token that was already
+    consumed means it leaked: the whole family is revoked and None is returned.
+    """
+    token_hash = hash_refresh_token(refresh_token)
+    now = datetime.now(timezone.utc)
+    result = await db.execute(
+        sqlalchemy_update(Session)
+        .where(
+            Session.token_hash == token_hash,
+            Session.revoked_at.is_(None),
+            Session.expires_at > now,
+        )
+        .values(revoked_at=now, last_used_at=now)
+        .returning(Session.user_id, Session.family_id)
+    )
+    consumed = result.first()
+    if consumed is None:
+        await db.rollback()
+        # Reuse detection: the token exists but was already rotated or revoked
+        result = await db.execute(
+            select(Session.family_id, Session.revoked_at).where(Session.token_hash == token_hash)
+        )
+        existing = result.first()
+        if existing is not None and existing.revoked_at is not None:
+            await revoke_session_family(db, existing.family_id)
+        return None
+
+    # Consume and re-issue in one transaction
+    return await create_session(
+        db,
+        user_id=consumed.user_id,
+        family_id=consumed.family_id,
+        ip_address=ip_address,
+        user_agent=user_agent,
+    )
+
+async def revoke_session(db: AsyncSession, *, refresh_token: str) -> bool:
+    """
+    Revoke the token family the refresh token belongs to (logs out that device).
+    """
+    result = await db.execute(
+        select(Session.family_id).where(Session.token_hash == hash_refresh_token(refresh_token))
+    )
+    family_id = result.scalar()
+    if family_id is None:
+        return False
+    await revoke_session_family(db, family_id)
+    return True
+
+async def delete_expired_sessions(
+    db: AsyncSession, *, before: datetime, batch_size: int, table: Optional[TableClause] = None
+) -> int:
+    """
+    Delete up to `batch_size` sessions that expired before `before`, oldest
+    first through ix_sessions_expires_at. `table` narrows the delete to one
+    partition of a partitioned sessions table.
+    """
+    table = Session.__table__ if table is None else table
+    expired = (
+        select(table.c.session_id)
+        .where(table.c.expires_at < before)
+        .order_by(table.c.expires_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        sqlalchemy_delete(table).where(table.c.session_id.in_(expired)).execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
@@ -1,12 +1,64 @@
-from typing import Any, Dict, Optional, Union, List
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Optional, Sequence, Union, List
 import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pydantic import ValidationError
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import update as sqlalchemy_update
+from sqlalchemy import Row, Select, any_, bindparam, exists, func, literal, or_, tuple_, update as sqlalchemy_update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import make_transient_to_detached
 
-from app.core.security import get_password_hash, verify_password
-from app.db.models import User, UserOAuthAccount
-from app.schemas.user import UserCreate, UserUpdate, UserOAuthInfo
+from app.core.batching import BatchLoader
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.security import (
+    get_password_hash_async,
+    is_password_hash,
+    verify_dummy_password_async,
+    verify_password_async,
+)
+from app.db.base import AsyncSessionLocal, get_replica_router
+from app.db.models import User, UserOAuthAccount, UserStatus
+from app.schemas.user import (
+    UserCreate,
+    UserImport,
+    UserImportResult,
+    UserImportRow,
+    UserOAuthInfo,
+    UserUpdate,
+)
+
+# In-process cache of users resolved by get_current_user, keyed by user_id.
+# Entries are detached snapshots; see get_user_cached.
+user_cache = TTLCache(maxsize=settings.USER_CACHE_MAX_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+
+def invalidate_cached_user(user_id: uuid.UUID) -> None:
+    user_cache.pop(user_id)
+
+def _mark_written(user: User) -> None:
+    # Read-your-writes: keep reads about this user on the primary for a while
+    get_replica_router().mark_written(user.user_id, user.email.lower(), user.username)
+
+@asynccontextmanager
+async def _read_session(db: AsyncSession, *keys: Any):
+    # Replica session for read-only lookups; without replicas (or right after a
+    # write to one of `keys`) reads simply share the caller's primary session
+    replica_router = get_replica_router()
+    if not replica_router.replicas or replica_router.recently_written(keys):
+        yield db
+    else:
+        async with replica_router.read_session() as read_db:
+            yield read_db
+
+def _detached_snapshot(user: User) -> User:
+    # Copy column values into a clean detached instance so the cached object is
+    # never shared with (or mutated through) a request's session
+    snapshot = User(**{attr.key: getattr(user, attr.key) for attr in User.__mapper__.column_attrs})
+    make_transient_to_detached(snapshot)
+    return snapshot
 
 # Basic CRUD operations for User model
 
@@ -14,31 +66,241 @@ async def get_user(db: AsyncSession, user_id: uuid.UUID) -> Optional[User]:
     result = await db.execute(select(User).filter(User.user_id == user_id))
     return result.scalars().first()
 
+def _user_id_in(db: AsyncSession, user_ids: Sequence[uuid.UUID]):
+    if db.get_bind().dialect.name == "postgresql":
+        # = ANY($1): one statement (and one prepared statement) whatever the batch size
+        return User.user_id == any_(bindparam("user_ids", list(user_ids), type_=ARRAY(PG_UUID(as_uuid=True))))
+    return User.user_id.in_(user_ids)
+
+async def get_users_by_ids(db: AsyncSession, user_ids: Sequence[uuid.UUID]) -> Dict[uuid.UUID, User]:
+    result = await db.execute(select(User).where(_user_id_in(db, user_ids)))
+    return {user.user_id: user for user in result.scalars()}
+
+async def _load_users(user_ids: Sequence[uuid.UUID]) -> Dict[uuid.UUID, User]:
+    # A batch serves many requests, so it runs on its own session and hands out detached snapshots
+    replica_router = get_replica_router()
+    on_replica = bool(replica_router.replicas) and not replica_router.recently_written(user_ids)
+    async with (replica_router.read_session() if on_replica else AsyncSessionLocal()) as db:
+        users = await get_users_by_ids(db, user_ids)
+    missing = [user_id for user_id in user_ids if user_id not in users]
+    if missing and on_replica:
+        async with AsyncSessionLocal() as db: # Replica may not have brand-new users yet
+            users.update(await get_users_by_ids(db, missing))
+    return {user_id: _detached_snapshot(user) for user_id, user in users.items()}
+
+# Coalesces the user lookups of concurrent requests (get_current_user on a cache miss)
+user_loader: BatchLoader[uuid.UUID, User] = BatchLoader(_load_users, max_batch_size=settings.USER_LOADER_MAX_BATCH_SIZE)
+
+async def get_user_cached(db: AsyncSession, user_id: uuid.UUID) -> Optional[User]:
+    """
+    get_user() behind the in-process user cache. Misses go through user_loader,
+    so concurrent misses share batched queries (on a replica when configured);
+    the result is always returned attached to `db`.
+    """
+    snapshot = user_cache.get(user_id)
+    if snapshot is None:
+        if settings.USER_BATCH_LOADING:
+            snapshot = await user_loader.load(user_id)
+        else:
+            async with _read_session(db, user_id) as read_db:
+                user = await get_user(read_db, user_id)
+                if user is None and read_db is not db:
+                    user = await get_user(db, user_id) # Replica may not have a brand-new user yet
+            snapshot = _detached_snapshot(user) if user is not None else None
+        if snapshot is None:
+            return None
+        user_cache.set(user_id, snapshot)
+    # merge(load=False) attaches a copy to this session without a SELECT
+    return await db.merge(snapshot, load=False)
+
+def _email_matches(email: str):
+    # Emails are unique case-insensitively; this form is served by ix_users_email_lower
+    return func.lower(User.email) == email.lower()
+
 async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
-    result = await db.execute(select(User).filter(User.email == email))
+    result = await db.execute(select(User).filter(_email_matches(email)))
     return result.scalars().first()
 
 async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
     result = await db.execute(select(User).filter(User.username == username))
     return result.scalars().first()
 
-async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[User]:
-    result = await db.execute(select(User).offset(skip).limit(limit))
+def _users_page_query(
+    *,
+    after: Optional[tuple[datetime, uuid.UUID]],
+    limit: int,
+    status: Optional[UserStatus],
+    email_verified: Optional[bool],
+) -> Select:
+    # Keyset pagination on (created_at, user_id), backed by ix_users_created_at_user_id:
+    # each page is an index range scan no matter how deep into the table it starts
+    query = select(User)
+    if status is not None:
+        query = query.where(User.status == status)
+    if email_verified is not None:
+        query = query.where(User.email_verified == email_verified)
+    if after is not None:
+        query = query.where(tuple_(User.created_at, User.user_id) > tuple_(*after))
+    return query.order_by(User.created_at, User.user_id).limit(limit)
+
+async def get_users(
+    db: AsyncSession,
+    *,
+    after: Optional[tuple[datetime, uuid.UUID]] = None,
+    limit: int = 100,
+    status: Optional[UserStatus] = None,
+    email_verified: Optional[bool] = None,
+) -> List[User]:
+    query = _users_page_query(after=after, limit=limit, status=status, email_verified=email_verified)
+    result = await db.execute(query)
     return result.scalars().all()
 
-async def create_user(db: AsyncSession, *, obj_in: UserCreate) -> User:
-    hashed_password = get_password_hash(obj_in.password)
-    db_obj = User(
-        email=obj_in.email,
-        username=obj_in.username,
-        hashed_password=hashed_password,
-        # Default status is set in the model
+async def iter_users(
+    session_factory: Callable[[], AsyncSession],
+    *,
+    chunk_size: int = 1000,
+    status: Optional[UserStatus] = None,
+    email_verified: Optional[bool] = None,
+) -> AsyncIterator[User]:
+    """
+    Yield every matching user in keyset order for exports. Each chunk is read
+    through a server-side cursor on its own short-lived session, so memory
+    stays constant and no pooled connection is held between chunks.
+    """
+    after = None
+    while True:
+        query = _users_page_query(after=after, limit=chunk_size, status=status, email_verified=email_verified)
+        rows = 0
+        async with session_factory() as db:
+            result = await db.stream_scalars(query.execution_options(yield_per=chunk_size))
+            async for user in result:
+                rows += 1
+                after = (user.created_at, user.user_id)
+                yield user
+        if rows < chunk_size:
+            return
+
+async def create_user(db: AsyncSession, *, obj_in: UserCreate) -> Optional[User]:
+    """
+    Insert a new user in a single statement. Returns None instead of raising when
+    the email or username is already taken (ON CONFLICT DO NOTHING).
+    """
+    hashed_password = await get_password_hash_async(obj_in.password)
+    stmt = (
+        pg_insert(User)
+        .values(
+            email=obj_in.email,
+            username=obj_in.username,
+            hashed_password=hashed_password,
+            # Default status is set in the model
+        )
+        .on_conflict_do_nothing()
+        .returning(User) # RETURNING replaces the post-commit refresh
     )
-    db.add(db_obj)
+    result = await db.execute(stmt)
+    db_obj = result.scalars().first()
     await db.commit()
-    await db.refresh(db_obj)
+    if db_obj is not None:
+        _mark_written(db_obj)
     return db_obj
 
+# Hashes a batch of plain passwords, e.g. security.get_password_hashes_admitted
+PasswordHasher = Callable[[Sequence[str]], Awaitable[List[str]]]
+
+async def bulk_create_users(
+    db: AsyncSession, users: Sequence[UserImport], *, hash_passwords: PasswordHasher
+) -> List[Optional[uuid.UUID]]:
+    """
+    Insert a batch of users with one multi-row INSERT ... ON CONFLICT DO NOTHING.
+    Returns the new user_id for each input, or None where it conflicted.
+    """
+    # Hash the plain passwords in parallel; imported bcrypt hashes are used as-is
+    to_hash = [i for i, u in enumerate(users) if not u.hashed_password]
+    hashes = await hash_passwords([users[i].password for i in to_hash])
+    hashed_passwords = [u.hashed_password for u in users]
+    for i, hashed in zip(to_hash, hashes):
+        hashed_passwords[i] = hashed
+
+    # A repeated email inside the batch would be skipped by ON CONFLICT anyway;
+    # only the first occurrence is sent so results map back by email unambiguously
+    first_by_email: Dict[str, int] = {}
+    for i, u in enumerate(users):
+        first_by_email.setdefault(u.email.lower(), i)
+    values = [
+        {"email": users[i].email, "username": users[i].username, "hashed_password": hashed_passwords[i]}
+        for i in first_by_email.values()
+    ]
+    stmt = pg_insert(User).values(values).on_conflict_do_nothing().returning(User.user_id, User.email)
+    result = await db.execute(stmt)
+    created = {email.lower(): user_id for user_id, email in result.all()}
+    await db.commit()
+    return [
+        created.get(u.email.lower()) if first_by_email[u.email.lower()] == i else None
+        for i, u in enumerate(users)
+    ]
+
+async def import_users(
+    db: AsyncSession,
+    records: AsyncIterable[Any],
+    *,
+    hash_passwords: PasswordHasher,
+    batch_size: int = 1000,
+    include_created: bool = False,
+    max_rows: Optional[int] = None,
+    on_row: Optional[Callable[[UserImportRow], Any]] = None,
+) -> UserImportResult:
+    """
+    Validate and insert a stream of raw user records (dicts) in batches.
+
+    Every row is counted; conflicting and invalid rows (and created ones if
+    include_created) are also listed in the result, up to max_rows, or passed
+    to on_row instead so a caller can stream them out without holding them.
+    """
+    summary = UserImportResult()
+    batch: List[UserImport] = []
+    batch_rows: List[int] = []
+
+    def report(row: UserImportRow) -> None:
+        if on_row is not None:
+            on_row(row)
+        elif max_rows is not None and len(summary.rows) >= max_rows:
+            summary.rows_truncated = True
+        else:
+            summary.rows.append(row)
+
+    async def flush() -> None:
+        user_ids = await bulk_create_users(db, batch, hash_passwords=hash_passwords)
+        for row, user_in, user_id in zip(batch_rows, batch, user_ids):
+            if user_id is None:
+                summary.conflicts += 1
+                report(UserImportRow(row=row, status="conflict", email=user_in.email))
+            else:
+                summary.created += 1
+                if include_created:
+                    report(UserImportRow(row=row, status="created", email=user_in.email, user_id=user_id))
+        batch.clear()
+        batch_rows.clear()
+
+    row = 0
+    async for record in records:
+        row += 1
+        try:
+            user_in = UserImport.model_validate(record)
+            if user_in.hashed_password and not is_password_hash(user_in.hashed_password):
+                raise ValueError("hashed_password is not a recognised bcrypt hash")
+        except (ValidationError, ValueError) as e:
+            summary.invalid += 1
+            email = record.get("email") if isinstance(record, dict) else None
+            report(UserImportRow(row=row, status="invalid", email=email, error=str(e)))
+            continue
+        batch.append(user_in)
+        batch_rows.append(row)
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+    return summary
+
 async def update_user(db: AsyncSession, *, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]) -> User:
     if isinstance(obj_in, dict):
         update_data = obj_in
@@ -46,7 +308,7 @@ async def update_user(db: AsyncSession, *, db_obj: User, obj_in: Union[UserUpdat
         update_data = obj_in.model_dump(exclude_unset=True) # Use model_dump in Pydantic v2
 
     if "password" in update_data and update_data["password"]:
-        hashed_password = get_password_hash(update_data["password"])
+        hashed_password = await get_password_hash_async(update_data["password"])
         del update_data["password"]
         update_data["hashed_password"] = hashed_password
     elif "password" in update_data: # Handle case where password might be None or empty string
@@ -58,78 +320,106 @@ async def update_user(db: AsyncSession, *, db_obj: User, obj_in: Union[UserUpdat
 
     db.add(db_obj)
     await db.commit()
+    invalidate_cached_user(db_obj.user_id)
+    _mark_written(db_obj)
     await db.refresh(db_obj)
     return db_obj
 
 
-async def authenticate_user(db: AsyncSession, *, username_or_email: str, password: str) -> Optional[User]:
-    user = await get_user_by_email(db, email=username_or_email)
-    if not user and "@" not in username_or_email: # Try username if email failed and it looks like a username
-         user = await get_user_by_username(db, username=username_or_email)
+async def get_user_credentials(db: AsyncSession, username_or_email: str) -> Optional[Row]:
+    """
+    Resolve an email or username in one query, selecting only the columns
+    authentication needs. An email match wins over a username match.
+    """
+    conditions = [_email_matches(username_or_email)]
+    if "@" not in username_or_email: # Only something that looks like a username can match one
+        conditions.append(User.username == username_or_email)
+    query = select(User.user_id, User.hashed_password, User.status, User.email_verified).where(or_(*conditions))
+    if len(conditions) > 1:
+        query = query.order_by(_email_matches(username_or_email).desc())
+    result = await db.execute(query.limit(1))
+    return result.first()
 
-    if not user:
+async def authenticate_user(db: AsyncSession, *, username_or_email: str, password: str) -> Optional[Row]:
+    async with _read_session(db, username_or_email, username_or_email.lower()) as read_db:
+        credentials = await get_user_credentials(read_db, username_or_email)
+        if not credentials and read_db is not db:
+            credentials = await get_user_credentials(db, username_or_email) # Replica may lag behind a fresh registration
+    if not credentials or not credentials.hashed_password:
+        # Unknown (or OAuth-only) account: hash anyway, so response time does not reveal which
+        await verify_dummy_password_async(password)
         return None
-    if not user.hashed_password or not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, credentials.hashed_password):
         return None
-    return user
+    return credentials
 
-async def get_or_create_oauth_user(db: AsyncSession, *, oauth_info: UserOAuthInfo) -> User:
-    # 1. Check if OAuth account exists
-    query = select(UserOAuthAccount).where(
-        UserOAuthAccount.provider_name == oauth_info.provider_name,
-        UserOAuthAccount.provider_user_id == oauth_info.provider_user_id
-    ).limit(1)
-    result = await db.execute(query)
-    oauth_account = result.scalars().first()
-
-    if oauth_account:
-        # Update last login maybe?
-        # stmt = (
-        #     sqlalchemy_update(User)
-        #     .where(User.user_id == oauth_account.user_id)
-        #     .values(last_login_at=func.now())
-        # )
-        # await db.execute(stmt)
-        # await db.commit()
-        return await get_user(db, oauth_account.user_id) # Return existing user
-
-    # 2. Check if user with this email already exists
-    user = await get_user_by_email(db, email=oauth_info.email)
-
-    if user:
-        # User exists, link the new OAuth account to them
-        db_oauth_account = UserOAuthAccount(
-            user_id=user.user_id,
-            provider_name=oauth_info.provider_name,
-            provider_user_id=oauth_info.provider_user_id,
+def _oauth_user_query(oauth_info: UserOAuthInfo) -> Select:
+    # Account -> user in one round trip, served by uq_provider_user
+    return (
+        select(User)
+        .join(UserOAuthAccount, UserOAuthAccount.user_id == User.user_id)
+        .where(
+            UserOAuthAccount.provider_name == oauth_info.provider_name,
+            UserOAuthAccount.provider_user_id == oauth_info.provider_user_id,
         )
-        db.add(db_oauth_account)
-        # Optionally mark email as verified if provider guarantees it
-        if not user.email_verified:
-            user.email_verified = True
-            db.add(user)
-
-        await db.commit()
-        await db.refresh(user)
-        return user
-    else:
-        # 3. Create new user and link OAuth account
-        new_user = User(
+        .limit(1)
+    )
+
+async def _upsert_oauth_user(db: AsyncSession, oauth_info: UserOAuthInfo, *, username: Optional[str]) -> User:
+    username_if_free = None
+    if username:
+        # The provider's username is only a default; someone else may already have it
+        username_if_free = (
+            select(literal(username)).where(~exists().where(User.username == username)).scalar_subquery()
+        )
+    user_stmt = (
+        pg_insert(User)
+        .values(
             email=oauth_info.email,
-            username=oauth_info.username, # Might need generation if null/duplicate
-            email_verified=True, # Assume verified from provider
-            status=UserStatus.active # Directly activate OAuth users
+            username=username_if_free,
+            email_verified=True, # Providers only hand out verified emails, see app.core.oauth
+            status=UserStatus.active, # Directly activate OAuth users
             # hashed_password is None
         )
-        db.add(new_user)
-        await db.flush() # Flush to get the new_user.user_id
+        # An existing account with this email is linked rather than duplicated
+        .on_conflict_do_update(index_elements=[func.lower(User.email)], set_={"email_verified": True})
+        .returning(User) # RETURNING replaces the post-commit refresh
+    )
+    result = await db.execute(user_stmt)
+    user = result.scalars().one()
 
-        db_oauth_account = UserOAuthAccount(
-            user_id=new_user.user_id,
+    account_stmt = (
+        pg_insert(UserOAuthAccount)
+        .values(
+            user_id=user.user_id,
             provider_name=oauth_info.provider_name,
             provider_user_id=oauth_info.provider_user_id,
         )
-        db.add(db_oauth_account)
-        await db.commit()
-        await db.refresh(new_user)
-        return new_user
\ No newline at end of file
+        # A concurrent first login of the same account got here first; it linked the same user
+        .on_conflict_do_nothing(index_elements=["provider_name", "provider_user_id"])
+    )
+    await db.execute(account_stmt)
+    await db.commit()
+    return user
+
+async def get_or_create_oauth_user(db: AsyncSession, *, oauth_info: UserOAuthInfo) -> User:
+    """
+    Resolve the local user for a provider identity. A returning user costs one
+    joined query; a first login upserts the user and the account link in one
+    transaction, so concurrent first logins converge on the same user.
+    """
+    result = await db.execute(_oauth_user_query(oauth_info))
+    user = result.scalars().first()
+    if user is not None:
+        # last_login_at is recorded by the activity write-behind buffer in the callback
+        return user
+
+    try:
+        user = await _upsert_oauth_user(db, oauth_info, username=oauth_info.username)
+    except IntegrityError:
+        # Lost a race for the username itself; sign the user in without one
+        await db.rollback()
+        user = await _upsert_oauth_user(db, oauth_info, username=None)
+    invalidate_cached_user(user.user_id) # email_verified may have changed
+    _mark_written(user)
+    return user
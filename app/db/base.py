@@ -1,20 +1,78 @@
-from datetime import datetime
+from functools import lru_cache
+from typing import Annotated
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, DeclarativeBase, Mapped, mapped_column
+from fastapi import Depends
+
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from sqlalchemy import MetaData
-from sqlalchemy.sql import func
-from sqlalchemy import Column, DateTime
+from sqlalchemy import Column
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import functions
 from app.core.config import settings
+from app.core.timing import instrument_engine
+from app.db.pool import PoolHealthChecker, engine_options, register_pool_metrics
+from app.db.routing import ReplicaRouter
 import uuid
 from sqlalchemy.dialects.postgresql import UUID # Or use sqlalchemy.types.UUID for cross-DB
 
 DATABASE_URL = settings.DATABASE_URL
 
-engine = create_async_engine(DATABASE_URL, pool_pre_ping=True) # echo=True for debugging SQL
-AsyncSessionLocal = sessionmaker(
-    bind=engine, class_=AsyncSession, expire_on_commit=False
-)
+# Engines, the session factory and the replica router are built on first use
+# (normally by app.main.create_app), not at import: importing the models, the
+# CLI or Alembic's env does not create pools or register pool metrics.
+
+@lru_cache()
+def get_engine() -> AsyncEngine:
+    # Pool and driver options come from the DB_* settings (see app.db.pool.engine_options)
+    engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+    register_pool_metrics(engine)
+    instrument_engine(engine)
+    return engine
+
+@lru_cache()
+def get_sessionmaker() -> sessionmaker:
+    return sessionmaker(bind=get_engine(), class_=AsyncSession, expire_on_commit=False)
+
+def AsyncSessionLocal() -> AsyncSession:
+    # Called like the sessionmaker it stands for; stores take it as their session factory
+    return get_sessionmaker()()
+
+@lru_cache()
+def get_pool_health() -> PoolHealthChecker:
+    return PoolHealthChecker(get_engine(), interval=settings.DB_HEALTH_CHECK_SECONDS)
+
+# Read replicas (optional). Read-only CRUD calls go through the replica router.
+@lru_cache()
+def get_replica_engines() -> list[AsyncEngine]:
+    replica_engines = []
+    for i, replica_url in enumerate(settings.DATABASE_REPLICA_URLS):
+        replica_engine = create_async_engine(replica_url, **engine_options(replica_url, pool_label=f"replica{i}"))
+        register_pool_metrics(replica_engine, pool_label=f"replica{i}")
+        instrument_engine(replica_engine)
+        replica_engines.append(replica_engine)
+    return replica_engines
+
+@lru_cache()
+def get_replica_router() -> ReplicaRouter:
+    return ReplicaRouter(
+        get_engine(),
+        get_replica_engines(),
+        strategy=settings.REPLICA_BALANCING,
+        window=settings.REPLICA_READ_YOUR_WRITES_SECONDS,
+    )
+
+def __getattr__(name: str):
+    # The former module-level names (engine, pool_health, ...), built on first access
+    accessors = {
+        "engine": get_engine,
+        "pool_health": get_pool_health,
+        "replica_engines": get_replica_engines,
+        "replica_router": get_replica_router,
+    }
+    if name in accessors:
+        return accessors[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Define naming convention for constraints for Alembic autogenerate
 convention = {
@@ -27,18 +85,29 @@ convention = {
 
 metadata_obj = MetaData(naming_convention=convention)
 
+# Models declare their own primary key and timestamp columns
 class Base(DeclarativeBase):
     metadata = metadata_obj
 
-    id: Mapped[int] = mapped_column(primary_key=True)
-    created_at: Mapped[datetime] = mapped_column(
-     DateTime(timezone=True), server_default=func.now())
-    updated_at: Mapped[datetime] = mapped_column(
-         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
-    )
+# SQLite: now() defaults to CURRENT_TIMESTAMP, whole seconds without the fraction that bound
+# datetimes are stored with, so text comparisons (keyset cursors, sync watermarks) go wrong
+# within a second. Render it in SQLAlchemy's own storage format instead.
+@compiles(functions.now, "sqlite")
+def _sqlite_now(element, compiler, **kw):
+    return "STRFTIME('%Y-%m-%d %H:%M:%f000', 'now')"
 
 
 # Dependency to get DB session
 async def get_db():
     async with AsyncSessionLocal() as session:
+        yield session
+
+# Dependency to get a read-only session: a replica when configured, otherwise
+# the request's primary session (so no second connection is checked out)
+async def get_read_db(db: Annotated[AsyncSession, Depends(get_db)]):
+    replica_router = get_replica_router()
+    if not replica_router.replicas:
+        yield db
+        return
+    async with replica_router.read_session() as session:
         yield session
\ No newline at end of file
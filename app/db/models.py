@@ -1,10 +1,10 @@
 import uuid
 
 from datetime import datetime
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Enum as SAEnum
+from sqlalchemy import Column, String, Boolean, DateTime, Double, ForeignKey, Enum as SAEnum
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.sql import func
-from sqlalchemy.schema import UniqueConstraint
+from sqlalchemy.schema import Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID # For PostgreSQL specific UUID type
 from sqlalchemy import UUID as Standard_UUID # Standard, use if cross-DB compatibility is key
 
@@ -20,8 +20,8 @@ class User(Base):
     __tablename__ = "users"
 
     user_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    username: Mapped[str] = mapped_column(String(50), unique=True, index=True, nullable=True) # Nullable if email is primary login
-    email: Mapped[str] = mapped_column(String(255), unique=True, index=True, nullable=False)
+    username: Mapped[str] = mapped_column(String(50), unique=True, nullable=True) # Nullable if email is primary login
+    email: Mapped[str] = mapped_column(String(255), nullable=False) # Unique case-insensitively, see __table_args__
     email_verified: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     hashed_password: Mapped[str] = mapped_column(String(255), nullable=True) # Nullable for OAuth-only users
     status: Mapped[UserStatus] = mapped_column(SAEnum(UserStatus), default=UserStatus.pending_verification, nullable=False)
@@ -31,13 +31,20 @@ class User(Base):
 
     oauth_accounts = relationship("UserOAuthAccount", back_populates="user", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # The only index on email: enforces uniqueness and serves lower(email) lookups
+        Index("ix_users_email_lower", func.lower(email), unique=True),
+        # Keyset pagination order for the user listing / export
+        Index("ix_users_created_at_user_id", "created_at", "user_id"),
+    )
+
 class UserOAuthAccount(Base):
     __tablename__ = "user_oauth_accounts"
 
     oauth_account_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("users.user_id"), nullable=False)
-    provider_name: Mapped[str] = mapped_column(String(50), index=True, nullable=False) # e.g., 'google', 'github'
-    provider_user_id: Mapped[str] = mapped_column(String(255), index=True, nullable=False) # ID from the provider
+    provider_name: Mapped[str] = mapped_column(String(50), nullable=False) # e.g., 'google', 'github'
+    provider_user_id: Mapped[str] = mapped_column(String(255), nullable=False) # ID from the provider
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     # Optional: access_token, refresh_token (encrypted!), expires_at, scopes
@@ -45,20 +52,49 @@ class UserOAuthAccount(Base):
     user = relationship("User", back_populates="oauth_accounts")
 
     __table_args__ = (
-        # Unique constraint for a user from a specific provider
+        # Unique constraint for a user from a specific provider; its index serves provider lookups
         UniqueConstraint('provider_name', 'provider_user_id', name='uq_provider_user'),
     )
 
-# Add other models here as needed (PasswordResets, EmailVerifications, Sessions, AuditLogs)
-# Example Session Model Stub:
+# Add other models here as needed (PasswordResets, EmailVerifications, AuditLogs)
+# Server-side refresh-token sessions. Each login starts a token family; every refresh
+# revokes the presented token and issues the next one in the same family.
 class Session(Base):
     __tablename__ = "sessions"
     session_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), ForeignKey("users.user_id"), nullable=False)
-    token_hash: Mapped[str] = mapped_column(String(255), unique=True, index=True, nullable=False) # Hash of refresh token
-    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    family_id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), index=True, nullable=False) # Shared by all rotations of one login
+    token_hash: Mapped[str] = mapped_column(String(64), index=True, nullable=False) # SHA-256 hex of refresh token; random, so not declared unique
+    # In the primary key so that the table can be range-partitioned by it (see alembic.ini, [sessions_partitioning])
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True, index=True) # Also the expiry sweep's index
+    revoked_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True) # Set on rotation, revoke or reuse
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     last_used_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     ip_address: Mapped[str | None] = mapped_column(String(50), nullable=True)
     user_agent: Mapped[str | None] = mapped_column(String(255), nullable=True)
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+# Revoked access tokens, keyed by their `jti` claim. Rows are only needed until the
+# token itself expires; see app.core.revocation for the in-process filter in front of it.
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    jti: Mapped[str] = mapped_column(String(64), primary_key=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True, nullable=False)
+    revoked_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True, nullable=False)
+
+# Pending OAuth logins: the `state` sent to the provider, and the OIDC `nonce` its
+# id_token must echo. Single-use (deleted on callback); see app.core.oauth_state.
+class OAuthState(Base):
+    __tablename__ = "oauth_states"
+    state: Mapped[str] = mapped_column(String(64), primary_key=True)
+    provider: Mapped[str] = mapped_column(String(50), nullable=False)
+    nonce: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True, nullable=False)
+
+# Shared rate-limit state (RATE_LIMIT_BACKEND=database), one row per limited key.
+# `tat` is the GCRA "theoretical arrival time" in epoch seconds: a row whose tat has
+# passed is a full bucket and can be deleted; see app.core.rate_limit.
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    tat: Mapped[float] = mapped_column(Double, index=True, nullable=False)
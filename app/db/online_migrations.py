@@ -0,0 +1,192 @@
+"""
+Helpers for migrations that must run against live, large tables.
+
+Use them from Alembic revisions instead of the plain `op` calls:
+
+    from app.db import online_migrations as online
+
+    def upgrade() -> None:
+        online.create_index_concurrently("ix_users_last_login_at", "users", ["last_login_at"])
+        online.backfill("users", "email_verified = false", where="email_verified IS NULL", key="user_id")
+
+On PostgreSQL, index builds run CONCURRENTLY outside the migration transaction,
+and backfills commit one batch at a time. Every statement runs under
+`lock_timeout`, so DDL that would queue behind a long transaction (and block all
+writers queued behind it) fails fast and is retried instead. On other dialects
+the helpers fall back to the plain operations.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Sequence, TypeVar
+
+from alembic import op
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.core.config import settings
+
+logger = logging.getLogger("alembic.online")
+
+T = TypeVar("T")
+
+LOCK_NOT_AVAILABLE = "55P03" # SQLSTATE raised when lock_timeout expires
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def configure_connection(connection) -> None:
+    """Session-level guards, applied by alembic/env.py before any migration runs."""
+    if connection.dialect.name != "postgresql":
+        return
+    connection.execute(text(f"SET lock_timeout = {int(settings.MIGRATION_LOCK_TIMEOUT_MS)}"))
+    connection.execute(text(f"SET statement_timeout = {int(settings.MIGRATION_STATEMENT_TIMEOUT_MS)}"))
+    connection.commit() # Session settings outlive the transaction; Alembic then opens its own
+
+
+def _is_lock_timeout(exc: DBAPIError) -> bool:
+    orig = exc.orig
+    code = getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+    return code == LOCK_NOT_AVAILABLE
+
+
+def with_lock_retries(func: Callable[[], T], *, attempts: int | None = None, backoff: float = 1.0) -> T:
+    """Run `func`, retrying with backoff when it gives up waiting for a lock."""
+    attempts = attempts or settings.MIGRATION_LOCK_RETRIES
+    for attempt in range(1, attempts + 1):
+        try:
+            return func()
+        except DBAPIError as exc:
+            if not _is_lock_timeout(exc) or attempt == attempts:
+                raise
+            delay = backoff * 2 ** (attempt - 1)
+            logger.warning("Lock timeout (attempt %d/%d), retrying in %.1fs", attempt, attempts, delay)
+            time.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+@contextmanager
+def _autocommit() -> Iterator[None]:
+    # Ends the migration's transaction; CONCURRENTLY and per-batch commits need this
+    if _is_postgresql():
+        with op.get_context().autocommit_block():
+            yield
+    else:
+        yield
+
+
+def _offline() -> bool:
+    return op.get_context().as_sql # `alembic upgrade --sql`: statements are printed, not run
+
+
+def _drop_invalid_index(name: str) -> None:
+    # A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind; drop it so a rerun can rebuild it
+    if _offline():
+        return
+    invalid = op.get_bind().execute(
+        text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {"name": name},
+    ).first()
+    if invalid:
+        logger.warning("Dropping invalid index %s left by an earlier attempt", name)
+        op.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+
+
+def create_index_concurrently(
+    name: str, table: str, columns: Sequence, *, unique: bool = False, **kwargs
+) -> None:
+    """`op.create_index` without blocking writes to `table` while the index builds."""
+    if not _is_postgresql():
+        op.create_index(name, table, list(columns), unique=unique, **kwargs)
+        return
+
+    def build() -> None:
+        _drop_invalid_index(name)
+        op.create_index(
+            name, table, list(columns), unique=unique, postgresql_concurrently=True, if_not_exists=True, **kwargs
+        )
+
+    with _autocommit():
+        started = time.monotonic()
+        logger.info("Building index %s on %s concurrently", name, table)
+        with_lock_retries(build)
+        logger.info("Built index %s in %.1fs", name, time.monotonic() - started)
+
+
+def execute_with_lock_retries(*statements: str) -> None:
+    """
+    Run DDL in the migration's transaction, retried as a unit on lock timeouts.
+    Each attempt runs in a savepoint, so a timeout does not abort the migration.
+    """
+    if _offline() or not _is_postgresql():
+        for statement in statements:
+            op.execute(text(statement))
+        return
+    bind = op.get_bind()
+
+    def run() -> None:
+        with bind.begin_nested():
+            for statement in statements:
+                bind.execute(text(statement))
+
+    with_lock_retries(run)
+
+
+def drop_index_concurrently(name: str, table: str) -> None:
+    if not _is_postgresql():
+        op.drop_index(name, table_name=table)
+        return
+    with _autocommit():
+        with_lock_retries(lambda: op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True))
+
+
+def backfill(
+    table: str,
+    assignments: str,
+    *,
+    where: str,
+    key: str,
+    batch_size: int | None = None,
+    sleep_seconds: float | None = None,
+) -> int:
+    """
+    Run `UPDATE table SET assignments WHERE where` in key-ordered batches, each
+    committed on its own (PostgreSQL), so no batch holds row locks for long and
+    replicas keep up. `where` must stop matching rows once they are updated, or
+    the loop never finishes. Returns the number of rows updated.
+    """
+    if _offline():
+        op.execute(text(f"UPDATE {table} SET {assignments} WHERE {where}"))
+        return 0
+    batch_size = batch_size or settings.MIGRATION_BACKFILL_BATCH_SIZE
+    sleep_seconds = settings.MIGRATION_BACKFILL_SLEEP_SECONDS if sleep_seconds is None else sleep_seconds
+    batch = text(
+        f"UPDATE {table} SET {assignments} WHERE {key} IN "
+        f"(SELECT {key} FROM {table} WHERE {where} ORDER BY {key} LIMIT :batch_size) "
+        f"RETURNING {key}"
+    )
+
+    with _autocommit():
+        bind = op.get_bind()
+        remaining = bind.execute(text(f"SELECT count(*) FROM {table} WHERE {where}")).scalar_one()
+        logger.info("Backfilling %d rows of %s in batches of %d", remaining, table, batch_size)
+        updated = 0
+        started = time.monotonic()
+        while True:
+            rows = with_lock_retries(lambda: len(bind.execute(batch, {"batch_size": batch_size}).all()))
+            if not rows:
+                break
+            updated += rows
+            elapsed = time.monotonic() - started
+            logger.info(
+                "Backfilled %d/%d rows of %s (%.0f rows/s)",
+                updated, remaining, table, updated / elapsed if elapsed else 0,
+            )
+            if sleep_seconds:
+                time.sleep(sleep_seconds) # Throttle to leave I/O headroom for production traffic
+    return updated
@@ -0,0 +1,109 @@
+"""
+Range partitions by day, for tables whose rows expire (PostgreSQL only).
+
+Partitions are named after their bounds, `<prefix>_pYYYYMMDD_YYYYMMDD`
+(lower bound inclusive, upper exclusive), so listing them needs no parsing of
+catalog expressions. Bounds are aligned to multiples of `days` since
+0001-01-01, so every caller computes the same boundaries. Rows outside every
+partition land in `<prefix>_default`.
+
+The functions take a sync Connection: migrations pass `op.get_bind()`, async
+code goes through `run_sync`.
+"""
+import re
+from datetime import date, timedelta
+from typing import NamedTuple
+
+from sqlalchemy import Connection, text
+
+
+class Partition(NamedTuple):
+    name: str
+    start: date
+    end: date
+
+
+def default_partition(prefix: str) -> str:
+    return f"{prefix}_default"
+
+
+def partition_name(prefix: str, start: date, end: date) -> str:
+    return f"{prefix}_p{start:%Y%m%d}_{end:%Y%m%d}"
+
+
+def _range_pattern(prefix: str) -> re.Pattern:
+    return re.compile(rf"{re.escape(prefix)}_p(\d{{8}})_(\d{{8}})")
+
+
+def is_partition_name(name: str, prefix: str) -> bool:
+    """Whether `name` is one of the partitions above (e.g. to keep them out of autogenerate)."""
+    return name == default_partition(prefix) or _range_pattern(prefix).fullmatch(name) is not None
+
+
+def align(day: date, days: int) -> date:
+    return date.fromordinal(day.toordinal() - (day.toordinal() - 1) % days)
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"), {"table": table}
+    ).first() is not None
+
+
+def list_partitions(conn: Connection, table: str, prefix: str) -> list[Partition]:
+    """Range partitions of `table` named by partition_name, oldest first (the default partition is left out)."""
+    pattern = _range_pattern(prefix)
+    rows = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)"
+        ),
+        {"table": table},
+    ).scalars()
+    partitions = []
+    for name in rows:
+        match = pattern.fullmatch(name)
+        if match:
+            start, end = (date(int(s[:4]), int(s[4:6]), int(s[6:])) for s in match.groups())
+            partitions.append(Partition(name, start, end))
+    return sorted(partitions, key=lambda p: p.start)
+
+
+def create_partitions(
+    conn: Connection, table: str, prefix: str, *, start: date, through: date, days: int
+) -> list[str]:
+    """
+    Create the missing partitions so that [start, through] is covered, continuing
+    from the newest existing partition. Returns the names created.
+    """
+    existing = list_partitions(conn, table, prefix)
+    lower = existing[-1].end if existing and existing[-1].end > start else align(start, days)
+    created = []
+    while lower <= through:
+        upper = lower + timedelta(days=days)
+        name = partition_name(prefix, lower, upper)
+        # IF NOT EXISTS: every worker runs the same maintenance
+        conn.execute(text(
+            f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+            f"FOR VALUES FROM ('{lower.isoformat()} 00:00:00+00') TO ('{upper.isoformat()} 00:00:00+00')"
+        ))
+        created.append(name)
+        lower = upper
+    return created
+
+
+def create_default_partition(conn: Connection, table: str, prefix: str) -> None:
+    conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{default_partition(prefix)}" PARTITION OF "{table}" DEFAULT'))
+
+
+def drop_partitions_before(conn: Connection, table: str, prefix: str, cutoff: date) -> list[str]:
+    """Drop the partitions whose rows all expired before `cutoff`: one catalog change instead of a DELETE per row."""
+    dropped = []
+    for partition in list_partitions(conn, table, prefix):
+        if partition.end > cutoff:
+            break
+        conn.execute(text(f'DROP TABLE IF EXISTS "{partition.name}"'))
+        dropped.append(partition.name)
+    return dropped
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+from functools import lru_cache
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+pool_wait_seconds = metrics.histogram(
+    "db_pool_wait_seconds", "Time spent waiting to check a connection out of the pool", labelnames=("pool",)
+)
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long each checkout waited."""
+
+    pool_label = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait_seconds.observe(time.perf_counter() - started, pool=self.pool_label)
+
+
+@lru_cache()
+def _pool_class(pool_label: str) -> type[InstrumentedAsyncPool]:
+    # A subclass per label, because dispose() rebuilds the pool from its class
+    return type(f"InstrumentedAsyncPool_{pool_label}", (InstrumentedAsyncPool,), {"pool_label": pool_label})
+
+
+def engine_options(url: str, pool_label: str = "primary") -> dict:
+    """
+    create_async_engine() keyword arguments for `url`, built from the DB_* settings.
+    Pool sizing only applies to real connection pools (not in-memory SQLite), and
+    statement-cache sizing only to asyncpg.
+    """
+    parsed = make_url(url)
+    options: dict = {"pool_pre_ping": settings.DB_POOL_PRE_PING, "echo": settings.DB_ECHO}
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return options
+
+    options.update(
+        poolclass=_pool_class(pool_label),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_use_lifo=True, # Lets surplus idle connections age out through pool_recycle
+    )
+    if parsed.get_driver_name() == "asyncpg":
+        options["connect_args"] = {
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE, # SQLAlchemy-side cache
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE, # asyncpg's own cache
+        }
+    return options
+
+
+pool_size = metrics.gauge("db_pool_size", "Configured size of the connection pool", labelnames=("pool",))
+pool_checked_out = metrics.gauge("db_pool_checked_out", "Connections currently checked out", labelnames=("pool",))
+pool_idle = metrics.gauge("db_pool_idle", "Idle connections held by the pool", labelnames=("pool",))
+pool_overflow = metrics.gauge("db_pool_overflow", "Connections open beyond the pool size", labelnames=("pool",))
+
+
+def register_pool_metrics(engine: AsyncEngine, pool_label: str = "primary") -> None:
+    if not isinstance(engine.pool, AsyncAdaptedQueuePool):
+        return
+    # Read engine.pool at scrape time: dispose() swaps in a new pool object
+    pool_size.set_function(lambda: engine.pool.size(), pool=pool_label)
+    pool_checked_out.set_function(lambda: engine.pool.checkedout(), pool=pool_label)
+    pool_idle.set_function(lambda: engine.pool.checkedin(), pool=pool_label)
+    pool_overflow.set_function(lambda: max(engine.pool.overflow(), 0), pool=pool_label)
+
+
+class PoolHealthChecker:
+    """
+    Background replacement for pool_pre_ping: probes the database every
+    DB_HEALTH_CHECK_SECONDS and disposes the pool when the probe fails, so stale
+    connections are dropped in one go instead of pinging on every checkout.
+    """
+
+    def __init__(self, engine: AsyncEngine, interval: float, timeout: float = 5):
+        self.engine = engine
+        self.interval = interval
+        self.timeout = timeout
+        self.healthy = True
+        self.failures = 0
+        self._task: asyncio.Task | None = None
+
+    async def _probe(self) -> None:
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def check(self) -> bool:
+        try:
+            await asyncio.wait_for(self._probe(), timeout=self.timeout)
+            self.healthy = True
+        except Exception:
+            self.failures += 1
+            self.healthy = False
+            logger.exception("Database health check failed; disposing connection pool")
+            await self.engine.dispose()
+        return self.healthy
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    def start(self) -> None:
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
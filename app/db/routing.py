@@ -0,0 +1,62 @@
+import itertools
+from typing import Hashable, Iterable
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.core.cache import TTLCache
+
+
+class ReplicaRouter:
+    """
+    Chooses the engine for read-only work: a replica picked round-robin or by
+    fewest checked-out connections, or the primary when no replica is configured.
+
+    Read-your-writes: write paths call `mark_written()` with the keys they touched
+    (user_id, email, ...). For `window` seconds afterwards, reads for those keys are
+    sent to the primary so they never observe replication lag. The guard is per
+    process; callers fall back to the primary on a replica miss to cover writes
+    made by other workers.
+    """
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: list[AsyncEngine],
+        *,
+        strategy: str = "round_robin",
+        window: float = 5,
+        max_tracked_writes: int = 100000,
+    ):
+        if strategy not in ("round_robin", "least_connections"):
+            raise ValueError(f"Unknown replica balancing strategy: {strategy}")
+        self.primary = primary
+        self.replicas = replicas
+        self.strategy = strategy
+        self._round_robin = itertools.cycle(range(len(replicas))) if replicas else None
+        self._session_factories = {
+            id(e): sessionmaker(bind=e, class_=AsyncSession, expire_on_commit=False)
+            for e in [primary, *replicas]
+        }
+        self._recent_writes = TTLCache(maxsize=max_tracked_writes, ttl=window)
+
+    def mark_written(self, *keys: Hashable) -> None:
+        for key in keys:
+            if key is not None:
+                self._recent_writes.set(key, True)
+
+    def recently_written(self, keys: Iterable[Hashable]) -> bool:
+        return any(self._recent_writes.get(key) for key in keys if key is not None)
+
+    def pick(self) -> AsyncEngine:
+        if not self.replicas:
+            return self.primary
+        if self.strategy == "least_connections":
+            return min(self.replicas, key=lambda e: e.pool.checkedout() if hasattr(e.pool, "checkedout") else 0)
+        return self.replicas[next(self._round_robin)]
+
+    def read_session(self, *keys: Hashable) -> AsyncSession:
+        """A session for read-only queries about `keys` (primary if any was just written)."""
+        engine = self.primary if self.recently_written(keys) else self.pick()
+        return self._session_factories[id(engine)]()
+
@@ -1,41 +1,165 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-
-from app.api.v1.api import api_router # Import the v1 router
-from app.core.config import settings
-
-app = FastAPI(
-    title="Auth Boilerplate API",
-    openapi_url="/api/v1/openapi.json", # Match the router prefix
-    docs_url="/api/v1/docs", # Customize docs URL
-    redoc_url="/api/v1/redoc" # Customize redoc URL
-)
-
-# Set all CORS enabled origins
-# In production, restrict this more carefully!
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"], # Allows all origins
-    # allow_origins=["http://localhost:3000", "http://localhost:8080"], # Example specific origins
-    allow_credentials=True,
-    allow_methods=["*"], # Allows all methods
-    allow_headers=["*"], # Allows all headers
-)
-
-# Include the API router
-app.include_router(api_router, prefix="/api/v1") # Prefix for versioning
-
-@app.get("/")
+from app.core.startup import startup_report
+
+# Third-party stacks are imported (and timed) one by one first, so the "app" group is charged
+# for the app's own modules only. python-jose and passlib are deferred to create_app().
+startup_report.import_dependencies([
+    "pydantic", "pydantic_settings", "email_validator", # email_validator: loaded by EmailStr schemas
+    "sqlalchemy.orm", "sqlalchemy.ext.asyncio", "sqlalchemy.dialects.postgresql",
+    "fastapi", "httpx",
+])
+
+with startup_report.timed_imports("app"):
+    import asyncio
+    from contextlib import asynccontextmanager, suppress
+
+    from fastapi import FastAPI, Request, status
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import JSONResponse, PlainTextResponse, Response
+
+    from app.api.v1.api import api_router # Import the v1 router
+    from app.api.responses import FastJSONResponse
+    from app.core import metrics, oauth, security
+    from app.core.activity import activity_buffer
+    from app.core.config import settings
+    from app.core.expiry import expiry_sweeper
+    from app.core.jwt_keys import get_key_ring
+    from app.core.oauth_state import oauth_states
+    from app.core.rate_limit import RateLimited, rate_limiter
+    from app.core.revocation import revocation_list
+    from app.core.timing import TimedRoute, TimingMiddleware
+    from app.core.warmup import warm_up
+    from app.db.base import get_engine, get_pool_health, get_replica_router
+
+async def warm_up_and_report_ready():
+    # A background task, so uvicorn serves while it runs: /health/live answers and
+    # /health/ready stays 503 until it is done. Failed steps are recorded, not raised
+    if settings.STARTUP_WARMUP:
+        await warm_up() # Connections, hash workers, provider documents: the first requests run warm
+    startup_report.ready = True
+    startup_report.log()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: DB schema is handled by Alembic
+    pool_health = get_pool_health()
+    pool_health.start()
+    revocation_list.start()
+    activity_buffer.start()
+    oauth.oauth_http.start() # Shared keep-alive pool for provider calls
+    oauth_states.start() # Periodic sweep of abandoned logins
+    rate_limiter.start() # Sweeps idle shared buckets (database backend only)
+    expiry_sweeper.start() # Batched deletion of expired sessions and revoked tokens
+    warmup_task = asyncio.create_task(warm_up_and_report_ready())
+    yield
+    # Shutdown
+    startup_report.ready = False # Fail readiness first, so load balancers stop routing here
+    warmup_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await warmup_task
+    await revocation_list.stop()
+    await activity_buffer.stop() # Flush buffered last_login_at
+    await pool_health.stop()
+    await oauth.oauth_http.stop()
+    await oauth_states.stop()
+    await rate_limiter.stop()
+    await expiry_sweeper.stop()
+    security.shutdown_hash_executor() # Waits for in-flight password hashes
+    await get_engine().dispose()
+
+# Shed password-hashing load with a fast 503 instead of queueing it
+async def hashing_overloaded_handler(request: Request, exc: security.HashingOverloaded):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Authentication service is busy, please retry shortly."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Too many requests, please retry later."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+async def oauth_error_handler(request: Request, exc: oauth.OAuthError):
+    return JSONResponse(
+        status_code=status.HTTP_502_BAD_GATEWAY if isinstance(exc, oauth.OAuthProviderUnavailable) else status.HTTP_400_BAD_REQUEST,
+        content={"detail": str(exc)},
+    )
+
 async def root():
     return {"message": "Auth API is running"}
 
-# Optional: Add startup/shutdown events if needed
-# @app.on_event("startup")
-# async def startup_event():
-#     # Initialize DB, etc. (Alembic handles schema)
-#     pass
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+async def jwks(request: Request):
+    """
+    Public keys for verifying access tokens (ES256/RS256), matched by the token's `kid`.
+    """
+    key_ring = get_key_ring()
+    headers = {"Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}", "ETag": key_ring.jwks_etag}
+    if request.headers.get("if-none-match") == key_ring.jwks_etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(key_ring.jwks_json, media_type="application/jwk-set+json", headers=headers)
+
+
+def create_app() -> FastAPI:
+    """
+    Application factory, for `uvicorn --factory app.main:create_app` (or
+    `uvicorn app.main:app`, which builds one on first access).
+    """
+    # The process-wide singletons are built here rather than at import, so importing app
+    # modules (tests, the CLI, Alembic) is cheap, and a bad configuration fails right here
+    with startup_report.component("db_engines"):
+        get_replica_router() # Builds the primary and replica engines
+        get_pool_health()
+    with startup_report.component("password_context"):
+        security.get_pwd_context()
+    with startup_report.component("jwt_key_ring"):
+        get_key_ring()
+
+    application = FastAPI(
+        title="Auth Boilerplate API",
+        openapi_url="/api/v1/openapi.json", # Match the router prefix
+        docs_url="/api/v1/docs", # Customize docs URL
+        redoc_url="/api/v1/redoc", # Customize redoc URL
+        lifespan=lifespan,
+        default_response_class=FastJSONResponse if settings.FAST_JSON_RESPONSES else JSONResponse,
+    )
+    application.router.route_class = TimedRoute
+
+    # Set all CORS enabled origins
+    # In production, restrict this more carefully!
+    application.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"], # Allows all origins
+        # allow_origins=["http://localhost:3000", "http://localhost:8080"], # Example specific origins
+        allow_credentials=True,
+        allow_methods=["*"], # Allows all methods
+        allow_headers=["*"], # Allows all headers
+    )
+
+    # Outermost middleware, so its total covers everything below it
+    application.add_middleware(TimingMiddleware, emit_header=settings.SERVER_TIMING_HEADER)
+
+    application.add_exception_handler(security.HashingOverloaded, hashing_overloaded_handler)
+    application.add_exception_handler(RateLimited, rate_limited_handler)
+    application.add_exception_handler(oauth.OAuthError, oauth_error_handler)
+
+    # Include the API router
+    application.include_router(api_router, prefix="/api/v1") # Prefix for versioning
+
+    application.add_api_route("/", root, methods=["GET"])
+    application.add_api_route("/metrics", prometheus_metrics, methods=["GET"], include_in_schema=False)
+    application.add_api_route("/.well-known/jwks.json", jwks, methods=["GET"])
+    return application
+
 
-# @app.on_event("shutdown")
-# async def shutdown_event():
-#     # Close DB connections, etc.
-#     pass
\ No newline at end of file
+def __getattr__(name: str):
+    # The default app is only built when asked for, so the factory path builds exactly one
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -4,6 +4,15 @@ import uuid
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str | None = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
-    sub: uuid.UUID | None = None # Subject (user_id)
\ No newline at end of file
+    sub: uuid.UUID | None = None # Subject (user_id)
+    jti: str | None = None # Token id, used for revocation
+    exp: int | None = None
+
+    class Config:
+        frozen = True # Instances are shared through the decoded-token cache
\ No newline at end of file
@@ -1,7 +1,7 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, model_validator
 import uuid
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 
 from app.db.models import UserStatus # Import the enum
 
@@ -14,6 +14,17 @@ class UserBase(BaseModel):
 class UserCreate(UserBase):
     password: str = Field(..., min_length=8, example="S3cureP@ssw0rd")
 
+# One record of a bulk import: a plain password, or a hash migrated from another system
+class UserImport(UserBase):
+    password: Optional[str] = Field(None, min_length=8)
+    hashed_password: Optional[str] = None # Must be a bcrypt hash; skips hashing entirely
+
+    @model_validator(mode="after")
+    def check_password_present(self):
+        if not self.password and not self.hashed_password:
+            raise ValueError("Either password or hashed_password is required")
+        return self
+
 # Properties received via API on update (optional fields)
 class UserUpdate(UserBase):
     email: Optional[EmailStr] = None # Allow email update (needs verification flow usually)
@@ -40,6 +51,26 @@ class UserInDB(UserInDBBase):
 class User(UserInDBBase):
     pass # Inherits public fields from UserInDBBase
 
+# One page of the keyset-paginated user listing
+class UserPage(BaseModel):
+    items: List[User]
+    next_cursor: Optional[str] = None # Pass back as `cursor` to fetch the next page
+
+# Per-row outcome of a bulk import
+class UserImportRow(BaseModel):
+    row: int # 1-based position in the input stream
+    status: Literal["created", "conflict", "invalid"]
+    email: Optional[str] = None
+    user_id: Optional[uuid.UUID] = None
+    error: Optional[str] = None
+
+class UserImportResult(BaseModel):
+    created: int = 0
+    conflicts: int = 0
+    invalid: int = 0
+    rows: List[UserImportRow] = [] # Conflicts and invalid rows (plus created ones on request), up to the cap
+    rows_truncated: bool = False # More rows matched than were listed
+
 # Schema for OAuth User Info (example)
 class UserOAuthInfo(BaseModel):
     provider_name: str
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import statistics
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable
+
+
+@dataclass
+class Result:
+    name: str
+    ops: int
+    errors: int
+    seconds: float
+    throughput: float # successful ops per second
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    extra: dict = field(default_factory=dict)
+
+
+def _percentile(sorted_samples: list[float], pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, round(pct / 100 * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+def summarize(name: str, latencies: list[float], errors: int, seconds: float) -> Result:
+    samples = sorted(latencies)
+    to_ms = 1000
+    return Result(
+        name=name,
+        ops=len(samples),
+        errors=errors,
+        seconds=round(seconds, 4),
+        throughput=round((len(samples) - errors) / seconds, 2) if seconds else 0.0,
+        p50_ms=round(_percentile(samples, 50) * to_ms, 4),
+        p95_ms=round(_percentile(samples, 95) * to_ms, 4),
+        p99_ms=round(_percentile(samples, 99) * to_ms, 4),
+        mean_ms=round(statistics.fmean(samples) * to_ms, 4) if samples else 0.0,
+    )
+
+
+async def run_async(
+    name: str,
+    op: Callable[[int], Awaitable[bool]],
+    *,
+    iterations: int,
+    concurrency: int = 1,
+    warmup: int = 0,
+) -> Result:
+    """
+    Run `op(i)` for i in range(iterations) across `concurrency` workers. `op`
+    returns False (or raises) to count an error.
+    """
+    for i in range(warmup):
+        await op(-(i + 1)) # Negative indexes let ops tell warmup calls apart
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(iterations))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                ok = await op(i)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(name, latencies, errors, time.perf_counter() - started)
+
+
+def run_sync(name: str, op: Callable[[int], Any], *, iterations: int, warmup: int = 100) -> Result:
+    for i in range(warmup):
+        op(i)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t = time.perf_counter()
+        op(i)
+        latencies.append(time.perf_counter() - t)
+    return summarize(name, latencies, 0, time.perf_counter() - started)
+
+
+# --- Baseline comparison ---
+
+def compare(current: dict, baseline: dict, max_regression: float) -> list[str]:
+    """
+    Regressions of `current` against `baseline` (both run() reports): p95 latency
+    up, or throughput down, by more than `max_regression` (a fraction).
+    """
+    regressions = []
+    baseline_results = {r["name"]: r for r in baseline["results"]}
+    for result in current["results"]:
+        base = baseline_results.get(result["name"])
+        if base is None:
+            continue
+        if base["p95_ms"] and result["p95_ms"] > base["p95_ms"] * (1 + max_regression):
+            regressions.append(
+                f"{result['name']}: p95 {base['p95_ms']:.3f}ms -> {result['p95_ms']:.3f}ms"
+            )
+        if base["throughput"] and result["throughput"] < base["throughput"] * (1 - max_regression):
+            regressions.append(
+                f"{result['name']}: throughput {base['throughput']:.1f}/s -> {result['throughput']:.1f}/s"
+            )
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{result['name']}: errors {base['errors']} -> {result['errors']}")
+    return regressions
+
+
+def report(results: list[Result], meta: dict) -> dict:
+    return {"meta": meta, "results": [asdict(r) for r in results]}
+
+
+def print_table(results: list[Result]) -> None:
+    header = f"{'benchmark':<34}{'ops':>7}{'err':>6}{'ops/s':>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r.name:<34}{r.ops:>7}{r.errors:>6}{r.throughput:>11.1f}{r.p50_ms:>10.3f}{r.p95_ms:>10.3f}{r.p99_ms:>10.3f}")
+
+
+def dump(data: dict, path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
@@ -0,0 +1,326 @@
+"""
+Benchmarks for the auth hot paths, driving the real FastAPI app in-process.
+
+    python -m benchmarks.run                       # SQLite stand-in in a temp dir
+    python -m benchmarks.run --database-url postgresql+asyncpg://u:p@localhost/throwaway
+    python -m benchmarks.run --output current.json --baseline baseline.json --max-regression 0.15
+    python -m benchmarks.run --only micro --jwt-algorithm ES256   # with an ephemeral signing key
+
+The database is dropped and recreated from the models, so only point
+--database-url at a throwaway database. Results are printed as a table and,
+with --output, written as JSON (throughput and p50/p95/p99 per benchmark).
+With --baseline the run exits non-zero when any benchmark regressed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+
+def parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--requests", type=int, default=500, help="Requests per cheap HTTP scenario")
+    parser.add_argument("--hash-requests", type=int, default=20, help="Requests per bcrypt-bound scenario (register/login)")
+    parser.add_argument("--micro-iterations", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--provider-latency-ms", type=float, default=0, help="Simulated OAuth provider latency")
+    parser.add_argument("--jwt-algorithm", choices=("HS256", "ES256", "RS256"), default=os.getenv("ALGORITHM", "HS256"))
+    parser.add_argument("--only", help="Comma-separated benchmark name prefixes to run")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Compare against a previous JSON report")
+    parser.add_argument("--max-regression", type=float, default=0.10, help="Allowed fractional regression")
+    return parser.parse_args(argv)
+
+
+def _generate_private_key_pem(algorithm: str) -> str:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+    if algorithm == "ES256":
+        key = ec.generate_private_key(ec.SECP256R1())
+    else:
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+
+
+def configure_environment(args: argparse.Namespace) -> str:
+    # Must run before anything imports app.core.config
+    database_url = args.database_url
+    if not database_url:
+        database_url = f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='auth-bench-')}/bench.db"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    os.environ.setdefault("DB_HEALTH_CHECK_SECONDS", "0")
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false") # HTTP scenarios reuse a handful of users from one client
+    os.environ["ALGORITHM"] = args.jwt_algorithm
+    if args.jwt_algorithm != "HS256" and "JWT_SIGNING_KEYS" not in os.environ:
+        os.environ["JWT_SIGNING_KEYS"] = json.dumps({"bench": _generate_private_key_pem(args.jwt_algorithm)})
+
+    # OAuth callbacks hit a local stub provider over real HTTP (pooled client)
+    from benchmarks.stub_provider import start_in_thread
+
+    stub_url, _ = start_in_thread(latency_ms=args.provider_latency_ms)
+    os.environ["OAUTH_GOOGLE_CLIENT_ID"] = "bench-client"
+    os.environ["OAUTH_GOOGLE_CLIENT_SECRET"] = "bench-secret"
+    os.environ["OAUTH_GOOGLE_DISCOVERY_URL"] = f"{stub_url}/google/.well-known/openid-configuration"
+    return database_url
+
+
+async def run_benchmarks(args: argparse.Namespace) -> list:
+    import httpx
+
+    from app.core import security
+    from app.crud import crud_user
+    from app.db.base import AsyncSessionLocal, Base, get_engine
+    from app.main import app
+    from app.schemas.user import UserCreate
+    from benchmarks.harness import run_async, run_sync
+
+    only = [p.strip() for p in args.only.split(",")] if args.only else None
+    selected = lambda name: only is None or any(name.startswith(p) for p in only)
+    results = []
+
+    engine = get_engine()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    password = "benchmark-password"
+    run_id = int(time.time())
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # --- Fixtures: one user (plus a token) per concurrent worker ---
+            users = []
+            for i in range(args.concurrency):
+                async with AsyncSessionLocal() as db:
+                    db_user = await crud_user.create_user(
+                        db, obj_in=UserCreate(email=f"seed{i}-{run_id}@bench.example.com", username=f"seed{i}_{run_id}", password=password)
+                    )
+                if db_user is None:
+                    raise RuntimeError("Could not create benchmark fixture users")
+                users.append(db_user)
+            tokens = [security.create_access_token(subject=u.user_id) for u in users]
+
+            # --- HTTP scenarios ---
+            if selected("http.register"):
+                async def register(i: int) -> bool:
+                    r = await client.post(
+                        "/api/v1/auth/register",
+                        json={"email": f"reg{i}-{run_id}@bench.example.com", "password": password},
+                    )
+                    return r.status_code == 200
+                results.append(await run_async("http.register", register, iterations=args.hash_requests, concurrency=args.concurrency))
+
+            if selected("http.login"):
+                async def login(i: int) -> bool:
+                    u = users[i % len(users)]
+                    r = await client.post(
+                        "/api/v1/auth/login/access-token", data={"username": u.email, "password": password}
+                    )
+                    return r.status_code == 200
+                results.append(await run_async("http.login", login, iterations=args.hash_requests, concurrency=args.concurrency))
+
+            if selected("http.users_me"):
+                async def users_me(i: int) -> bool:
+                    r = await client.get(
+                        "/api/v1/users/me", headers={"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+                    )
+                    return r.status_code == 200
+                results.append(await run_async("http.users_me", users_me, iterations=args.requests, concurrency=args.concurrency, warmup=10))
+
+            if selected("http.oauth_login"):
+                # Full flow: login redirect (state stored), the stub's authorize redirect, then
+                # the callback (state consumed, code exchanged). 50 identities mix new and returning users
+                async with httpx.AsyncClient() as provider:
+                    async def oauth_login(i: int) -> bool:
+                        r = await client.get("/api/v1/auth/login/oauth/google")
+                        state_cookie = r.cookies["oauth_state"]
+                        authorize_url = httpx.URL(r.headers["location"]).copy_merge_params({"login_hint": f"bench-{run_id}-{i % 50}"})
+                        r = await provider.get(authorize_url)
+                        r = await client.get(r.headers["location"], headers={"Cookie": f"oauth_state={state_cookie}"})
+                        return r.status_code == 302
+                    results.append(await run_async("http.oauth_login", oauth_login, iterations=args.requests, concurrency=args.concurrency))
+
+        # --- Micro-benchmarks: token helpers ---
+        if selected("micro.create_access_token"):
+            results.append(run_sync(
+                "micro.create_access_token",
+                lambda i: security.create_access_token(subject=users[0].user_id),
+                iterations=args.micro_iterations,
+            ))
+        if selected("micro.decode_access_token"):
+            results.append(run_sync(
+                "micro.decode_access_token", lambda i: security.decode_access_token(tokens[0]), iterations=args.micro_iterations
+            ))
+        if selected("micro.decode_access_token_cached"):
+            results.append(run_sync(
+                "micro.decode_access_token_cached",
+                lambda i: security.decode_access_token_cached(tokens[0]),
+                iterations=args.micro_iterations,
+            ))
+
+        # --- Micro-benchmarks: OAuth state issue + consume, per backend ---
+        if selected("micro.oauth_state"):
+            from app.core.oauth_state import DatabaseOAuthStateStore, InMemoryOAuthStateStore, OAuthStates
+
+            for backend, store in (
+                ("memory", InMemoryOAuthStateStore(max_entries=10000)),
+                ("database", DatabaseOAuthStateStore(AsyncSessionLocal)),
+            ):
+                states = OAuthStates(store, ttl=600)
+                async def issue_and_consume(i: int, states=states) -> bool:
+                    state, _ = await states.issue("google", with_nonce=True)
+                    return await states.consume(state, "google") is not None
+                results.append(await run_async(
+                    f"micro.oauth_state.{backend}", issue_and_consume, iterations=args.micro_iterations // 4, warmup=10
+                ))
+
+        # --- Micro-benchmarks: one rate-limit check per backend (local buckets in front of the shared table) ---
+        if selected("micro.rate_limit"):
+            from app.core.config import settings
+            from app.core.rate_limit import (
+                DatabaseRateLimitBackend, InMemoryRateLimitBackend, RateLimit, RateLimited, RateLimiter,
+            )
+
+            enabled, settings.RATE_LIMIT_ENABLED = settings.RATE_LIMIT_ENABLED, True
+            limit = RateLimit.parse("bench", "1000000/minute")
+            for backend, shared in (("memory", None), ("database", DatabaseRateLimitBackend(AsyncSessionLocal))):
+                limiter = RateLimiter(InMemoryRateLimitBackend(shards=16, max_keys=10000), shared)
+                async def check(i: int, limiter=limiter) -> bool:
+                    try:
+                        await limiter.check(limit, f"10.0.{i % 256}.{i % 50}")
+                    except RateLimited:
+                        return False
+                    return True
+                results.append(await run_async(
+                    f"micro.rate_limit.{backend}", check, iterations=args.micro_iterations, concurrency=args.concurrency, warmup=10
+                ))
+            settings.RATE_LIMIT_ENABLED = enabled
+
+        # --- Micro-benchmarks: expiry sweep, one batched DELETE of expired sessions per op ---
+        if selected("micro.expiry"):
+            import uuid
+            from datetime import datetime, timedelta, timezone
+
+            from sqlalchemy import insert
+
+            from app.crud import crud_session
+            from app.db.models import Session
+
+            batch_size, iterations = 100, args.micro_iterations // 20
+            expired_at = datetime.now(timezone.utc) - timedelta(days=2)
+            async with AsyncSessionLocal() as db:
+                await db.execute(insert(Session), [
+                    {"session_id": uuid.uuid4(), "user_id": users[i % len(users)].user_id, "family_id": uuid.uuid4(),
+                     "token_hash": uuid.uuid4().hex + uuid.uuid4().hex, "expires_at": expired_at}
+                    for i in range((iterations + 10) * batch_size)
+                ])
+                await db.commit()
+            async def delete_batch(i: int) -> bool:
+                async with AsyncSessionLocal() as db:
+                    before = datetime.now(timezone.utc) - timedelta(days=1)
+                    return await crud_session.delete_expired_sessions(db, before=before, batch_size=batch_size) == batch_size
+            results.append(await run_async("micro.expiry.delete_batch", delete_batch, iterations=iterations, warmup=10))
+
+        # --- Micro-benchmarks: /users/me response rendering ---
+        # "validated" is what a response_model route does with an ORM row;
+        # "trusted" is the app.api.responses path the endpoint now takes
+        if selected("micro.serialize"):
+            from pydantic import TypeAdapter
+
+            from app.api.responses import model_response, trusted
+            from app.schemas.user import User as UserSchema
+
+            adapter = TypeAdapter(UserSchema)
+            results.append(run_sync(
+                "micro.serialize.user_validated",
+                lambda i: adapter.dump_json(adapter.validate_python(users[0], from_attributes=True)),
+                iterations=args.micro_iterations,
+            ))
+            results.append(run_sync(
+                "micro.serialize.user_trusted",
+                lambda i: model_response(trusted(UserSchema, users[0])),
+                iterations=args.micro_iterations,
+            ))
+
+        # --- Micro-benchmarks: CRUD (one session per call, as a request would) ---
+        def crud_op(fn):
+            async def op(i: int) -> bool:
+                async with AsyncSessionLocal() as db:
+                    return await fn(db, i) is not None
+            return op
+
+        crud_benchmarks = {
+            "micro.crud.get_user": lambda db, i: crud_user.get_user(db, users[i % len(users)].user_id),
+            "micro.crud.get_user_cached": lambda db, i: crud_user.get_user_cached(db, users[i % len(users)].user_id),
+            "micro.crud.get_user_by_email": lambda db, i: crud_user.get_user_by_email(db, users[i % len(users)].email),
+            "micro.crud.get_user_credentials": lambda db, i: crud_user.get_user_credentials(db, users[i % len(users)].username),
+            "micro.crud.get_users_page": lambda db, i: crud_user.get_users(db, limit=50),
+        }
+        for name, fn in crud_benchmarks.items():
+            if selected(name):
+                results.append(await run_async(name, crud_op(fn), iterations=args.micro_iterations // 4, warmup=10))
+
+        # Cache misses for a few hot users under concurrency, with and without the user loader
+        from app.core.config import settings
+
+        for mode, batched in (("direct", False), ("batched", True)):
+            name = f"micro.crud.get_user_cold.{mode}"
+            if selected(name):
+                async def get_user_cold(db, i: int):
+                    user_id = users[i % 3].user_id
+                    crud_user.invalidate_cached_user(user_id)
+                    return await crud_user.get_user_cached(db, user_id)
+                settings.USER_BATCH_LOADING = batched
+                results.append(await run_async(
+                    name, crud_op(get_user_cold), iterations=args.micro_iterations // 4, concurrency=args.concurrency, warmup=10
+                ))
+        settings.USER_BATCH_LOADING = True
+
+    await engine.dispose()
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    database_url = configure_environment(args)
+
+    from benchmarks import harness
+
+    results = asyncio.run(run_benchmarks(args))
+    harness.print_table(results)
+
+    data = harness.report(results, meta={
+        "database": database_url.split("://")[0],
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "concurrency": args.concurrency,
+        "jwt_algorithm": args.jwt_algorithm,
+        "timestamp": int(time.time()),
+    })
+    if args.output:
+        harness.dump(data, args.output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = harness.compare(data, baseline, args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.max_regression:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+Local stand-in for Google (OIDC) and GitHub, for tests (tests/conftest.py), benchmarks and manual testing.
+
+    python -m benchmarks.stub_provider --port 9000 --latency-ms 20
+
+Point the app at it with:
+
+    OAUTH_GOOGLE_CLIENT_ID=stub OAUTH_GOOGLE_CLIENT_SECRET=stub
+    OAUTH_GOOGLE_DISCOVERY_URL=http://127.0.0.1:9000/google/.well-known/openid-configuration
+    OAUTH_GITHUB_CLIENT_ID=stub OAUTH_GITHUB_CLIENT_SECRET=stub
+    OAUTH_GITHUB_AUTHORIZE_URL=http://127.0.0.1:9000/github/login/oauth/authorize
+    OAUTH_GITHUB_TOKEN_URL=http://127.0.0.1:9000/github/login/oauth/access_token
+    OAUTH_GITHUB_API_URL=http://127.0.0.1:9000/github/api
+
+Any authorization code is accepted, and the code decides the identity: code
+"alice" (or "alice.<anything>") signs in as subject "alice" with the verified
+email alice@stub.example.com. Google id_tokens for "userinfo-<name>" leave the
+email out, so the app has to ask the userinfo endpoint; "userinfo-<name>-as-<other>"
+makes userinfo answer for subject "<other>" instead. The authorize endpoints redirect straight back
+with a code for login_hint (or a random identity), and remember the OIDC nonce
+for the id_token. id_tokens are RS256-signed with a key
+generated at startup and published at the JWKS endpoint. --latency-ms adds a
+delay to every response to simulate a provider's round trip.
+"""
+import argparse
+import asyncio
+import secrets
+import threading
+import time
+from urllib.parse import urlencode
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI, Form, Header, HTTPException, Request
+from fastapi.responses import RedirectResponse
+from jose import jwk, jwt
+
+KID = "stub-1"
+
+_private_pem = rsa.generate_private_key(public_exponent=65537, key_size=2048).private_bytes(
+    serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+)
+_signing_key = jwk.construct(_private_pem, "RS256") # Parsed once; loading the PEM per token dominates
+_public_jwk = {**_signing_key.public_key().to_dict(), "kid": KID, "use": "sig"}
+
+app = FastAPI(title="Stub OAuth provider")
+app.state.latency = 0.0
+
+_nonces: dict[str, str] = {} # code -> nonce from the authorize request, echoed in the id_token
+
+
+@app.middleware("http")
+async def simulated_latency(request: Request, call_next):
+    if app.state.latency:
+        await asyncio.sleep(app.state.latency)
+    return await call_next(request)
+
+
+def _identity(token: str) -> str:
+    # Codes and access tokens are "<identity>.<random>"
+    return token.removeprefix("Bearer ").split(".", 1)[0]
+
+
+# --- Google-style OIDC ---
+
+@app.get("/google/.well-known/openid-configuration")
+async def google_discovery(request: Request):
+    base = str(request.base_url).rstrip("/") + "/google"
+    return {
+        "issuer": base,
+        "authorization_endpoint": f"{base}/authorize",
+        "token_endpoint": f"{base}/token",
+        "userinfo_endpoint": f"{base}/userinfo",
+        "jwks_uri": f"{base}/jwks",
+        "id_token_signing_alg_values_supported": ["RS256"],
+    }
+
+
+@app.get("/google/jwks")
+async def google_jwks():
+    return {"keys": [_public_jwk]}
+
+
+@app.get("/google/authorize")
+@app.get("/github/login/oauth/authorize")
+async def authorize(redirect_uri: str, state: str, nonce: str | None = None, login_hint: str | None = None):
+    code = f"{login_hint or secrets.token_hex(8)}.{secrets.token_hex(4)}"
+    if nonce:
+        _nonces[code] = nonce
+    return RedirectResponse(f"{redirect_uri}?{urlencode({'code': code, 'state': state})}", status_code=302)
+
+
+@app.post("/google/token")
+async def google_token(
+    request: Request,
+    code: str = Form(...),
+    client_id: str = Form(...),
+    grant_type: str = Form(...),
+):
+    if grant_type != "authorization_code":
+        raise HTTPException(status_code=400, detail="unsupported_grant_type")
+    identity = _identity(code)
+    access_token = f"{identity}.{secrets.token_urlsafe(16)}"
+    now = int(time.time())
+    claims = {
+        "iss": str(request.base_url).rstrip("/") + "/google",
+        "aud": client_id,
+        "sub": identity,
+        "email": f"{identity}@stub.example.com",
+        "email_verified": True,
+        "iat": now,
+        "exp": now + 3600,
+    }
+    if identity.startswith("userinfo-"):
+        del claims["email"], claims["email_verified"]
+    nonce = _nonces.pop(code, None)
+    if nonce:
+        claims["nonce"] = nonce
+    id_token = jwt.encode(
+        claims,
+        _signing_key,
+        algorithm="RS256",
+        headers={"kid": KID},
+        access_token=access_token,
+    )
+    return {"access_token": access_token, "id_token": id_token, "token_type": "Bearer", "expires_in": 3600}
+
+
+@app.get("/google/userinfo")
+async def google_userinfo(authorization: str = Header(...)):
+    identity = _identity(authorization)
+    identity = identity.partition("-as-")[2] or identity
+    return {"sub": identity, "email": f"{identity}@stub.example.com", "email_verified": True}
+
+
+# --- GitHub-style OAuth 2 ---
+
+@app.post("/github/login/oauth/access_token")
+async def github_token(code: str = Form(...)):
+    return {"access_token": f"{_identity(code)}.{secrets.token_urlsafe(16)}", "token_type": "bearer", "scope": "read:user,user:email"}
+
+
+@app.get("/github/api/user")
+async def github_user(authorization: str = Header(...)):
+    identity = _identity(authorization)
+    return {"id": abs(hash(identity)) % 10**9, "login": identity}
+
+
+@app.get("/github/api/user/emails")
+async def github_emails(authorization: str = Header(...)):
+    identity = _identity(authorization)
+    return [{"email": f"{identity}@stub.example.com", "primary": True, "verified": True}]
+
+
+def start_in_thread(port: int = 0, latency_ms: float = 0):
+    """Serve the stub from a background thread. Returns (base_url, server); set server.should_exit to stop."""
+    import uvicorn
+
+    app.state.latency = latency_ms / 1000
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    bound_port = server.servers[0].sockets[0].getsockname()[1]
+    return f"http://127.0.0.1:{bound_port}", server
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.stub_provider")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    args = parser.parse_args()
+    app.state.latency = args.latency_ms / 1000
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,81 @@
+"""
+Settings are read when `app` is first imported, so the environment is set up
+here, before any test module imports it: a throwaway SQLite database, and the
+OAuth providers pointed at the local stub (benchmarks/stub_provider.py).
+"""
+import asyncio
+import os
+import tempfile
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.stub_provider import start_in_thread
+
+stub_url, _stub_server = start_in_thread()
+
+os.environ.update({
+    "DATABASE_URL": f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='auth-tests-')}/test.db",
+    "SECRET_KEY": "test-secret-key",
+    "DB_HEALTH_CHECK_SECONDS": "0",
+    "EXPIRY_SWEEP_SECONDS": "0",
+    "RATE_LIMIT_ENABLED": "false",
+    "OAUTH_GOOGLE_CLIENT_ID": "test-client",
+    "OAUTH_GOOGLE_CLIENT_SECRET": "test-secret",
+    "OAUTH_GOOGLE_DISCOVERY_URL": f"{stub_url}/google/.well-known/openid-configuration",
+    "OAUTH_GITHUB_CLIENT_ID": "test-client",
+    "OAUTH_GITHUB_CLIENT_SECRET": "test-secret",
+    "OAUTH_GITHUB_AUTHORIZE_URL": f"{stub_url}/github/login/oauth/authorize",
+    "OAUTH_GITHUB_TOKEN_URL": f"{stub_url}/github/login/oauth/access_token",
+    "OAUTH_GITHUB_API_URL": f"{stub_url}/github/api",
+})
+
+
+async def _create_tables() -> None:
+    from app.db.base import Base, get_engine
+    import app.db.models # noqa: F401 (registers the tables)
+
+    engine = get_engine()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def app_client():
+    asyncio.run(_create_tables())
+    from app.main import app
+
+    with TestClient(app, follow_redirects=False) as client:
+        yield client
+    _stub_server.should_exit = True
+
+
+@pytest.fixture
+def client(app_client):
+    app_client.cookies.clear()
+    return app_client
+
+
+@pytest.fixture
+def signup(client):
+    """Register a fresh user and log in; returns the user and the token response."""
+    def signup(password: str = "password123") -> tuple[dict, dict]:
+        name = f"user-{uuid.uuid4().hex[:12]}"
+        r = client.post("/api/v1/auth/register", json={"email": f"{name}@example.com", "username": name, "password": password})
+        assert r.status_code == 200, r.text
+        login = client.post("/api/v1/auth/login/access-token", data={"username": name, "password": password})
+        assert login.status_code == 200, login.text
+        return r.json(), login.json()
+    return signup
+
+
+@pytest.fixture
+def admin_headers(signup, monkeypatch):
+    """Authorization header of a user listed in ADMIN_USER_IDS for this test."""
+    from app.core.config import settings
+
+    admin, tokens = signup()
+    monkeypatch.setattr(settings, "ADMIN_USER_IDS", [uuid.UUID(admin["user_id"])])
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
@@ -0,0 +1,117 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.core.revocation import InMemoryRevocationStore, RevocationList
+
+
+def bearer(tokens: dict) -> dict:
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+def refresh(client, refresh_token: str):
+    return client.post("/api/v1/auth/refresh", json={"refresh_token": refresh_token})
+
+
+# --- Refresh-token rotation ---
+
+def test_refresh_rotates_the_token(client, signup):
+    user, tokens = signup()
+    r = refresh(client, tokens["refresh_token"])
+    assert r.status_code == 200
+    rotated = r.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    me = client.get("/api/v1/users/me", headers=bearer(rotated))
+    assert me.json()["user_id"] == user["user_id"]
+
+    assert refresh(client, rotated["refresh_token"]).status_code == 200
+
+
+def test_reusing_a_rotated_token_revokes_the_family(client, signup):
+    _, tokens = signup()
+    rotated = refresh(client, tokens["refresh_token"]).json()
+
+    reuse = refresh(client, tokens["refresh_token"])
+    assert reuse.status_code == 401
+    # The legitimate holder's newer token belongs to the same login, so it is revoked too
+    assert refresh(client, rotated["refresh_token"]).status_code == 401
+
+
+def test_other_logins_survive_reuse_detection(client, signup):
+    user, tokens = signup()
+    other = client.post("/api/v1/auth/login/access-token", data={"username": user["username"], "password": "password123"}).json()
+    refresh(client, tokens["refresh_token"])
+    assert refresh(client, tokens["refresh_token"]).status_code == 401
+    assert refresh(client, other["refresh_token"]).status_code == 200
+
+
+def test_refresh_from_cookie(client, signup):
+    _, tokens = signup()
+    client.cookies.set("refresh_token", tokens["refresh_token"])
+    r = client.post("/api/v1/auth/refresh")
+    assert r.status_code == 200
+    assert r.cookies["refresh_token"] == r.json()["refresh_token"]
+
+
+def test_revoke_ends_the_login(client, signup):
+    _, tokens = signup()
+    rotated = refresh(client, tokens["refresh_token"]).json()
+    assert client.post("/api/v1/auth/revoke", json={"refresh_token": rotated["refresh_token"]}).status_code == 200
+    assert refresh(client, rotated["refresh_token"]).status_code == 401
+
+
+# --- Access-token revocation ---
+
+def test_logout_revokes_the_access_token(client, signup):
+    _, tokens = signup()
+    assert client.get("/api/v1/users/me", headers=bearer(tokens)).status_code == 200
+
+    r = client.post("/api/v1/auth/logout", headers=bearer(tokens))
+    assert r.status_code == 200
+    assert client.get("/api/v1/users/me", headers=bearer(tokens)).status_code == 401
+
+
+def test_logout_leaves_other_tokens_alone(client, signup):
+    user, tokens = signup()
+    other = client.post("/api/v1/auth/login/access-token", data={"username": user["username"], "password": "password123"}).json()
+    client.post("/api/v1/auth/logout", headers=bearer(tokens))
+    assert client.get("/api/v1/users/me", headers=bearer(other)).status_code == 200
+
+
+def test_revocations_reach_other_workers_on_sync():
+    in_an_hour = datetime.now(timezone.utc) + timedelta(hours=1)
+
+    async def main():
+        store = InMemoryRevocationStore() # Shared, like the revoked_tokens table
+        worker_a = RevocationList(store, capacity=1000, error_rate=0.01)
+        worker_b = RevocationList(store, capacity=1000, error_rate=0.01)
+        await worker_a.rebuild()
+        await worker_b.rebuild()
+
+        await worker_a.revoke("jti-1", in_an_hour)
+        assert await worker_a.is_revoked("jti-1")
+        assert not await worker_b.is_revoked("jti-1") # Not synced yet: the filter proves a miss
+
+        await worker_b.sync()
+        assert await worker_b.is_revoked("jti-1")
+        assert not await worker_b.is_revoked("jti-2")
+        return worker_b.stats()
+
+    stats = asyncio.run(main())
+    assert stats["entries"] == 1
+    assert stats["filter_hits"] == 1
+
+
+def test_sync_picks_up_revocations_committed_late():
+    now = datetime.now(timezone.utc)
+
+    async def main():
+        store = InMemoryRevocationStore()
+        worker = RevocationList(store, capacity=1000, error_rate=0.01)
+        await store.add("newer", now + timedelta(hours=1))
+        await worker.rebuild()
+        # A slower transaction commits a row stamped before the watermark (within the lookback)
+        store._entries["older"] = (now + timedelta(hours=1), now - timedelta(seconds=2))
+        await worker.sync()
+        return await worker.is_revoked("older")
+
+    assert asyncio.run(main())
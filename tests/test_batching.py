@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from app.core.batching import BatchLoader
+
+
+def test_loads_in_the_same_tick_share_one_batch():
+    calls = []
+
+    async def load_many(keys):
+        calls.append(list(keys))
+        return {key: key * 10 for key in keys if key != 3}
+
+    async def main():
+        loader = BatchLoader(load_many, max_batch_size=2)
+        values = await asyncio.gather(*(loader.load(key) for key in [1, 2, 1, 3]))
+        assert loader._tasks == set()
+        return loader, values
+
+    loader, values = asyncio.run(main())
+    assert values == [10, 20, 10, None]
+    assert calls == [[1, 2], [3]]
+    assert loader.stats() == {"loads": 4, "coalesced": 1, "batches": 2, "queries_saved": 2}
+
+
+def test_errors_reach_every_caller_and_are_not_cached():
+    calls = 0
+
+    async def load_many(keys):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise RuntimeError("database is down")
+        return {key: key for key in keys}
+
+    async def main():
+        loader = BatchLoader(load_many)
+        results = await asyncio.gather(loader.load(1), loader.load(1), loader.load(2), return_exceptions=True)
+        assert [type(r) for r in results] == [RuntimeError] * 3
+        return await loader.load(1)
+
+    assert asyncio.run(main()) == 1
+    assert calls == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_batch():
+    release = None
+
+    async def load_many(keys):
+        await release.wait()
+        return {key: "value" for key in keys}
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        loader = BatchLoader(load_many)
+        first = asyncio.create_task(loader.load("k"))
+        second = asyncio.create_task(loader.load("k"))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "value"
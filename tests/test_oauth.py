@@ -0,0 +1,114 @@
+import httpx
+import pytest
+
+from app.core.config import settings
+
+CALLBACK = "/api/v1/auth/callback/oauth/{provider}"
+
+
+def start_login(client, provider: str, identity: str) -> httpx.URL:
+    """Run the login redirect and the stub's consent page; returns the callback URL it redirects back to."""
+    r = client.get(f"/api/v1/auth/login/oauth/{provider}")
+    assert r.status_code == 302
+    authorize_url = httpx.URL(r.headers["location"]).copy_merge_params({"login_hint": identity})
+    r = httpx.get(authorize_url)
+    assert r.status_code == 302
+    return httpx.URL(r.headers["location"])
+
+
+def state_cookie(callback: httpx.URL) -> dict:
+    return {"Cookie": f"oauth_state={callback.params['state']}"}
+
+
+@pytest.mark.parametrize("provider", ["google", "github"])
+def test_callback_signs_in(client, provider):
+    callback = start_login(client, provider, f"alice-{provider}")
+    r = client.get(str(callback))
+    assert r.status_code == 302
+    assert r.headers["location"] == settings.OAUTH_SUCCESS_REDIRECT_URL
+    assert "refresh_token" in r.cookies
+
+    access_token = r.cookies["access_token"].strip('"')
+    me = client.get("/api/v1/users/me", headers={"Authorization": access_token})
+    assert me.status_code == 200
+    assert me.json()["email"] == f"alice-{provider}@stub.example.com"
+
+
+def test_returning_user_gets_same_account(client):
+    user_ids = []
+    for _ in range(2):
+        client.cookies.clear()
+        r = client.get(str(start_login(client, "google", "bob")))
+        assert r.status_code == 302
+        me = client.get("/api/v1/users/me", headers={"Authorization": r.cookies["access_token"].strip('"')})
+        user_ids.append(me.json()["user_id"])
+    assert user_ids[0] == user_ids[1]
+
+
+def test_state_is_single_use(client):
+    callback = start_login(client, "google", "carol")
+    client.cookies.clear()
+    assert client.get(str(callback), headers=state_cookie(callback)).status_code == 302
+
+    r = client.get(str(callback), headers=state_cookie(callback))
+    assert r.status_code == 400
+    assert r.json()["detail"] == "OAuth state expired or already used"
+
+
+def test_state_must_match_cookie(client):
+    callback = start_login(client, "google", "dave")
+    client.cookies.clear()
+
+    r = client.get(str(callback))
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Invalid OAuth state"
+    r = client.get(str(callback), headers={"Cookie": "oauth_state=someone-elses-state"})
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Invalid OAuth state"
+
+    # Rejected attempts do not consume the state
+    assert client.get(str(callback), headers=state_cookie(callback)).status_code == 302
+
+
+def test_unknown_state_is_rejected(client):
+    callback = start_login(client, "google", "erin")
+    forged = callback.copy_set_param("state", "forged")
+    client.cookies.clear()
+    r = client.get(str(forged), headers=state_cookie(forged))
+    assert r.status_code == 400
+    assert r.json()["detail"] == "OAuth state expired or already used"
+
+
+def test_id_token_nonce_must_match_login(client):
+    # A code (and so an id_token) issued for one login, replayed with another login's state
+    first = start_login(client, "google", "frank")
+    second = start_login(client, "google", "frank")
+    client.cookies.clear()
+    spliced = first.copy_set_param("code", second.params["code"])
+    r = client.get(str(spliced), headers=state_cookie(first))
+    assert r.status_code == 400
+    assert "nonce" in r.json()["detail"]
+
+
+def test_userinfo_fills_in_missing_email(client):
+    r = client.get(str(start_login(client, "google", "userinfo-grace")))
+    assert r.status_code == 302
+    me = client.get("/api/v1/users/me", headers={"Authorization": r.cookies["access_token"].strip('"')})
+    assert me.json()["email"] == "userinfo-grace@stub.example.com"
+
+
+def test_userinfo_cannot_change_subject(client):
+    r = client.get(str(start_login(client, "google", "userinfo-heidi-as-alice-google")))
+    assert r.status_code == 400
+    assert "subject" in r.json()["detail"]
+    assert "refresh_token" not in r.cookies
+
+
+def test_provider_error_is_reported(client):
+    r = client.get(CALLBACK.format(provider="google"), params={"error": "access_denied", "error_description": "denied"})
+    assert r.status_code == 400
+    assert "access_denied" in r.json()["detail"]
+
+
+def test_unknown_provider(client):
+    assert client.get("/api/v1/auth/login/oauth/nosuch").status_code == 404
@@ -0,0 +1,19 @@
+from datetime import date
+
+from app.db import partitions
+
+
+def test_bounds_are_aligned_the_same_for_every_caller():
+    start = partitions.align(date(2026, 10, 17), 7)
+    assert start <= date(2026, 10, 17) < date.fromordinal(start.toordinal() + 7)
+    assert all(partitions.align(date.fromordinal(start.toordinal() + i), 7) == start for i in range(7))
+
+
+def test_partition_names():
+    name = partitions.partition_name("sessions", date(2026, 10, 12), date(2026, 10, 19))
+    assert name == "sessions_p20261012_20261019"
+    assert partitions.is_partition_name(name, "sessions")
+    assert partitions.is_partition_name("sessions_default", "sessions")
+    assert not partitions.is_partition_name("sessions", "sessions")
+    assert not partitions.is_partition_name("sessions_partitioned", "sessions")
+    assert not partitions.is_partition_name("revoked_tokens_p20261012_20261019", "sessions")
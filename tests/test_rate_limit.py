@@ -0,0 +1,60 @@
+import pytest
+
+from app.core import rate_limit, security
+from app.core.config import settings
+from app.core.rate_limit import InMemoryRateLimitBackend, RateLimit
+
+
+@pytest.mark.parametrize("value, limit, period", [("10/minute", 10, 60), ("100/hours", 100, 3600), ("5/30s", 5, 30)])
+def test_parse(value, limit, period):
+    assert RateLimit.parse("test", value) == RateLimit("test", limit, period)
+
+
+@pytest.mark.parametrize("value", ["0/minute", "ten/minute", "10/fortnight", "10"])
+def test_parse_rejects_garbage(value):
+    with pytest.raises(ValueError):
+        RateLimit.parse("test", value)
+
+
+def test_bucket_allows_a_burst_then_one_per_interval():
+    limit = RateLimit.parse("test", "3/30s") # A request every 10s, bursts of 3
+    backend = InMemoryRateLimitBackend(shards=2, max_keys=100)
+    now = 1000.0
+    assert [backend.take_nowait("k", now, limit.interval, limit.period) for _ in range(3)] == [0.0] * 3
+    assert backend.take_nowait("k", now, limit.interval, limit.period) == pytest.approx(10.0)
+    assert backend.take_nowait("other", now, limit.interval, limit.period) == 0.0
+
+    assert backend.take_nowait("k", now + 9.5, limit.interval, limit.period) == pytest.approx(0.5)
+    assert backend.take_nowait("k", now + 10, limit.interval, limit.period) == 0.0
+
+
+def test_idle_buckets_are_dropped():
+    backend = InMemoryRateLimitBackend(shards=1, max_keys=100)
+    backend.take_nowait("a", 1000.0, 10.0, 30.0)
+    backend.take_nowait("b", 2000.0, 10.0, 30.0) # "a" has refilled by now, so it is dropped
+    assert len(backend) == 1
+    assert backend.evictions == 0
+
+
+def enable_rate_limits(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit.rate_limiter, "local", InMemoryRateLimitBackend(shards=1, max_keys=100))
+    monkeypatch.setattr(rate_limit, "LOGIN_PER_IDENTIFIER", RateLimit.parse("login_identifier", "2/minute"))
+
+
+def test_login_is_limited_per_account_with_429(client, signup, monkeypatch):
+    user, _ = signup()
+    other, _ = signup()
+    enable_rate_limits(monkeypatch)
+    form = {"username": user["username"], "password": "wrong-password"}
+    for _ in range(2):
+        assert client.post("/api/v1/auth/login/access-token", data=form).status_code == 401
+
+    admitted = security.hash_admission.admitted
+    r = client.post("/api/v1/auth/login/access-token", data=form)
+    assert r.status_code == 429
+    assert 1 <= int(r.headers["Retry-After"]) <= 30
+    assert security.hash_admission.admitted == admitted # Rejected before any password hashing
+
+    # Per account: another one is unaffected
+    assert client.post("/api/v1/auth/login/access-token", data={**form, "username": other["username"]}).status_code == 401
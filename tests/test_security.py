@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core import security
+from app.core.security import HashAdmissionController, HashingOverloaded
+
+
+def test_admission_sheds_when_the_queue_is_full():
+    async def main():
+        controller = HashAdmissionController(max_in_flight=1, max_queue=1, latency_budget_seconds=10)
+        release = threading.Event()
+        first = asyncio.create_task(controller.run(release.wait, 5))
+        while controller.in_flight == 0:
+            await asyncio.sleep(0.01)
+        second = asyncio.create_task(controller.run(len, "queued"))
+        await asyncio.sleep(0)
+        assert controller.queue_depth == 1
+
+        with pytest.raises(HashingOverloaded) as shed:
+            await controller.run(len, "shed")
+        release.set()
+        assert await first is True
+        assert await second == 6
+        return controller, shed.value
+
+    controller, shed = asyncio.run(main())
+    assert shed.retry_after >= 1
+    assert (controller.admitted, controller.rejected_queue_full) == (2, 1)
+
+
+def test_admission_sheds_past_the_latency_budget():
+    async def main():
+        controller = HashAdmissionController(max_in_flight=1, max_queue=10, latency_budget_seconds=0.1)
+        release = threading.Event()
+        first = asyncio.create_task(controller.run(release.wait, 5))
+        while controller.in_flight == 0:
+            await asyncio.sleep(0.01)
+        # One hash in flight at the seeded 250 ms average: waiting for it would blow the 100 ms budget
+        with pytest.raises(HashingOverloaded):
+            await controller.run(len, "shed")
+        release.set()
+        await first
+        return controller
+
+    assert asyncio.run(main()).rejected_latency_budget == 1
+
+
+def test_login_is_shed_with_503_and_retry_after(client, signup, monkeypatch):
+    user, _ = signup()
+    monkeypatch.setattr(security.hash_admission, "max_queue", 0)
+    r = client.post("/api/v1/auth/login/access-token", data={"username": user["username"], "password": "password123"})
+    assert r.status_code == 503
+    assert int(r.headers["Retry-After"]) >= 1
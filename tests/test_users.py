@@ -0,0 +1,77 @@
+import json
+
+from app.core.config import settings
+
+
+def ndjson(*records) -> str:
+    return "\n".join(r if isinstance(r, str) else json.dumps(r) for r in records)
+
+
+def test_import_reports_counts_and_problem_rows(client, admin_headers):
+    r = client.post("/api/v1/users/import", headers=admin_headers, content=ndjson(
+        {"email": "import-a@example.com", "username": "import-a", "password": "password123"},
+        {"email": "import-a@example.com", "username": "import-a2", "password": "password123"},
+        "not json",
+        {"email": "import-b@example.com", "username": "import-b", "password": "password123"},
+    ))
+    assert r.status_code == 200
+    result = r.json()
+    assert (result["created"], result["conflicts"], result["invalid"]) == (2, 1, 1)
+    assert [(row["row"], row["status"]) for row in result["rows"]] == [(3, "invalid"), (2, "conflict")]
+    assert result["rows_truncated"] is False
+
+
+def test_import_lists_created_rows_on_request_up_to_the_cap(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(settings, "USER_IMPORT_MAX_REPORTED_ROWS", 2)
+    r = client.post("/api/v1/users/import", headers=admin_headers, params={"include_created": "true"}, content=ndjson(*(
+        {"email": f"import-c{i}@example.com", "username": f"import-c{i}", "password": "password123"} for i in range(3)
+    )))
+    result = r.json()
+    assert result["created"] == 3
+    assert [row["status"] for row in result["rows"]] == ["created", "created"]
+    assert all(row["user_id"] for row in result["rows"])
+    assert result["rows_truncated"] is True
+
+
+def test_import_requires_admin(client, signup):
+    _, tokens = signup()
+    r = client.post("/api/v1/users/import", headers={"Authorization": f"Bearer {tokens['access_token']}"}, content="")
+    assert r.status_code == 403
+
+
+def test_list_users_pages_through_everyone_once(client, signup, admin_headers):
+    for _ in range(3):
+        signup()
+    everyone = client.get("/api/v1/users", headers=admin_headers, params={"limit": 1000}).json()
+    assert everyone["next_cursor"] is None
+
+    seen, cursor = [], None
+    while True:
+        page = client.get("/api/v1/users", headers=admin_headers, params={"limit": 2, "cursor": cursor or ""}).json()
+        assert len(page["items"]) <= 2
+        seen += [u["user_id"] for u in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [u["user_id"] for u in everyone["items"]]
+    assert len(seen) >= 4
+
+
+def test_list_users_export_matches_the_pages(client, admin_headers):
+    everyone = client.get("/api/v1/users", headers=admin_headers, params={"limit": 1000}).json()
+    r = client.get("/api/v1/users", headers=admin_headers, params={"format": "ndjson"})
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["user_id"] for line in r.text.splitlines()] == [u["user_id"] for u in everyone["items"]]
+
+
+def test_list_users_rejects_a_malformed_cursor(client, admin_headers):
+    for cursor in ["not base64!", "bm90LWEtY3Vyc29y"]: # The second decodes to "not-a-cursor"
+        r = client.get("/api/v1/users", headers=admin_headers, params={"cursor": cursor})
+        assert r.status_code == 400
+        assert r.json()["detail"] == "Invalid cursor"
+
+
+def test_list_users_requires_admin(client, signup):
+    _, tokens = signup()
+    r = client.get("/api/v1/users", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    assert r.status_code == 403